@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+import hashlib
+from frappe.model.document import Document
+from frappe.utils import flt, cint, cstr, getdate, add_days, add_months, now
+from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions
+
+
+class AccountPeriodBalance(Document):
+	pass
+
+
+period_balance_key_fields = ("company", "account", "cost_center", "project", "finance_book",
+	"fiscal_year", "period_start_date", "is_opening", "is_period_closing")
+period_balance_value_fields = ("debit", "credit", "debit_in_account_currency", "credit_in_account_currency")
+
+
+def get_period_start_date(date):
+	return getdate(date).replace(day=1)
+
+
+def get_period_end_date(date):
+	return getdate(add_days(add_months(get_period_start_date(date), 1), -1))
+
+
+def get_period_balance_dimensions():
+	"""Returns accounting dimensions for which period balances are maintained"""
+	meta = frappe.get_meta("Account Period Balance")
+	return [d for d in get_accounting_dimensions() if meta.has_field(d)]
+
+
+def can_use_account_period_balances(filters=None):
+	"""Period balances can only be used if all filters can be applied on summarized fields"""
+	if frappe.get_hooks("set_gl_conditions"):
+		return False
+
+	if filters:
+		if filters.get("presentation_currency"):
+			return False
+
+		period_balance_dimensions = get_period_balance_dimensions()
+		for dimension in get_accounting_dimensions():
+			if filters.get(dimension) and dimension not in period_balance_dimensions:
+				return False
+
+	return True
+
+
+def get_period_balance_date_range(from_date=None, to_date=None, boundaries=None):
+	"""
+		Returns (from_date, to_date) of the complete periods between from_date and to_date
+		that can be read from period balances. Entries outside these dates (the open tail period)
+		have to be read from GL Entry.
+
+		Boundaries are dates where a report starts a new column,
+		period balances are not used if a boundary falls in the middle of a period.
+	"""
+	summary_from_date = getdate(from_date) if from_date else None
+	if summary_from_date and summary_from_date.day != 1:
+		summary_from_date = getdate(add_months(get_period_start_date(summary_from_date), 1))
+
+	summary_to_date = getdate(to_date)
+	if get_period_end_date(summary_to_date) != summary_to_date:
+		summary_to_date = getdate(add_days(get_period_start_date(summary_to_date), -1))
+
+	if summary_from_date and summary_from_date > summary_to_date:
+		return None
+
+	for date in boundaries or []:
+		date = getdate(date)
+		if date.day != 1 and (not summary_from_date or date > summary_from_date) and date <= summary_to_date:
+			return None
+
+	return summary_from_date, summary_to_date
+
+
+def update_account_period_balances(gl_entries, sign=1):
+	"""Adds GL Entries to period balances, or subtracts them if sign is -1"""
+	dimensions = get_period_balance_dimensions()
+
+	balances = {}
+	for gle in gl_entries:
+		key_values = get_period_balance_key_values(gle, dimensions)
+		key = tuple(key_values.values())
+
+		balance = balances.get(key)
+		if not balance:
+			balance = balances[key] = frappe._dict(key_values)
+			balance.name = get_period_balance_name(key_values)
+			balance.account_currency = gle.get("account_currency")
+			for f in period_balance_value_fields:
+				balance[f] = 0.0
+
+		for f in period_balance_value_fields:
+			balance[f] += flt(gle.get(f)) * sign
+
+	if balances:
+		insert_period_balances(list(balances.values()), dimensions)
+
+
+def add_voucher_to_account_period_balances(voucher_type, voucher_no):
+	gl_entries = get_aggregated_gl_entries("voucher_type = %(voucher_type)s and voucher_no = %(voucher_no)s",
+		{"voucher_type": voucher_type, "voucher_no": voucher_no})
+	update_account_period_balances(gl_entries)
+
+
+def remove_voucher_from_account_period_balances(voucher_type, voucher_no):
+	gl_entries = get_aggregated_gl_entries("voucher_type = %(voucher_type)s and voucher_no = %(voucher_no)s",
+		{"voucher_type": voucher_type, "voucher_no": voucher_no})
+	update_account_period_balances(gl_entries, sign=-1)
+
+
+def get_period_balance_key_values(gle, dimensions):
+	key_values = frappe._dict({
+		"company": gle.get("company"),
+		"account": gle.get("account"),
+		"cost_center": gle.get("cost_center") or None,
+		"project": gle.get("project") or None,
+		"finance_book": gle.get("finance_book") or None,
+		"fiscal_year": gle.get("fiscal_year") or None,
+		"period_start_date": get_period_start_date(gle.get("posting_date")),
+		"is_opening": gle.get("is_opening") or "No",
+		"is_period_closing": cint(gle.get("is_period_closing") or gle.get("voucher_type") == "Period Closing Voucher")
+	})
+
+	for dimension in dimensions:
+		key_values[dimension] = gle.get(dimension) or None
+
+	return key_values
+
+
+def get_period_balance_name(key_values):
+	# empty dimensions are left out so that adding a dimension does not change existing keys
+	key = [cstr(key_values.get(f)) for f in period_balance_key_fields]
+	key += ["{0}={1}".format(f, v) for f, v in key_values.items() if f not in period_balance_key_fields and v]
+	return hashlib.sha1("\n".join(key).encode()).hexdigest()
+
+
+def insert_period_balances(balances, dimensions, chunk_size=500):
+	fields = list(period_balance_key_fields) + list(dimensions) + ["account_currency"] + list(period_balance_value_fields)
+	timestamp = now()
+	user = frappe.session.user
+
+	row_placeholder = "({0})".format(", ".join(["%s"] * (len(fields) + 5)))
+	updates = ", ".join(["`{0}` = `{0}` + values(`{0}`)".format(f) for f in period_balance_value_fields])
+
+	for i in range(0, len(balances), chunk_size):
+		chunk = balances[i:i + chunk_size]
+
+		values = []
+		for d in chunk:
+			values += [d.name, timestamp, timestamp, user, user]
+			values += [d.get(f) for f in fields]
+
+		frappe.db.sql("""
+			insert into `tabAccount Period Balance`
+				(name, creation, modified, modified_by, owner, {fields})
+			values {rows}
+			on duplicate key update {updates}, modified = values(modified)
+		""".format(
+			fields=", ".join(["`{0}`".format(f) for f in fields]),
+			rows=", ".join([row_placeholder] * len(chunk)),
+			updates=updates
+		), values)
+
+
+def get_aggregated_gl_entries(condition, values):
+	dimension_fields = "".join([", `{0}`".format(d) for d in get_period_balance_dimensions()])
+
+	return frappe.db.sql("""
+		select company, account, cost_center, project, finance_book, fiscal_year,
+			date_format(posting_date, '%%Y-%%m-01') as posting_date, is_opening,
+			if(voucher_type = 'Period Closing Voucher', 1, 0) as is_period_closing,
+			account_currency{dimension_fields},
+			sum(debit) as debit, sum(credit) as credit,
+			sum(debit_in_account_currency) as debit_in_account_currency,
+			sum(credit_in_account_currency) as credit_in_account_currency
+		from `tabGL Entry`
+		where {condition}
+		group by company, account, cost_center, project, finance_book, fiscal_year,
+			date_format(posting_date, '%%Y-%%m-01'), is_opening, is_period_closing,
+			account_currency{dimension_fields}
+	""".format(condition=condition, dimension_fields=dimension_fields), values, as_dict=1)
+
+
+def rebuild_account_period_balances(company=None):
+	"""Rebuilds period balances from GL Entries"""
+	if company:
+		frappe.db.sql("delete from `tabAccount Period Balance` where company = %s", company)
+		gl_entries = get_aggregated_gl_entries("company = %(company)s", {"company": company})
+	else:
+		frappe.db.sql("delete from `tabAccount Period Balance`")
+		gl_entries = get_aggregated_gl_entries("1 = 1", {})
+
+	update_account_period_balances(gl_entries)
+
+
+def on_doctype_update():
+	frappe.db.add_index("Account Period Balance", ["company", "account", "period_start_date"])
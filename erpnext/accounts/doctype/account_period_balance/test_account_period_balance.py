@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+import unittest
+from frappe.utils import flt, getdate, add_days, add_months, today
+from erpnext.accounts.utils import get_balance_on, get_fiscal_year
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import can_use_account_period_balances,\
+	get_period_start_date, get_period_end_date
+
+test_dependencies = ["Customer", "Cost Center"]
+
+class TestAccountPeriodBalance(unittest.TestCase):
+	def setUp(self):
+		if not can_use_account_period_balances():
+			self.skipTest("Account Period Balances can not be used with set_gl_conditions hooks")
+
+	def test_balance_across_period_boundaries(self):
+		month_start = get_period_start_date("2021-06-15")
+		month_end = get_period_end_date(month_start)
+		dates = [add_days(month_start, -1), month_start, "2021-06-15", month_end, add_months(month_start, 1)]
+
+		for date in dates:
+			make_journal_entry("_Test Bank - _TC", "_Test Cash - _TC", 100, posting_date=date, submit=True)
+
+		for date in dates + [add_days(month_start, 1), add_days(month_end, -1)]:
+			for account in ("_Test Bank - _TC", "_Test Cash - _TC"):
+				self.assertEqual(get_balance_on(account, date), get_gl_balance(account, date))
+
+		self.assert_period_balances_match_gl_entries("_Test Bank - _TC")
+
+	def test_profit_and_loss_balance_within_fiscal_year(self):
+		dates = ["2020-12-31", "2021-01-01", "2021-03-15"]
+		for date in dates:
+			make_journal_entry("_Test Bank - _TC", "Sales - _TC", 100, posting_date=date, submit=True)
+
+		for date in dates + ["2021-02-28", "2021-03-31"]:
+			year_start_date = get_fiscal_year(date, company="_Test Company")[1]
+			self.assertEqual(get_balance_on("Sales - _TC", date),
+				get_gl_balance("Sales - _TC", date, from_date=year_start_date))
+
+		self.assert_period_balances_match_gl_entries("Sales - _TC")
+
+	def test_cancelled_voucher(self):
+		jv = make_journal_entry("_Test Bank - _TC", "_Test Cash - _TC", 250, posting_date="2021-04-15", submit=True)
+		self.assertEqual(get_balance_on("_Test Bank - _TC", "2021-04-30"), get_gl_balance("_Test Bank - _TC", "2021-04-30"))
+
+		jv.cancel()
+		self.assertEqual(get_balance_on("_Test Bank - _TC", "2021-04-30"), get_gl_balance("_Test Bank - _TC", "2021-04-30"))
+		self.assert_period_balances_match_gl_entries("_Test Bank - _TC")
+		self.assert_period_balances_match_gl_entries("_Test Cash - _TC")
+
+	def test_period_closing_voucher_excluded_from_profit_and_loss(self):
+		make_journal_entry("_Test Bank - _TC", "Sales - _TC", 400, posting_date=today(), submit=True)
+		balance = get_balance_on("Sales - _TC", today())
+
+		pcv = frappe.get_doc({
+			"doctype": "Period Closing Voucher",
+			"closing_account_head": "_Test Account Reserves and Surplus - _TC",
+			"company": "_Test Company",
+			"fiscal_year": get_fiscal_year(today(), company="_Test Company")[0],
+			"posting_date": today(),
+			"cost_center": "_Test Cost Center - _TC",
+			"remarks": "test"
+		})
+		pcv.insert()
+		pcv.submit()
+
+		year_start_date = get_fiscal_year(today(), company="_Test Company")[1]
+		self.assertEqual(get_balance_on("Sales - _TC", today()), balance)
+		self.assertEqual(balance, get_gl_balance("Sales - _TC", today(), from_date=year_start_date))
+		self.assert_period_balances_match_gl_entries("Sales - _TC")
+
+		pcv.cancel()
+
+	def assert_period_balances_match_gl_entries(self, account):
+		period_balances = frappe.db.sql("""
+			select period_start_date, is_period_closing,
+				sum(debit_in_account_currency) - sum(credit_in_account_currency)
+			from `tabAccount Period Balance`
+			where account = %s
+			group by period_start_date, is_period_closing
+		""", account)
+
+		gl_balances = frappe.db.sql("""
+			select date_format(posting_date, '%%Y-%%m-01'), if(voucher_type = 'Period Closing Voucher', 1, 0),
+				sum(debit_in_account_currency) - sum(credit_in_account_currency)
+			from `tabGL Entry`
+			where account = %s
+			group by date_format(posting_date, '%%Y-%%m-01'), if(voucher_type = 'Period Closing Voucher', 1, 0)
+		""", account)
+
+		def to_dict(rows):
+			return dict(((getdate(d[0]), int(d[1])), flt(d[2], 6)) for d in rows if flt(d[2], 6))
+
+		self.assertEqual(to_dict(period_balances), to_dict(gl_balances))
+
+
+def get_gl_balance(account, date, from_date=None):
+	"""Balance summed from GL Entries, excluding Period Closing Vouchers if from the start of a fiscal year"""
+	conditions = ""
+	if from_date:
+		conditions = "and posting_date >= %(from_date)s and voucher_type != 'Period Closing Voucher'"
+
+	return flt(frappe.db.sql("""
+		select sum(debit_in_account_currency) - sum(credit_in_account_currency)
+		from `tabGL Entry`
+		where account = %(account)s and posting_date <= %(date)s {0}
+	""".format(conditions), {"account": account, "date": date, "from_date": from_date})[0][0])
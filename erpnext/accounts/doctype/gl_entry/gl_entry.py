@@ -43,7 +43,16 @@ class GLEntry(Document):
 			check_freezing_date(self.posting_date, adv_adj)
 
 		validate_frozen_account(self.account, adv_adj)
-		validate_balance_type(self.account, adv_adj)
+
+		# balance of accounts is validated once after all entries are inserted in bulk
+		if not self.flags.bulk_validation_data:
+			validate_balance_type(self.account, adv_adj)
+
+	def get_account_value(self, fieldname):
+		if self.flags.bulk_validation_data:
+			return self.flags.bulk_validation_data.accounts.get(self.account, {}).get(fieldname)
+
+		return frappe.db.get_value("Account", self.account, fieldname, cache=1)
 
 	def check_mandatory(self):
 		mandatory = ['account', 'voucher_type', 'voucher_no', 'company']
@@ -60,7 +69,7 @@ class GLEntry(Document):
 		if self.against_voucher_type and not self.against_voucher:
 			frappe.throw(_("Against Voucher is set but Against Voucher Type is not provided"))
 
-		account_type = frappe.db.get_value("Account", self.account, "account_type", cache=1)
+		account_type = self.get_account_value("account_type")
 		if not (self.party_type and self.party):
 			if account_type == "Receivable":
 				frappe.throw(_("{0} {1}: Party is required against Receivable account {2}")
@@ -79,7 +88,7 @@ class GLEntry(Document):
 				.format(self.voucher_type, self.voucher_no, self.account))
 
 	def pl_must_have_cost_center(self):
-		if frappe.db.get_value("Account", self.account, "report_type", cache=1) == "Profit and Loss":
+		if self.get_account_value("report_type") == "Profit and Loss":
 			if not self.cost_center and self.voucher_type != 'Period Closing Voucher':
 				frappe.throw(_("{0} {1}: Cost Center is required for 'Profit and Loss' account {2}. Please set up a default Cost Center for the Company.")
 					.format(self.voucher_type, self.voucher_no, self.account))
@@ -87,15 +96,22 @@ class GLEntry(Document):
 		remove_dimensions_not_allowed_for_bs_account(self)
 
 	def validate_dimensions_for_pl_and_bs(self):
-		account_type = frappe.db.get_value("Account", self.account, "report_type", cache=1)
+		account_type = self.get_account_value("report_type")
 
-		accounting_dimensions = get_checks_for_pl_and_bs_accounts()
-		if accounting_dimensions:
-			mandatory_for_account = frappe.get_all("Mandatory Accounting Dimension",
-				filters={'parenttype': 'Account', 'parent': self.account}, fields=['accounting_dimension'])
-			mandatory_for_account = [d.accounting_dimension for d in mandatory_for_account]
+		if self.flags.bulk_validation_data:
+			accounting_dimensions = self.flags.bulk_validation_data.dimension_checks
+		else:
+			accounting_dimensions = get_checks_for_pl_and_bs_accounts()
 
-			for dimension in get_checks_for_pl_and_bs_accounts():
+		if accounting_dimensions:
+			if self.flags.bulk_validation_data:
+				mandatory_for_account = self.flags.bulk_validation_data.mandatory_dimensions.get(self.account, [])
+			else:
+				mandatory_for_account = frappe.get_all("Mandatory Accounting Dimension",
+					filters={'parenttype': 'Account', 'parent': self.account}, fields=['accounting_dimension'])
+				mandatory_for_account = [d.accounting_dimension for d in mandatory_for_account]
+
+			for dimension in accounting_dimensions:
 				if dimension.name in mandatory_for_account and self.company == dimension.company and not dimension.disabled:
 					frappe.throw(_("Accounting Dimension <b>{0}</b> is required for Account <b>{1}</b>.")
 						.format(dimension.label, self.account))
@@ -114,7 +130,7 @@ class GLEntry(Document):
 
 	def check_pl_account(self):
 		if self.is_opening=='Yes'\
-				and frappe.db.get_value("Account", self.account, "report_type", cache=1) == "Profit and Loss"\
+				and self.get_account_value("report_type") == "Profit and Loss"\
 				and self.voucher_type not in ['Purchase Invoice', 'Sales Invoice', 'Journal Entry']:
 			frappe.throw(_("{0} {1}: 'Profit and Loss' type account {2} not allowed in Opening Entry")
 				.format(self.voucher_type, self.voucher_no, self.account))
@@ -122,8 +138,14 @@ class GLEntry(Document):
 	def validate_account_details(self, adv_adj):
 		"""Account must be ledger, active and not freezed"""
 
-		ret = frappe.db.sql("""select is_group, docstatus, company
-			from tabAccount where name=%s""", self.account, as_dict=1)[0]
+		if self.flags.bulk_validation_data:
+			ret = self.flags.bulk_validation_data.accounts.get(self.account)
+			if not ret:
+				frappe.throw(_("{0} {1}: Account {2} does not exist")
+					.format(self.voucher_type, self.voucher_no, self.account))
+		else:
+			ret = frappe.db.sql("""select is_group, docstatus, company
+				from tabAccount where name=%s""", self.account, as_dict=1)[0]
 
 		if ret.is_group==1:
 			frappe.throw(_('''{0} {1}: Account {2} is a Group Account and group accounts cannot be used in
@@ -159,6 +181,13 @@ class GLEntry(Document):
 				be used in transactions""").format(self.voucher_type, self.voucher_no, frappe.bold(self.cost_center)))
 
 	def validate_party(self):
+		if self.flags.bulk_validation_data:
+			# parties are validated once per bulk insert
+			key = (self.party_type, self.party)
+			if key in self.flags.bulk_validation_data.validated_parties:
+				return
+			self.flags.bulk_validation_data.validated_parties.add(key)
+
 		validate_party_frozen_disabled(self.party_type, self.party)
 
 	def validate_currency(self):
@@ -174,6 +203,12 @@ class GLEntry(Document):
 				(account_currency or company_currency)), InvalidAccountCurrency)
 
 		if self.party_type and self.party:
+			if self.flags.bulk_validation_data:
+				key = (self.party_type, self.party, self.company, self.account_currency)
+				if key in self.flags.bulk_validation_data.validated_party_currencies:
+					return
+				self.flags.bulk_validation_data.validated_party_currencies.add(key)
+
 			validate_party_gle_currency(self.party_type, self.party, self.company, self.account_currency)
 
 	def validate_and_set_fiscal_year(self):
@@ -181,6 +216,39 @@ class GLEntry(Document):
 			self.fiscal_year = get_fiscal_year(self.posting_date, company=self.company)[0]
 
 
+def get_bulk_validation_data(gl_map):
+	"""Returns Account and Accounting Dimension details for all GL Entries to be validated together"""
+	accounts = list(set([d.get("account") for d in gl_map if d.get("account")]))
+
+	data = frappe._dict({
+		"accounts": {},
+		"mandatory_dimensions": {},
+		"dimension_checks": get_checks_for_pl_and_bs_accounts(),
+		"validated_parties": set(),
+		"validated_party_currencies": set()
+	})
+
+	if not accounts:
+		return data
+
+	for d in frappe.db.sql("""
+		select name, account_type, report_type, is_group, docstatus, company
+		from tabAccount
+		where name in ({0})
+	""".format(", ".join(["%s"] * len(accounts))), accounts, as_dict=1):
+		data.accounts[d.name] = d
+
+	if data.dimension_checks:
+		for d in frappe.db.sql("""
+			select parent, accounting_dimension
+			from `tabMandatory Accounting Dimension`
+			where parenttype = 'Account' and parent in ({0})
+		""".format(", ".join(["%s"] * len(accounts))), accounts, as_dict=1):
+			data.mandatory_dimensions.setdefault(d.parent, []).append(d.accounting_dimension)
+
+	return data
+
+
 def validate_balance_type(account, adv_adj=False):
 	if not adv_adj and account:
 		balance_must_be = frappe.db.get_value("Account", account, "balance_must_be", cache=1)
@@ -23,3 +23,31 @@ class TestGLEntry(unittest.TestCase):
 			and debit = 0 and credit = '.01'""", jv.name)
 
 		self.assertTrue(round_off_entry)
+
+	def test_bulk_insert_of_gl_entries(self):
+		from erpnext.accounts import general_ledger
+		from erpnext.accounts.utils import get_balance_on
+
+		def get_gl_entries(voucher_no):
+			return frappe.db.sql("""select account, debit, credit, debit_in_account_currency,
+					credit_in_account_currency, against, cost_center, posting_date, fiscal_year, docstatus
+				from `tabGL Entry` where voucher_type='Journal Entry' and voucher_no = %s
+				order by account""", voucher_no, as_dict=1)
+
+		def make_entries(threshold):
+			bulk_gl_entry_threshold = general_ledger.bulk_gl_entry_threshold
+			general_ledger.bulk_gl_entry_threshold = threshold
+			try:
+				balance = get_balance_on("_Test Bank - _TC")
+				jv = make_journal_entry("_Test Account Cost for Goods Sold - _TC", "_Test Bank - _TC", 100,
+					"_Test Cost Center - _TC", submit=True)
+				return get_gl_entries(jv.name), get_balance_on("_Test Bank - _TC") - balance
+			finally:
+				general_ledger.bulk_gl_entry_threshold = bulk_gl_entry_threshold
+
+		bulk_entries, bulk_balance = make_entries(threshold=2)
+		entries, balance = make_entries(threshold=1000)
+
+		self.assertEqual(len(bulk_entries), 2)
+		self.assertEqual(bulk_entries, entries)
+		self.assertEqual(bulk_balance, balance)
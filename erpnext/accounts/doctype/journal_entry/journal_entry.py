@@ -5,7 +5,7 @@ import frappe, erpnext, json
 from frappe.utils import cstr, flt, fmt_money, formatdate, getdate, nowdate, cint, get_link_to_form
 from frappe import msgprint, _, scrub
 from erpnext.controllers.accounts_controller import AccountsController
-from erpnext.accounts.utils import get_balance_on, get_balance_on_voucher, get_account_currency
+from erpnext.accounts.utils import get_balance_on, get_balances_on, get_balance_on_voucher, get_account_currency
 from erpnext.accounts.party import get_party_account, get_party_name
 from erpnext.hr.doctype.expense_claim.expense_claim import update_reimbursed_amount
 from erpnext.accounts.doctype.invoice_discounting.invoice_discounting import get_party_account_based_on_invoice_discounting
@@ -1018,7 +1018,8 @@ def get_opening_accounts(company):
 			account is not null and account != '')
 		order by name asc""".format(frappe.db.escape(company)))
 
-	return [{"account": a, "balance": get_balance_on(a)} for a in accounts]
+	balances = get_balances_on(accounts)
+	return [{"account": a, "balance": balances.get(a)} for a in accounts]
 
 
 def get_outstanding_journal_entries(party_account, party_type, party, txt, start, page_len):
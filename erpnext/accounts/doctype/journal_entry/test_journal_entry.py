@@ -389,6 +389,43 @@ class TestJournalEntry(unittest.TestCase):
 		accounts_settings.allow_cost_center_in_entry_of_bs_account = 0
 		accounts_settings.save()
 
+	def test_balances_on_multiple_accounts_and_parties(self):
+		from erpnext.accounts.utils import get_balance_on, get_balances_on
+
+		jv = make_journal_entry("_Test Receivable - _TC", "Sales - _TC", 500, save=False)
+		jv.get("accounts")[0].update({"party_type": "Customer", "party": "_Test Customer"})
+		jv.insert()
+		jv.submit()
+
+		accounts = ["_Test Receivable - _TC", "Sales - _TC", "_Test Cash - _TC",
+			"Accounts Receivable - _TC", "Income - _TC"]
+		balances = get_balances_on(accounts, date=nowdate(), company="_Test Company")
+		for account in accounts:
+			self.assertEqual(balances[account],
+				get_balance_on(account, date=nowdate(), company="_Test Company"))
+
+		parties = ["_Test Customer", "_Test Customer 1"]
+		balances = get_balances_on(party_type="Customer", parties=parties, company="_Test Company")
+		for party in parties:
+			self.assertEqual(balances[party],
+				get_balance_on(party_type="Customer", party=party, company="_Test Company"))
+
+	def test_balances_on_multiple_accounts_with_user_permission(self):
+		from frappe.permissions import add_user_permission, remove_user_permission
+		from erpnext.accounts.utils import get_balances_on
+
+		add_user_permission("Account", "_Test Cash - _TC", "test@example.com")
+		frappe.get_doc("User", "test@example.com").add_roles("Accounts User")
+
+		frappe.set_user("test@example.com")
+		try:
+			self.assertTrue("_Test Cash - _TC" in get_balances_on(["_Test Cash - _TC"], company="_Test Company"))
+			self.assertRaises(frappe.PermissionError, get_balances_on, ["_Test Cash - _TC", "_Test Bank - _TC"],
+				company="_Test Company")
+		finally:
+			frappe.set_user("Administrator")
+			remove_user_permission("Account", "_Test Cash - _TC", "test@example.com")
+
 	def test_jv_receivable_voucher_balance(self):
 		# Receivable entry
 		receivable_jv = make_journal_entry("_Test Receivable - _TC", "Sales - _TC", 500, save=False)
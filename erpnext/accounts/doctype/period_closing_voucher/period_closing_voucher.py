@@ -34,10 +34,8 @@ class PeriodClosingVoucher(AccountsController):
 			self._submit()
 
 	def on_cancel(self):
-		frappe.db.sql("""
-			delete from `tabGL Entry`
-			where voucher_type = 'Period Closing Voucher' and voucher_no=%s
-		""", self.name)
+		from erpnext.accounts.general_ledger import delete_voucher_gl_entries
+		delete_voucher_gl_entries(self.doctype, self.name)
 
 	def validate_account_head(self):
 		closing_account_type = frappe.db.get_value("Account", self.closing_account_head, "root_type")
@@ -149,6 +149,7 @@ class PricingRule(Document):
 @frappe.whitelist()
 def apply_pricing_rule(args, doc=None):
 	from erpnext.stock.get_item_details import determine_selling_or_buying
+	from erpnext.accounts.doctype.pricing_rule.utils import set_item_details_for_pricing_rules
 
 	"""
 		args = {
@@ -189,6 +190,9 @@ def apply_pricing_rule(args, doc=None):
 	set_serial_nos_based_on_fifo = frappe.get_cached_value("Stock Settings", None,
 		"automatically_set_serial_nos_based_on_fifo")
 
+	if not args.ignore_pricing_rule:
+		set_item_details_for_pricing_rules(item_list)
+
 	for item in item_list:
 		args_copy = copy.deepcopy(args)
 		args_copy.update(item)
@@ -10,6 +10,7 @@ from erpnext.stock.get_item_details import get_item_details
 from frappe import MandatoryError
 from erpnext.stock.doctype.item.test_item import make_item
 from erpnext.healthcare.doctype.lab_test_template.lab_test_template import make_item_price
+from erpnext.accounts.doctype.pricing_rule.utils import clear_pricing_rule_index
 
 class TestPricingRule(unittest.TestCase):
 	def setUp(self):
@@ -90,6 +91,7 @@ class TestPricingRule(unittest.TestCase):
 
 		frappe.db.sql("update `tabPricing Rule` set priority=NULL where campaign='_Test Campaign'")
 		from erpnext.accounts.doctype.pricing_rule.utils import MultiplePricingRuleConflict
+		clear_pricing_rule_index()
 		self.assertRaises(MultiplePricingRuleConflict, get_item_details, args)
 
 		args.item_code = "_Test Item 2"
@@ -422,6 +424,24 @@ class TestPricingRule(unittest.TestCase):
 
 		self.assertTrue(details)
 
+	def test_pricing_rule_index_invalidation(self):
+		from erpnext.accounts.doctype.pricing_rule.utils import get_pricing_rule_index
+
+		doc = make_pricing_rule(selling=1, discount_percentage=10)
+		index = get_pricing_rule_index()
+		self.assertTrue(doc.name in index.rules)
+
+		# invalidated by on_change of db_set
+		doc.db_set("discount_percentage", 20)
+		index = get_pricing_rule_index()
+		self.assertEqual(index.rules[doc.name].discount_percentage, 20)
+
+		# invalidated in a new request by the modified timestamp of a write without hooks
+		frappe.db.sql("update `tabPricing Rule` set disable = 1, modified = %s where name = %s",
+			(frappe.utils.add_to_date(frappe.utils.now_datetime(), seconds=1), doc.name))
+		frappe.flags.versioned_caches = None
+		self.assertFalse(doc.name in get_pricing_rule_index().rules)
+
 def make_pricing_rule(**args):
 	args = frappe._dict(args)
 
@@ -457,9 +477,13 @@ def make_pricing_rule(**args):
 	if args.get(applicable_for):
 		doc.db_set(applicable_for, args.get(applicable_for))
 
+	return doc
+
 
 def delete_existing_pricing_rules():
 	for doctype in ["Pricing Rule", "Pricing Rule Item Code",
 		"Pricing Rule Item Group", "Pricing Rule Brand"]:
 
-		frappe.db.sql("delete from `tab{0}`".format(doctype))
\ No newline at end of file
+		frappe.db.sql("delete from `tab{0}`".format(doctype))
+
+	clear_pricing_rule_index()
\ No newline at end of file
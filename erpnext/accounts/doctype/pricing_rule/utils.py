@@ -5,6 +5,7 @@ import frappe
 from erpnext.setup.doctype.item_group.item_group import get_item_group_subtree
 from erpnext.stock.doctype.warehouse.warehouse import get_child_warehouses
 from erpnext.stock.get_item_details import get_conversion_factor, get_default_income_account, determine_selling_or_buying
+from erpnext.utilities.versioned_cache import get_versioned_cache, clear_versioned_cache
 from frappe import _
 from frappe.utils import cint, flt, cstr, get_link_to_form, getdate, today
 import copy
@@ -44,60 +45,216 @@ def get_pricing_rules(args, doc=None):
 
 	return rules
 
-def _get_pricing_rules(apply_on, args, values):
+def _get_pricing_rules(apply_on, args, values=None):
 	apply_on_field = frappe.scrub(apply_on)
 
 	if not args.get(apply_on_field): return []
 
-	child_doc = '`tabPricing Rule {0}`'.format(apply_on)
+	index = get_pricing_rule_index()
 
-	conditions = item_variant_condition = item_conditions = ""
-	values[apply_on_field] = args.get(apply_on_field)
-	if apply_on_field in ['item_code', 'brand']:
-		item_conditions = "{child_doc}.{apply_on_field}= %({apply_on_field})s".format(child_doc=child_doc,
-			apply_on_field = apply_on_field)
+	item_values = [args.get(apply_on_field)]
+	if apply_on_field == 'item_code':
+		if "variant_of" not in args:
+			args.variant_of = frappe.get_cached_value("Item", args.item_code, "variant_of")
 
-		if apply_on_field == 'item_code':
-			if "variant_of" not in args:
-				args.variant_of = frappe.get_cached_value("Item", args.item_code, "variant_of")
-
-			if args.variant_of:
-				item_variant_condition = ' or {child_doc}.item_code=%(variant_of)s '.format(child_doc=child_doc)
-				values['variant_of'] = args.variant_of
+		if args.variant_of:
+			item_values.append(args.variant_of)
 	elif apply_on_field == 'item_group':
-		item_conditions = _get_tree_conditions(args, "Item Group", child_doc, False)
-
-	conditions += get_other_conditions(conditions, values, args)
-	warehouse_conditions = _get_tree_conditions(args, "Warehouse", '`tabPricing Rule`')
-	if warehouse_conditions:
-		warehouse_conditions = " and {0}".format(warehouse_conditions)
+		item_values = index.get_ancestors("Item Group", args.get(apply_on_field))
 
 	if not args.price_list: args.price_list = None
 
-	conditions += " and ifnull(`tabPricing Rule`.for_price_list, '') in (%(price_list)s, '')"
-	values["price_list"] = args.get("price_list")
-
-	pricing_rules = frappe.db.sql("""select `tabPricing Rule`.*,
-			{child_doc}.{apply_on_field}, {child_doc}.uom
-		from `tabPricing Rule`, {child_doc}
-		where ({item_conditions} or (`tabPricing Rule`.apply_rule_on_other is not null
-			and `tabPricing Rule`.{apply_on_other_field}=%({apply_on_field})s) {item_variant_condition})
-			and {child_doc}.parent = `tabPricing Rule`.name
-			and `tabPricing Rule`.disable = 0 and
-			`tabPricing Rule`.{selling_or_buying} = 1 {warehouse_cond} {conditions}
-		order by `tabPricing Rule`.priority desc,
-			`tabPricing Rule`.name desc""".format(
-			child_doc = child_doc,
-			apply_on_field = apply_on_field,
-			item_conditions = item_conditions,
-			item_variant_condition = item_variant_condition,
-			selling_or_buying = args.selling_or_buying,
-			warehouse_cond = warehouse_conditions,
-			apply_on_other_field = "other_{0}".format(apply_on_field),
-			conditions = conditions), values, as_dict=1) or []
+	filters = get_pricing_rule_filters(args, index)
+	if filters is None:
+		return []
+
+	pricing_rules = []
+	for rule, child in index.get_rules(apply_on_field, item_values, args.get(apply_on_field)):
+		if not pricing_rule_matches_filters(rule, filters, index):
+			continue
+
+		pricing_rule = frappe._dict(rule)
+		pricing_rule[apply_on_field] = child.get(apply_on_field)
+		pricing_rule.uom = child.uom
+		pricing_rules.append(pricing_rule)
+
+	# same order as priority desc, name desc in sql
+	pricing_rules.sort(key=lambda d: (d.priority is not None, cstr(d.priority).lower(), cstr(d.name).lower()),
+		reverse=True)
 
 	return pricing_rules
 
+def get_pricing_rule_filters(args, index):
+	"""Returns allowed values of Pricing Rule fields for the transaction"""
+	if not args.selling_or_buying:
+		return None
+
+	filters = frappe._dict({
+		"selling_or_buying": args.selling_or_buying,
+		"price_list": set([args.get("price_list") or '', '']),
+		"transaction_date": getdate(args.get("transaction_date")) if args.get("transaction_date") else None,
+		"values": {}
+	})
+
+	for field in ["company", "customer", "supplier", "campaign", "sales_partner"]:
+		filters["values"][field] = set([args.get(field), '']) if args.get(field) else set([''])
+
+	for parenttype in ["Customer Group", "Territory", "Supplier Group"]:
+		field = frappe.scrub(parenttype)
+		if args.get(field):
+			filters["values"][field] = set(index.get_ancestors(parenttype, args.get(field)) + [''])
+
+	if args.get("warehouse"):
+		filters["values"]["warehouse"] = set(get_tree_ancestors("Warehouse", args.get("warehouse")) + [''])
+
+	return filters
+
+def pricing_rule_matches_filters(rule, filters, index):
+	if not cint(rule.get(filters.selling_or_buying)):
+		return False
+
+	for field, allowed_values in filters["values"].items():
+		if cstr(rule.get(field)) not in allowed_values:
+			return False
+
+	if cstr(rule.for_price_list) not in filters.price_list:
+		return False
+
+	if filters.transaction_date:
+		valid_from, valid_upto = index.validity[rule.name]
+		if not (valid_from <= filters.transaction_date <= valid_upto):
+			return False
+
+	return True
+
+def get_pricing_rule_index():
+	"""
+		Returns the index of enabled Pricing Rules for the site
+
+		The index is rebuilt in a process when a Pricing Rule is modified or deleted, or when
+		the index is cleared by an update of a Pricing Rule or one of the group trees it is applied on.
+	"""
+	return get_versioned_cache("pricing_rule_index", get_pricing_rule_fingerprint, generator=PricingRuleIndex)
+
+def get_pricing_rule_fingerprint():
+	return tuple(frappe.db.sql("select max(modified), count(*) from `tabPricing Rule`")[0])
+
+def clear_pricing_rule_index(doc=None, method=None):
+	clear_versioned_cache("pricing_rule_index")
+
+class PricingRuleIndex(object):
+	"""
+		Enabled Pricing Rules indexed by the value they are applied on
+		and ancestors of group trees used in Pricing Rules
+	"""
+	def __init__(self):
+		self.rules = {}
+		self.validity = {}
+		self.children = {}
+		self.by_value = {}
+		self.by_other_value = {}
+		self.trees = {}
+		self.ancestors = {}
+
+		for d in frappe.db.sql("select * from `tabPricing Rule` where disable = 0", as_dict=1):
+			self.rules[d.name] = d
+			self.validity[d.name] = (getdate(d.valid_from or '2000-01-01'), getdate(d.valid_upto or '2500-12-31'))
+
+		for apply_on in apply_on_table:
+			self.load_children(apply_on)
+
+	def load_children(self, apply_on):
+		field = frappe.scrub(apply_on)
+		children = self.children[field] = {}
+		by_value = self.by_value[field] = {}
+		by_other_value = self.by_other_value[field] = {}
+
+		for d in frappe.db.sql("""select name, parent, {0}, uom from `tabPricing Rule {1}`
+			order by parent, idx""".format(field, apply_on), as_dict=1):
+			if d.parent not in self.rules:
+				continue
+
+			children.setdefault(d.parent, []).append(d)
+			by_value.setdefault(d.get(field), []).append(d)
+
+		for rule in self.rules.values():
+			if rule.apply_rule_on_other is not None and rule.get("other_" + field):
+				by_other_value.setdefault(rule.get("other_" + field), []).append(rule.name)
+
+	def get_rules(self, field, item_values, value):
+		"""Returns (rule, child row) for rows matching any of item_values or rules applied on other value"""
+		matched_children = set()
+		rule_names = set()
+		for item_value in item_values:
+			for d in self.by_value[field].get(item_value, []):
+				matched_children.add(d.name)
+				rule_names.add(d.parent)
+
+		# all rows of rules applied on other item are returned
+		other_rule_names = set(self.by_other_value[field].get(value, []))
+
+		out = []
+		for rule_name in rule_names | other_rule_names:
+			for d in self.children[field].get(rule_name, []):
+				if rule_name in other_rule_names or d.name in matched_children:
+					out.append((self.rules[rule_name], d))
+
+		return out
+
+	def get_ancestors(self, parenttype, name):
+		key = (parenttype, name)
+		if key not in self.ancestors:
+			tree = self.trees.get(parenttype)
+			if tree is None:
+				tree = self.trees[parenttype] = dict((d[0], (d[1], d[2]))
+					for d in frappe.db.sql("select name, lft, rgt from `tab{0}`".format(parenttype)))
+
+			if name not in tree:
+				frappe.throw(_("Invalid {0}").format(name))
+
+			lft, rgt = tree[name]
+			self.ancestors[key] = [d for d, (d_lft, d_rgt) in tree.items() if d_lft <= lft and d_rgt >= rgt]
+
+		return list(self.ancestors[key])
+
+def get_tree_ancestors(parenttype, name):
+	if not frappe.flags.tree_ancestors:
+		frappe.flags.tree_ancestors = {}
+
+	key = (parenttype, name)
+	if key not in frappe.flags.tree_ancestors:
+		try:
+			lft, rgt = frappe.db.get_value(parenttype, name, ["lft", "rgt"])
+		except TypeError:
+			frappe.throw(_("Invalid {0}").format(name))
+
+		frappe.flags.tree_ancestors[key] = frappe.db.sql_list("""select name from `tab{0}`
+			where lft<=%s and rgt>=%s""".format(parenttype), (lft, rgt))
+
+	return list(frappe.flags.tree_ancestors[key])
+
+def set_item_details_for_pricing_rules(items):
+	"""Fetches item group, brand and variant of all items in a single query"""
+	item_codes = list(set([d.get("item_code") for d in items if d.get("item_code")]))
+	if not item_codes:
+		return
+
+	item_map = {}
+	for d in frappe.db.sql("""select name, item_group, brand, variant_of from `tabItem`
+		where name in ({0})""".format(", ".join(["%s"] * len(item_codes))), item_codes, as_dict=1):
+		item_map[d.name] = d
+
+	for item in items:
+		item_details = item_map.get(item.get("item_code"))
+		if not item_details:
+			continue
+
+		if not (item.get("item_group") and item.get("brand")):
+			item["item_group"], item["brand"] = item_details.item_group, item_details.brand
+
+		if "variant_of" not in item:
+			item["variant_of"] = item_details.variant_of
+
 def apply_multiple_pricing_rules(pricing_rules):
 	apply_multiple_rule = [d.apply_multiple_pricing_rules
 		for d in pricing_rules if d.apply_multiple_pricing_rules]
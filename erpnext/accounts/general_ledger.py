@@ -8,9 +8,15 @@ from erpnext.accounts.utils import get_stock_and_account_balance
 from frappe.model.meta import get_field_precision
 from erpnext.accounts.doctype.budget.budget import validate_expense_against_budget
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import update_account_period_balances,\
+	remove_voucher_from_account_period_balances
 from collections import OrderedDict
 
 
+# vouchers with at least these many GL Entries are inserted in bulk
+bulk_gl_entry_threshold = 100
+
+
 class ClosedAccountingPeriod(frappe.ValidationError): pass
 class StockAccountInvalidTransaction(frappe.ValidationError): pass
 class StockValueAndAccountBalanceOutOfSync(frappe.ValidationError): pass
@@ -152,9 +158,13 @@ def save_entries(gl_map, adv_adj, update_outstanding, from_repost=False):
 
 	round_off_debit_credit(gl_map)
 
+	in_bulk = can_insert_gl_entries_in_bulk(gl_map)
+	gl_entries = make_entries_in_bulk(gl_map, adv_adj, from_repost) if in_bulk else []
+
 	reference_documents_for_update = set()
 	for entry in gl_map:
-		make_entry(entry, adv_adj, from_repost)
+		if not in_bulk:
+			gl_entries.append(make_entry(entry, adv_adj, from_repost))
 
 		# check against budget
 		if not from_repost:
@@ -163,6 +173,8 @@ def save_entries(gl_map, adv_adj, update_outstanding, from_repost=False):
 		if update_outstanding and not from_repost:
 			add_to_reference_documents_for_update(reference_documents_for_update, entry)
 
+	update_account_period_balances(gl_entries)
+
 	from erpnext.accounts.doctype.gl_entry.gl_entry import update_outstanding_amt
 	for voucher_type, voucher_no, account, party_type, party in reference_documents_for_update:
 		update_outstanding_amt(voucher_type, voucher_no, account, party_type, party)
@@ -178,6 +190,84 @@ def make_entry(args, adv_adj, from_repost=False):
 	gle.run_method("on_update_with_args", adv_adj, from_repost)
 	gle.flags.ignore_validate = True
 	gle.submit()
+	return gle
+
+
+def can_insert_gl_entries_in_bulk(gl_map):
+	"""Vouchers with many entries are inserted in bulk, hooks of GL Entry are run for each entry after insert"""
+	return len(gl_map) >= bulk_gl_entry_threshold
+
+
+def make_entries_in_bulk(gl_map, adv_adj, from_repost=False):
+	"""
+		Validates GL Entries with Account and Accounting Dimension details fetched together
+		and inserts them as submitted documents using multi-row insert statements,
+		running submit methods and hooks of each entry as make_entry does
+	"""
+	from erpnext.accounts.doctype.gl_entry.gl_entry import get_bulk_validation_data, validate_balance_type
+
+	bulk_validation_data = get_bulk_validation_data(gl_map)
+	timestamp = frappe.utils.now()
+	user = frappe.session.user
+
+	gl_entries = []
+	for args in gl_map:
+		gle = frappe.new_doc("GL Entry")
+		gle.update(args)
+		gle.flags.ignore_permissions = 1
+		gle.flags.from_repost = from_repost
+		gle.flags.bulk_validation_data = bulk_validation_data
+		gle.validate()
+		gle.run_method("on_update_with_args", adv_adj, from_repost)
+		gl_entries.append(gle)
+
+	names = get_gl_entry_names(len(gl_entries))
+	for gle, name in zip(gl_entries, names):
+		gle.name = name
+		gle.docstatus = 1
+		gle.owner = gle.modified_by = user
+		gle.creation = gle.modified = timestamp
+
+	insert_gl_entries(gl_entries)
+
+	# methods and hooks, including hooks for all doctypes, run on submit of an entry in make_entry
+	for gle in gl_entries:
+		gle.run_method("on_submit")
+		gle.run_method("on_change")
+
+	for account in set([gle.account for gle in gl_entries]):
+		validate_balance_type(account, adv_adj)
+
+	return gl_entries
+
+
+def get_gl_entry_names(count):
+	names = set()
+	while len(names) < count:
+		names.add(frappe.generate_hash(txt="", length=10))
+
+	return list(names)
+
+
+def insert_gl_entries(gl_entries, chunk_size=500):
+	rows = [gle.get_valid_dict(convert_dates_to_str=True) for gle in gl_entries]
+	columns = list(rows[0].keys())
+	row_placeholder = "({0})".format(", ".join(["%s"] * len(columns)))
+
+	for i in range(0, len(rows), chunk_size):
+		chunk = rows[i:i + chunk_size]
+
+		values = []
+		for d in chunk:
+			values += [d.get(c) for c in columns]
+
+		frappe.db.sql("""
+			insert into `tabGL Entry` ({columns})
+			values {rows}
+		""".format(
+			columns=", ".join(["`{0}`".format(c) for c in columns]),
+			rows=", ".join([row_placeholder] * len(chunk))
+		), values)
 
 
 def validate_account_for_perpetual_inventory(gl_map):
@@ -356,6 +446,7 @@ def delete_gl_entries(gl_entries=None, voucher_type=None, voucher_no=None, adv_a
 
 def delete_voucher_gl_entries(voucher_type, voucher_no):
 	if voucher_type and voucher_no:
+		remove_voucher_from_account_period_balances(voucher_type, voucher_no)
 		frappe.db.sql("""
 			delete from `tabGL Entry`
 			where voucher_type = %s and voucher_no = %s
@@ -3,7 +3,7 @@
 
 import frappe
 from frappe import _
-from erpnext.accounts.utils import get_balance_on
+from erpnext.accounts.utils import get_balances_on
 
 def execute(filters=None):
 	filters = frappe._dict(filters or {})
@@ -63,9 +63,10 @@ def get_data(filters):
 	accounts = frappe.db.get_all("Account", fields=["name", "account_currency"],
 		filters=conditions)
 
+	balances = get_balances_on([d.name for d in accounts], date=filters.report_date)
+
 	for d in accounts:
-		balance = get_balance_on(d.name, date=filters.report_date)
-		row = {"account": d.name, "balance": balance, "currency": d.account_currency}
+		row = {"account": d.name, "balance": balances.get(d.name), "currency": d.account_currency}
 
 		data.append(row)
 
@@ -2,6 +2,7 @@
 # License: GNU General Public License v3. See license.txt
 
 import frappe, erpnext
+import bisect
 from frappe import _, scrub
 from frappe.utils import getdate, nowdate, flt, cint, formatdate, cstr
 from frappe.desk.query_report import group_report_data, hide_columns_if_filtered
@@ -334,6 +335,15 @@ class ReceivablePayableReport(object):
 		return ageing_columns
 
 	def get_data(self):
+		self.data = []
+		self.process_entries()
+		return self.data
+
+	def process_entries(self):
+		"""
+			Computes outstanding amounts of all vouchers in a single pass over party GL Entries
+			and passes them to add_row
+		"""
 		from erpnext.accounts.utils import get_currency_precision
 		self.currency_precision = get_currency_precision() or 2
 
@@ -351,11 +361,12 @@ class ReceivablePayableReport(object):
 		self.company_currency = frappe.get_cached_value('Company',  self.filters.get("company"), "default_currency")
 
 		return_entries = self.get_return_entries(self.filters.get("party_type"))
-		employee_advances_already_added = []
+		employee_advances_already_added = set()
 
-		data = []
 		self.pdc_details = get_pdc_details(self.filters.get("party_type"), self.filters.report_date)
 		gl_entries_data = self.get_entries_till(self.filters.report_date, self.filters.get("party_type"))
+		self.allocation_index = self.get_allocation_index(self.filters.report_date, self.filters.get("party_type"),
+			return_entries)
 
 		voucher_nos = [d.voucher_no for d in gl_entries_data] or []
 
@@ -400,23 +411,20 @@ class ReceivablePayableReport(object):
 							d.pdc_details, d.pdc_amount = self.allocate_pdc_amount_in_fifo(gle, row_outstanding)
 
 							if term_outstanding_amount > 0:
-								row = self.prepare_row(gle, term_outstanding_amount,
-									d.credit_note_amount, d.due_date, d.payment_amount , d.payment_term_amount,
-									d.description, d.pdc_amount, d.pdc_details)
-								data.append(row)
+								self.add_row(gle, term_outstanding_amount, d.credit_note_amount,
+									due_date=d.due_date, paid_amt=d.payment_amount, payment_term_amount=d.payment_term_amount,
+									payment_term=d.description, pdc_amount=d.pdc_amount, pdc_details=d.pdc_details)
 
 						if credit_note_amount:
-							row = self.prepare_row_without_payment_terms(gle, temp_outstanding_amt, temp_credit_note_amt)
-							data.append(row)
+							self.add_row(gle, temp_outstanding_amt, temp_credit_note_amt)
 
 					else:
-						row = self.prepare_row_without_payment_terms(gle, outstanding_amount, credit_note_amount)
-						data.append(row)
+						self.add_row(gle, outstanding_amount, credit_note_amount)
 
 			elif self.filters.party_type == "Employee" and gle.against_voucher_type == "Employee Advance":
 				ea_details = self.employee_advance_details.get(gle.against_voucher, frappe._dict())
 				if gle.against_voucher not in employee_advances_already_added and self.is_in_cost_center(ea_details) and self.is_in_project(ea_details):
-					employee_advances_already_added.append(gle.against_voucher)
+					employee_advances_already_added.add(gle.against_voucher)
 					outstanding_amount, return_amount, payment_amount = self.get_employee_advance_outstanding(gle,
 						self.filters.report_date)
 
@@ -430,10 +438,15 @@ class ReceivablePayableReport(object):
 						ea.remarks = ea_details.purpose
 						ea.cost_center = ea_details.cost_center
 						ea.project = ea_details.project
-						row = self.prepare_row_without_payment_terms(ea, outstanding_amount, return_amount)
-						data.append(row)
+						self.add_row(ea, outstanding_amount, return_amount)
 
-		return data
+	def add_row(self, gle, outstanding_amount, credit_note_amount, **kwargs):
+		if "pdc_amount" in kwargs:
+			row = self.prepare_row(gle, outstanding_amount, credit_note_amount, **kwargs)
+		else:
+			row = self.prepare_row_without_payment_terms(gle, outstanding_amount, credit_note_amount)
+
+		self.data.append(row)
 
 	def get_grouped_data(self, columns, data):
 		level1 = self.filters.get("group_by", "").replace("Group by ", "")
@@ -605,7 +618,8 @@ class ReceivablePayableReport(object):
 
 	def prepare_row(self, gle, outstanding_amount, credit_note_amount,
 		due_date=None, paid_amt=None, payment_term_amount=None, payment_term=None, pdc_amount=None, pdc_details=None):
-		row = frappe._dict({"posting_date": gle.posting_date, "party": gle.party})
+		row = self.get_row_values(gle, outstanding_amount, credit_note_amount,
+			due_date=due_date, paid_amt=paid_amt, payment_term_amount=payment_term_amount, payment_term=payment_term)
 
 		# customer / supplier name
 		if self.party_naming_by == "Naming Series":
@@ -614,6 +628,37 @@ class ReceivablePayableReport(object):
 		if self.filters.get("party_type") == 'Customer':
 			row["contact"] = self.get_customer_contact(gle.party_type, gle.party)
 
+		remaining_balance = outstanding_amount - flt(pdc_amount)
+		pdc_details = ", ".join(pdc_details or [])
+
+		row["pdc/lc_ref"] = pdc_details
+		row["pdc/lc_amount"] = pdc_amount
+		row["remaining_balance"] = remaining_balance
+
+		if self.filters.get('party_type') == 'Customer':
+			# customer LPO
+			row["po_no"] = self.voucher_details.get(gle.voucher_no, {}).get("po_no")
+
+			# Delivery Note
+			row["delivery_note"] = self.voucher_details.get(gle.voucher_no, {}).get("delivery_note")
+
+		# customer territory / supplier group
+		if self.filters.get("party_type") == "Customer":
+			row["territory"] = self.get_territory(gle.party)
+			row["customer_group"] = self.get_customer_group(gle.party)
+			row["sales_person"] = ", ".join(self.get_sales_persons(gle.voucher_no, gle.against_voucher))
+		if self.filters.get("party_type") == "Supplier":
+			row["supplier_group"] = self.get_supplier_group(gle.party)
+
+		row["remarks"] = gle.remarks
+
+		return row
+
+	def get_row_values(self, gle, outstanding_amount, credit_note_amount,
+		due_date=None, paid_amt=None, payment_term_amount=None, payment_term=None):
+		"""Returns amounts and ageing of a row, used by both detail and summary reports"""
+		row = frappe._dict({"posting_date": gle.posting_date, "party": gle.party})
+
 		# get due date
 		if not due_date:
 			due_date = self.voucher_details.get(gle.voucher_no, {}).get("due_date", "")
@@ -663,12 +708,12 @@ class ReceivablePayableReport(object):
 
 		# issue 6371-Ageing buckets should not have amounts if due date is not reached
 		if self.filters.ageing_based_on == "Due Date" \
-				and getdate(due_date) > getdate(self.filters.report_date):
+				and getdate(due_date) > self.filters.report_date:
 			for i in range(self.ageing_column_count):
 				row["range{}".format(i+1)] = 0
 
 		if self.filters.ageing_based_on == "Supplier Invoice Date" \
-				and getdate(bill_date) > getdate(self.filters.report_date):
+				and getdate(bill_date) > self.filters.report_date:
 			for i in range(self.ageing_column_count):
 				row["range{}".format(i+1)] = 0
 
@@ -679,35 +724,17 @@ class ReceivablePayableReport(object):
 
 		self.account_currency = row["currency"]
 
-		remaining_balance = outstanding_amount - flt(pdc_amount)
-		pdc_details = ", ".join(pdc_details)
-
-		row["pdc/lc_ref"] = pdc_details
-		row["pdc/lc_amount"] = pdc_amount
-		row["remaining_balance"] = remaining_balance
-
-		if self.filters.get('party_type') == 'Customer':
-			# customer LPO
-			row["po_no"] = self.voucher_details.get(gle.voucher_no, {}).get("po_no")
-
-			# Delivery Note
-			row["delivery_note"] = self.voucher_details.get(gle.voucher_no, {}).get("delivery_note")
-
-		# customer territory / supplier group
-		if self.filters.get("party_type") == "Customer":
-			row["territory"] = self.get_territory(gle.party)
-			row["customer_group"] = self.get_customer_group(gle.party)
-			row["sales_person"] = ", ".join(self.get_sales_persons(gle.voucher_no, gle.against_voucher))
-		if self.filters.get("party_type") == "Supplier":
-			row["supplier_group"] = self.get_supplier_group(gle.party)
-
-		row["remarks"] = gle.remarks
-
 		return row
 
 	def get_entries_after(self, report_date, party_type):
-		# returns a distinct list
-		return list(set([(e.voucher_type, e.voucher_no) for e in self.get_gl_entries(party_type, report_date, for_future=True)]))
+		# returns a distinct set
+		conditions, values = self.prepare_conditions(party_type)
+		return set(frappe.db.sql("""
+			select distinct gle.voucher_type, gle.voucher_no
+			from `tabGL Entry` gle
+			where gle.docstatus < 2 and gle.party_type=%s and (gle.party is not null and gle.party != '')
+				{conditions} and gle.posting_date > %s
+		""".format(conditions=conditions), values + [report_date]))  # nosec
 
 	def get_entries_till(self, report_date, party_type):
 		# returns a generator
@@ -787,16 +814,19 @@ class ReceivablePayableReport(object):
 			return []
 
 	def get_outstanding_amount(self, gle, report_date, dr_or_cr, return_entries):
-		payment_amount, credit_note_amount = 0.0, 0.0
 		reverse_dr_or_cr = "credit" if dr_or_cr=="debit" else "debit"
 
-		for e in self.get_gl_entries_for(gle.party, gle.party_type, gle.voucher_type, gle.voucher_no):
-			if getdate(e.posting_date) <= report_date and e.name!=gle.name:
-				amount = flt(e.get(reverse_dr_or_cr), self.currency_precision) - flt(e.get(dr_or_cr), self.currency_precision)
-				if e.voucher_no not in return_entries:
-					payment_amount += amount
-				else:
-					credit_note_amount += amount
+		allocation = self.allocation_index.get((gle.party, gle.voucher_type, gle.voucher_no), {})
+		payment_amount = flt(allocation.get("payment_amount"))
+		credit_note_amount = flt(allocation.get("credit_note_amount"))
+
+		# the index includes the voucher's own entry if it is against itself
+		if gle.against_voucher_type == gle.voucher_type and gle.against_voucher == gle.voucher_no:
+			amount = flt(gle.get(reverse_dr_or_cr), self.currency_precision) - flt(gle.get(dr_or_cr), self.currency_precision)
+			if gle.voucher_no not in return_entries:
+				payment_amount -= amount
+			else:
+				credit_note_amount -= amount
 
 		# for stand alone credit/debit note
 		if gle.voucher_no in return_entries and flt(gle.get(reverse_dr_or_cr)) - flt(gle.get(dr_or_cr) > 0):
@@ -813,16 +843,11 @@ class ReceivablePayableReport(object):
 		return outstanding_amount, credit_note_amount, payment_amount
 
 	def get_employee_advance_outstanding(self, gle, report_date):
-		claimed_amount, payment_amount, return_amount = 0.0, 0.0, 0.0
-
-		for e in self.get_gl_entries_for(gle.party, gle.party_type, gle.against_voucher_type, gle.against_voucher):
-			if getdate(e.posting_date) <= report_date:
-				payment_amount += flt(e.debit, self.currency_precision)
+		allocation = self.allocation_index.get((gle.party, gle.against_voucher_type, gle.against_voucher), {})
 
-				if e.voucher_type == "Expense Claim":
-					claimed_amount += flt(e.credit, self.currency_precision)
-				else:
-					return_amount += flt(e.credit, self.currency_precision)
+		payment_amount = flt(allocation.get("debit"))
+		claimed_amount = flt(allocation.get("claimed_amount"))
+		return_amount = flt(allocation.get("credit")) - claimed_amount
 
 		outstanding_amount = payment_amount - claimed_amount - return_amount
 		return outstanding_amount, return_amount, payment_amount
@@ -984,19 +1009,73 @@ class ReceivablePayableReport(object):
 
 		return " and ".join(conditions), values
 
-	def get_gl_entries_for(self, party, party_type, against_voucher_type, against_voucher):
-		if not hasattr(self, "gl_entries_map"):
-			self.gl_entries_map = {}
-			for gle in self.get_gl_entries(party_type):
-				if gle.against_voucher_type and gle.against_voucher:
-					self.gl_entries_map.setdefault(gle.party, {})\
-						.setdefault(gle.against_voucher_type, {})\
-						.setdefault(gle.against_voucher, [])\
-						.append(gle)
+	def get_allocation_index(self, report_date, party_type, return_entries):
+		"""
+			Returns totals of GL Entries till report date allocated against each voucher
+			as {(party, against_voucher_type, against_voucher): amounts}
+
+			Amounts of each voucher are rounded before they are added up,
+			credit and debit notes are totalled separately from payments
+		"""
+		conditions, values = self.prepare_conditions(party_type)
+
+		if self.filters.get(scrub(party_type)) or self.filters.get("account"):
+			debit_field, credit_field = "gle.debit_in_account_currency", "gle.credit_in_account_currency"
+		else:
+			debit_field, credit_field = "gle.debit", "gle.credit"
+
+		return_doctype = self.get_invoice_doctype()
+		if return_doctype:
+			return_condition = """e.voucher_no in (select name from `tab{0}` where is_return = 1 and docstatus = 1)"""\
+				.format(return_doctype)
+		else:
+			return_condition = "0"
+
+		precision = cint(self.currency_precision)
+		dr_or_cr = "round(e.{0}, {1})".format(self.dr_or_cr, precision)
+		reverse_dr_or_cr = "round(e.{0}, {1})".format(self.reverse_dr_or_cr, precision)
 
-		return self.gl_entries_map.get(party, {})\
-			.get(against_voucher_type, {})\
-			.get(against_voucher, [])
+		allocated_amounts = frappe.db.sql("""
+			select
+				e.party, e.against_voucher_type, e.against_voucher,
+				{return_condition} as is_return,
+				sum({reverse_dr_or_cr} - {dr_or_cr}) as amount,
+				sum(round(e.debit, {precision})) as debit,
+				sum(round(e.credit, {precision})) as credit,
+				sum(round(e.claimed_amount, {precision})) as claimed_amount
+			from (
+				select
+					gle.party, gle.voucher_type, gle.voucher_no, gle.against_voucher_type, gle.against_voucher,
+					sum({debit_field}) as debit, sum({credit_field}) as credit,
+					sum(if(gle.voucher_type = 'Expense Claim', {credit_field}, 0)) as claimed_amount
+				from `tabGL Entry` gle
+				where gle.docstatus < 2 and gle.party_type=%s and (gle.party is not null and gle.party != '')
+					{conditions} and gle.posting_date <= %s
+					and ifnull(gle.against_voucher_type, '') != '' and ifnull(gle.against_voucher, '') != ''
+				group by gle.voucher_type, gle.voucher_no, gle.against_voucher_type, gle.against_voucher, gle.party
+			) e
+			group by e.party, e.against_voucher_type, e.against_voucher, is_return
+		""".format(  # nosec
+			return_condition=return_condition, dr_or_cr=dr_or_cr, reverse_dr_or_cr=reverse_dr_or_cr,
+			precision=precision, debit_field=debit_field, credit_field=credit_field, conditions=conditions
+		), values + [report_date], as_dict=True)
+
+		allocation_index = {}
+		for d in allocated_amounts:
+			allocation = allocation_index.setdefault((d.party, d.against_voucher_type, d.against_voucher), frappe._dict({
+				"payment_amount": 0.0, "credit_note_amount": 0.0, "debit": 0.0, "credit": 0.0, "claimed_amount": 0.0
+			}))
+
+			if d.is_return:
+				allocation.credit_note_amount += flt(d.amount)
+			else:
+				allocation.payment_amount += flt(d.amount)
+
+			allocation.debit += flt(d.debit)
+			allocation.credit += flt(d.credit)
+			allocation.claimed_amount += flt(d.claimed_amount)
+
+		return allocation_index
 
 	def get_payment_term_detail(self, voucher_nos):
 		payment_term_map = frappe._dict()
@@ -1057,15 +1136,9 @@ def get_ageing_data(ageing_range, age_as_on, entry_date, outstanding_amount):
 		return 0, outstanding_range
 
 	age = (getdate(age_as_on) - getdate(entry_date)).days or 0
-	index = None
-	for i, days in enumerate(ageing_range):
-		if age <= days:
-			index = i
-			break
-
-	if index is None:
-		index = len(ageing_range)
 
+	# index of the first range with days >= age, ranges are sorted
+	index = bisect.bisect_left(ageing_range, age)
 	outstanding_range[index] = outstanding_amount
 
 	return age, outstanding_range
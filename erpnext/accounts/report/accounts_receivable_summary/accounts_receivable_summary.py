@@ -173,9 +173,12 @@ class AccountsReceivableSummary(ReceivablePayableReport):
 		return data
 
 	def get_partywise_total(self, party_naming_by, args):
-		party_total = frappe._dict()
+		self.filters.party_type = args.get("party_type")
+		self.party_naming_by = party_naming_by
+		self.validate_filters()
 
-		template = frappe._dict({
+		self.party_total = frappe._dict()
+		self.party_total_template = frappe._dict({
 			"invoiced_amount": 0,
 			"paid_amount": 0,
 			"return_amount": 0,
@@ -183,25 +186,33 @@ class AccountsReceivableSummary(ReceivablePayableReport):
 			"sales_person": []
 		})
 		for r in range(self.ageing_column_count):
-			template['range{0}'.format(r+1)] = 0
+			self.party_total_template['range{0}'.format(r+1)] = 0
 
-		for d in self.get_voucherwise_data(party_naming_by, args):
-			party_total.setdefault(d.party, template.copy())
-			
-			for k in list(party_total[d.party]):
-				if k not in ["currency", "sales_person"]:
-					party_total[d.party][k] += flt(d.get(k, 0))
+		# voucher rows are added to party totals as they are computed
+		self.process_entries()
 
-			party_total[d.party].currency = d.currency
+		return self.party_total
 
-			if d.sales_person:
-				party_total[d.party].sales_person.append(d.sales_person)
+	def add_row(self, gle, outstanding_amount, credit_note_amount, **kwargs):
+		kwargs.pop("pdc_amount", None)
+		kwargs.pop("pdc_details", None)
+		d = self.get_row_values(gle, outstanding_amount, credit_note_amount, **kwargs)
 
-		return party_total
+		if d.party not in self.party_total:
+			self.party_total[d.party] = self.party_total_template.copy()
+			self.party_total[d.party].sales_person = []
 
-	def get_voucherwise_data(self, party_naming_by, args):
-		voucherwise_data = ReceivablePayableReport(self.filters).run(args)[1]
-		return voucherwise_data
+		party_dict = self.party_total[d.party]
+		for k in list(party_dict):
+			if k not in ["currency", "sales_person"]:
+				party_dict[k] += flt(d.get(k, 0))
+
+		party_dict.currency = d.currency
+
+		if self.filters.get("party_type") == "Customer":
+			sales_person = ", ".join(self.get_sales_persons(gle.voucher_no, gle.against_voucher))
+			if sales_person:
+				party_dict.sales_person.append(sales_person)
 
 def execute(filters=None):
 	args = {
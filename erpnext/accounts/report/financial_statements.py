@@ -16,6 +16,8 @@ from erpnext.accounts.utils import get_fiscal_year
 from six import itervalues
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions,\
 	get_dimension_with_children
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import can_use_account_period_balances,\
+	get_period_balance_date_range
 
 
 def get_period_list(from_fiscal_year, to_fiscal_year, periodicity, accumulated_values=False,
@@ -148,7 +150,8 @@ def get_data(company, root_type, balance_must_be, period_list, filters=None,
 			period_list[0]["year_start_date"] if only_current_fiscal_year else None,
 			period_list[-1]["to_date"],
 			root.lft, root.rgt, filters,
-			gl_entries_by_account, ignore_closing_entries=ignore_closing_entries
+			gl_entries_by_account, ignore_closing_entries=ignore_closing_entries,
+			period_boundaries=get_period_boundaries(period_list)
 		)
 
 	calculate_values(accounts_by_name, gl_entries_by_account, period_list, accumulated_values,
@@ -163,6 +166,14 @@ def get_data(company, root_type, balance_must_be, period_list, filters=None,
 	return out
 
 
+def get_period_boundaries(period_list):
+	boundaries = [period_list[0].year_start_date]
+	for period in period_list:
+		boundaries += [period.from_date, add_days(period.to_date, 1)]
+
+	return boundaries
+
+
 def get_appropriate_currency(company, filters=None):
 	if filters and filters.get("presentation_currency"):
 		return filters["presentation_currency"]
@@ -370,17 +381,25 @@ def sort_accounts(accounts, is_root=False, key="name"):
 
 
 def set_gl_entries_by_account(company, from_date, to_date, root_lft, root_rgt, filters, gl_entries_by_account,
-		ignore_closing_entries=False):
+		ignore_closing_entries=False, period_boundaries=None):
+
+	"""Returns a dict like { "account": [gl entries], ... }
+
+	If period_boundaries are given, complete periods are read from Account Period Balance
+	and only the remaining dates are read from GL Entry"""
+	summary_date_range = None
+	if period_boundaries is not None and can_use_account_period_balances(filters):
+		summary_date_range = get_period_balance_date_range(from_date, to_date, period_boundaries)
 
-	"""Returns a dict like { "account": [gl entries], ... }"""
 	additional_conditions = get_additional_conditions(from_date, ignore_closing_entries, filters)
 
 	accounts = frappe.db.sql_list("""select name from `tabAccount`
 		where lft >= %s and rgt <= %s and company = %s""", (root_lft, root_rgt, company))
 
 	if accounts:
-		additional_conditions += " and account in ({})"\
+		account_condition = " and account in ({})"\
 			.format(", ".join([frappe.db.escape(d) for d in accounts]))
+		additional_conditions += account_condition
 
 		gl_filters = {
 			"company": company,
@@ -399,6 +418,17 @@ def set_gl_entries_by_account(company, from_date, to_date, root_lft, root_rgt, f
 					key: value
 				})
 
+		period_balance_entries = []
+		if summary_date_range:
+			gl_filters["summary_from_date"], gl_filters["summary_to_date"] = summary_date_range
+			if gl_filters["summary_from_date"]:
+				additional_conditions += " and (posting_date < %(summary_from_date)s or posting_date > %(summary_to_date)s)"
+			else:
+				additional_conditions += " and posting_date > %(summary_to_date)s"
+
+			period_balance_entries = get_period_balance_entries(ignore_closing_entries, filters,
+				account_condition, gl_filters)
+
 		gl_entries = frappe.db.sql("""
 			select posting_date, account, debit, credit, debit_in_account_currency, credit_in_account_currency,
 				is_opening, fiscal_year, account_currency
@@ -409,6 +439,9 @@ def set_gl_entries_by_account(company, from_date, to_date, root_lft, root_rgt, f
 			order by account, posting_date
 		""".format(additional_conditions=additional_conditions), gl_filters, as_dict=True)  #nosec
 
+		if period_balance_entries:
+			gl_entries = sorted(period_balance_entries + gl_entries, key=lambda d: (d.account, d.posting_date))
+
 		if filters and filters.get('presentation_currency'):
 			convert_to_presentation_currency(gl_entries, get_currency(filters))
 
@@ -418,7 +451,32 @@ def set_gl_entries_by_account(company, from_date, to_date, root_lft, root_rgt, f
 		return gl_entries_by_account
 
 
-def get_additional_conditions(from_date, ignore_closing_entries, filters):
+def get_period_balance_entries(ignore_closing_entries, filters, account_condition, gl_filters):
+	"""Returns period totals in the same format as GL Entries, posted on the period start date"""
+	additional_conditions = get_additional_conditions(None, False, filters, for_period_balances=True)
+	additional_conditions += account_condition
+
+	if ignore_closing_entries:
+		additional_conditions += " and is_period_closing = 0"
+
+	if gl_filters.get("summary_from_date"):
+		additional_conditions += " and period_start_date >= %(summary_from_date)s"
+
+	return frappe.db.sql("""
+		select period_start_date as posting_date, account,
+			sum(debit) as debit, sum(credit) as credit,
+			sum(debit_in_account_currency) as debit_in_account_currency,
+			sum(credit_in_account_currency) as credit_in_account_currency,
+			is_opening, fiscal_year, account_currency
+		from `tabAccount Period Balance`
+		where company=%(company)s
+			{additional_conditions}
+			and period_start_date <= %(summary_to_date)s
+		group by account, period_start_date, is_opening, fiscal_year, account_currency
+	""".format(additional_conditions=additional_conditions), gl_filters, as_dict=True)  #nosec
+
+
+def get_additional_conditions(from_date, ignore_closing_entries, filters, for_period_balances=False):
 	additional_conditions = []
 
 	accounting_dimensions = get_accounting_dimensions(as_list=False)
@@ -455,9 +513,10 @@ def get_additional_conditions(from_date, ignore_closing_entries, filters):
 				else:
 					additional_conditions.append("{0} in (%({0})s)".format(dimension.fieldname))
 
-	hooks = frappe.get_hooks('set_gl_conditions')
-	for method in hooks:
-		frappe.get_attr(method)(filters, additional_conditions, alias="`tabGL Entry`")
+	if not for_period_balances:
+		hooks = frappe.get_hooks('set_gl_conditions')
+		for method in hooks:
+			frappe.get_attr(method)(filters, additional_conditions, alias="`tabGL Entry`")
 
 	return " and {}".format(" and ".join(additional_conditions)) if additional_conditions else ""
 
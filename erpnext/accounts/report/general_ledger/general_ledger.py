@@ -4,7 +4,7 @@
 import frappe
 from erpnext.accounts.report.utils import get_currency, convert_to_presentation_currency
 from erpnext import get_default_company
-from frappe.utils import getdate, cstr, flt
+from frappe.utils import getdate, cstr, flt, add_days
 from frappe import _, _dict
 from erpnext.accounts.utils import get_account_currency
 from erpnext.accounts.party import set_party_name_in_list
@@ -13,6 +13,7 @@ from frappe.desk.query_report import group_report_data
 from six import string_types
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions
 from collections import OrderedDict
+from itertools import accumulate
 
 
 def execute(filters=None):
@@ -196,6 +197,14 @@ def get_gl_entries(filters, accounting_dimensions):
 	if filters.get("voucher_no"):
 		order_by = "gle.posting_date, gle.creation"
 
+	# Opening balances are aggregated in the database instead of loading every entry before From Date.
+	# Presentation currency is converted per entry using the posting date, so it needs the entries.
+	aggregate_opening = is_opening_required(filters) and not filters.get('presentation_currency')
+
+	opening_entries = []
+	if aggregate_opening:
+		opening_entries = get_opening_entries(filters, accounting_dimensions, sales_person_field, sales_person_join)
+
 	gl_entries = frappe.db.sql("""
 		select
 			gle.posting_date, gle.account, gle.party_type, gle.party,
@@ -211,7 +220,7 @@ def get_gl_entries(filters, accounting_dimensions):
 		where {conditions}
 		order by {order_by}
 	""".format(
-		conditions=get_conditions(filters, accounting_dimensions),
+		conditions=get_conditions(filters, accounting_dimensions, period_only=aggregate_opening),
 		dimensions_fields=dimensions_fields,
 		sales_person_field=sales_person_field,
 		sales_person_join=sales_person_join,
@@ -221,7 +230,46 @@ def get_gl_entries(filters, accounting_dimensions):
 	if filters.get('presentation_currency'):
 		return convert_to_presentation_currency(gl_entries, currency_map)
 	else:
-		return gl_entries
+		return opening_entries + gl_entries
+
+
+def get_opening_entries(filters, accounting_dimensions, sales_person_field, sales_person_join):
+	"""Returns one aggregated opening entry per group instead of all entries before From Date"""
+	group_by_fields = ["gle.account", "gle.party_type", "gle.party", "gle.account_currency"]
+	if sales_person_field:
+		group_by_fields.append("steam.sales_person")
+	if filters.get('group_by') == _('Group by Voucher'):
+		group_by_fields += ["gle.voucher_type", "gle.voucher_no"]
+
+	opening_entries = frappe.db.sql("""
+		select
+			{group_by_fields},
+			sum(gle.debit) as debit, sum(gle.credit) as credit,
+			sum(gle.debit_in_account_currency) as debit_in_account_currency,
+			sum(gle.credit_in_account_currency) as credit_in_account_currency,
+			%(ledger_currency)s as currency
+		from `tabGL Entry` gle
+		{sales_person_join}
+		where {conditions}
+		group by {group_by_fields}
+		order by min(gle.posting_date), gle.account, min(gle.creation)
+	""".format(
+		group_by_fields=", ".join(group_by_fields),
+		conditions=get_conditions(filters, accounting_dimensions, opening_only=True),
+		sales_person_join=sales_person_join,
+	), filters, as_dict=1)
+
+	opening_date = add_days(getdate(filters.from_date), -1)
+	for d in opening_entries:
+		d.posting_date = opening_date
+		d.is_opening = "Yes"
+
+	return opening_entries
+
+
+def is_opening_required(filters):
+	return filters.get("account") or filters.get("party") \
+		or filters.get("group_by") in [_("Group by Account"), _("Group by Party"), _("Group by Sales Person")]
 
 
 def merge_similar_entries(filters, gl_entries, supplier_invoice_details):
@@ -271,7 +319,7 @@ def merge_similar_entries(filters, gl_entries, supplier_invoice_details):
 	return out
 
 
-def get_conditions(filters, accounting_dimensions):
+def get_conditions(filters, accounting_dimensions, opening_only=False, period_only=False):
 	conditions = []
 
 	if filters.get("company"):
@@ -311,8 +359,16 @@ def get_conditions(filters, accounting_dimensions):
 	if filters.get("party_list"):
 		conditions.append("(gle.party_type, gle.party) in %(party_list)s")
 
-	if filters.get("account") or filters.get("party") \
-			or filters.get("group_by") in [_("Group by Account"), _("Group by Party"), _("Group by Sales Person")]:
+	if opening_only:
+		if filters.get('show_opening_entries'):
+			conditions.append("gle.posting_date < %(from_date)s")
+		else:
+			conditions.append("(gle.posting_date < %(from_date)s or gle.is_opening = 'Yes')")
+	elif period_only:
+		conditions.append("gle.posting_date between %(from_date)s and %(to_date)s")
+		if not filters.get('show_opening_entries'):
+			conditions.append("gle.is_opening != 'Yes'")
+	elif is_opening_required(filters):
 		conditions.append("(gle.posting_date <= %(to_date)s or gle.is_opening = 'Yes')")
 	else:
 		conditions.append("gle.posting_date between %(from_date)s and %(to_date)s")
@@ -420,20 +476,18 @@ def postprocess_group(filters, group_object, grouped_by):
 		if 'voucher_no' not in grouped_by:
 			group_object.rows.append(group_object.totals.closing)
 
-		balance, balance_in_account_currency = 0, 0
-
 		# Set Running Balances
+		# balance restarts from total rows which do not have a posting date
 		precision = frappe.get_precision("GL Entry", "debit") + 1
+		balances = accumulate(group_object.rows,
+			lambda balance, d: get_balance(d, balance if d.posting_date else 0, 'debit', 'credit'), initial=0)
+		next(balances)
 
-		for d in group_object.rows:
-			if not d.posting_date:
-				balance = 0
-
-			balance = get_balance(d, balance, 'debit', 'credit')
+		currency = filters.presentation_currency or filters.company_currency
+		for d, balance in zip(group_object.rows, balances):
 			d['balance'] = flt(balance, precision)
-
 			d['account_currency'] = filters.account_currency
-			d['currency'] = filters.presentation_currency or filters.company_currency
+			d['currency'] = currency
 
 		# Adjust opening row
 		if no_opening_total_general_ledger:
@@ -7,6 +7,8 @@ from frappe.utils import flt, getdate, formatdate, cstr
 from erpnext.accounts.report.financial_statements \
 	import filter_accounts, set_gl_entries_by_account, filter_out_zero_value_rows
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions, get_dimension_with_children
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import can_use_account_period_balances,\
+	get_period_start_date
 
 
 value_fields = ("opening_debit", "opening_credit", "debit", "credit", "closing_debit", "closing_credit")
@@ -84,7 +86,7 @@ def get_data(filters):
 
 	set_gl_entries_by_account(filters.company, filters.from_date, filters.to_date,
 		min_lft, max_rgt, filters, gl_entries_by_account,
-		ignore_closing_entries=not flt(filters.with_period_closing_entry))
+		ignore_closing_entries=not flt(filters.with_period_closing_entry), period_boundaries=[])
 
 	total_row = calculate_values(accounts, gl_entries_by_account, opening_balances, filters, company_currency)
 	accumulate_values_into_parents(accounts, accounts_by_name)
@@ -106,12 +108,21 @@ def get_opening_balances(filters):
 
 
 def get_rootwise_opening_balances(filters, report_type):
+	# balances of complete periods before from date are read from Account Period Balance
+	use_period_balances = can_use_account_period_balances(filters)
+
 	additional_conditions = []
+	gl_conditions = []
+	period_balance_conditions = []
 	if not filters.show_unclosed_fy_pl_balances and report_type == "Profit and Loss":
-		additional_conditions.append("posting_date >= %(year_start_date)s")
+		gl_conditions.append("posting_date >= %(year_start_date)s")
+		period_balance_conditions.append("period_start_date >= %(year_start_date)s")
+		if getdate(filters.year_start_date).day != 1:
+			use_period_balances = False
 
 	if not flt(filters.with_period_closing_entry):
-		additional_conditions.append("voucher_type != 'Period Closing Voucher'")
+		gl_conditions.append("voucher_type != 'Period Closing Voucher'")
+		period_balance_conditions.append("is_period_closing = 0")
 
 	if filters.cost_center:
 		lft, rgt = frappe.db.get_value('Cost Center', filters.cost_center, ['lft', 'rgt'])
@@ -137,7 +148,8 @@ def get_rootwise_opening_balances(filters, report_type):
 		"year_start_date": filters.year_start_date,
 		"project": filters.project,
 		"finance_book": filters.finance_book,
-		"company_fb": frappe.db.get_value("Company", filters.company, 'default_finance_book')
+		"company_fb": frappe.db.get_value("Company", filters.company, 'default_finance_book'),
+		"period_start_date": get_period_start_date(filters.from_date)
 	}
 
 	if accounting_dimensions:
@@ -158,7 +170,11 @@ def get_rootwise_opening_balances(filters, report_type):
 	for method in hooks:
 		frappe.get_attr(method)(filters, additional_conditions, alias="`tabGL Entry`")
 
-	additional_conditions = " and {0}".format(" and ".join(additional_conditions)) if additional_conditions else ""
+	if use_period_balances:
+		gl_conditions.append("posting_date >= %(period_start_date)s")
+
+	gl_conditions = " and {0}".format(" and ".join(gl_conditions + additional_conditions)) \
+		if gl_conditions or additional_conditions else ""
 
 	gle = frappe.db.sql("""
 		select
@@ -170,11 +186,31 @@ def get_rootwise_opening_balances(filters, report_type):
 			and (posting_date < %(from_date)s or is_opening = 'Yes')
 			and account in (select name from `tabAccount` where report_type=%(report_type)s)
 		group by account
-	""".format(additional_conditions=additional_conditions), query_filters, as_dict=True)
+	""".format(additional_conditions=gl_conditions), query_filters, as_dict=True)
+
+	if use_period_balances:
+		period_balance_conditions = " and {0}".format(" and ".join(period_balance_conditions + additional_conditions)) \
+			if period_balance_conditions or additional_conditions else ""
+
+		gle += frappe.db.sql("""
+			select
+				account, sum(debit) as opening_debit, sum(credit) as opening_credit
+			from `tabAccount Period Balance`
+			where
+				company = %(company)s
+				{additional_conditions}
+				and period_start_date < %(period_start_date)s
+				and account in (select name from `tabAccount` where report_type=%(report_type)s)
+			group by account
+		""".format(additional_conditions=period_balance_conditions), query_filters, as_dict=True)
 
 	opening = frappe._dict()
 	for d in gle:
-		opening.setdefault(d.account, d)
+		if d.account in opening:
+			opening[d.account].opening_debit = flt(opening[d.account].opening_debit) + flt(d.opening_debit)
+			opening[d.account].opening_credit = flt(opening[d.account].opening_credit) + flt(d.opening_credit)
+		else:
+			opening[d.account] = d
 
 	hooks = frappe.get_hooks('get_opening_account_balances')
 	for method in hooks:
@@ -5,7 +5,7 @@
 
 import frappe, erpnext
 import frappe.defaults
-from frappe.utils import nowdate, cstr, flt, cint, now, getdate
+from frappe.utils import nowdate, cstr, flt, cint, now, getdate, add_days
 from frappe import throw, _
 from frappe.utils import formatdate, get_number_format_info
 # imported to enable erpnext.accounts.utils.get_account_currency
@@ -13,6 +13,8 @@ from erpnext.accounts.doctype.account.account import get_account_currency
 
 from erpnext.stock.utils import get_stock_value_on
 from erpnext.stock import get_warehouse_account_map
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import can_use_account_period_balances,\
+	get_period_start_date, get_period_end_date
 
 
 class FiscalYearError(frappe.ValidationError):
@@ -105,9 +107,13 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 		cost_center = frappe.form_dict.get("cost_center")
 
 
+	# conditions on GL Entry dates and voucher types, the remaining conditions are applied on
+	# Account Period Balance as well if complete periods can be read from it
+	date_cond = []
+	period_balance_cond = []
 	cond = []
 	if date:
-		cond.append("posting_date <= %s" % frappe.db.escape(cstr(date)))
+		date_cond.append("posting_date <= %s" % frappe.db.escape(cstr(date)))
 	else:
 		# get balance of all entries that exist
 		date = nowdate()
@@ -115,17 +121,11 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 	if account:
 		acc = frappe.get_doc("Account", account)
 
-	try:
-		year_start_date = get_fiscal_year(date, company=company, verbose=0)[1]
-	except FiscalYearError:
-		if getdate(date) > getdate(nowdate()):
-			# if fiscal year not found and the date is greater than today
-			# get fiscal year for today's date and its corresponding year start date
-			year_start_date = get_fiscal_year(nowdate(), verbose=1)[1]
-		else:
-			# this indicates that it is a date older than any existing fiscal year.
-			# hence, assuming balance as 0.0
-			return 0.0
+	year_start_date = get_year_start_date_for_balance(date, company)
+	if not year_start_date:
+		# this indicates that it is a date older than any existing fiscal year.
+		# hence, assuming balance as 0.0
+		return 0.0
 
 	if account:
 		report_type = acc.report_type
@@ -133,16 +133,7 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 		report_type = ""
 
 	if cost_center and report_type == 'Profit and Loss':
-		cc = frappe.get_doc("Cost Center", cost_center)
-		if cc.is_group:
-			cond.append(""" exists (
-				select 1 from `tabCost Center` cc where cc.name = gle.cost_center
-				and cc.lft >= %s and cc.rgt <= %s
-			)""" % (cc.lft, cc.rgt))
-
-		else:
-			cond.append("""gle.cost_center = %s """ % (frappe.db.escape(cost_center, percent=False), ))
-
+		cond.append(get_cost_center_condition(cost_center))
 
 	if account:
 
@@ -152,7 +143,9 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 
 		if report_type == 'Profit and Loss':
 			# for pl accounts, get balance within a fiscal year
-			cond.append("posting_date >= '%s' and voucher_type != 'Period Closing Voucher'" \
+			date_cond.append("posting_date >= '%s' and voucher_type != 'Period Closing Voucher'" \
+				% year_start_date)
+			period_balance_cond.append("period_start_date >= '%s' and is_period_closing = 0" \
 				% year_start_date)
 		# different filter for group and ledger - improved performance
 		if acc.is_group:
@@ -180,15 +173,247 @@ def get_balance_on(account=None, date=None, party_type=None, party=None, company
 			select_field = "sum(debit_in_account_currency) - sum(credit_in_account_currency)"
 		else:
 			select_field = "sum(debit) - sum(credit)"
+
+		# party balances are not summarized
+		if not (party_type and party) and can_use_account_period_balances() \
+				and (report_type != 'Profit and Loss' or getdate(year_start_date).day == 1):
+			return get_balance_from_account_period_balances(select_field, cond, date_cond, period_balance_cond,
+				date=date if date_cond else None)
+
 		bal = frappe.db.sql("""
 			SELECT {0}
 			FROM `tabGL Entry` gle
-			WHERE {1}""".format(select_field, " and ".join(cond)))[0][0]
+			WHERE {1}""".format(select_field, " and ".join(date_cond + cond)))[0][0]
 
 		# if bal is None, return 0
 		return flt(bal)
 
 
+def get_balance_from_account_period_balances(select_field, cond, date_cond, period_balance_cond, date=None):
+	"""Returns balance of complete periods from Account Period Balance and the rest from GL Entry"""
+	if date:
+		period_start_date = get_period_start_date(date)
+		if get_period_end_date(date) == getdate(date):
+			period_start_date = add_days(get_period_end_date(date), 1)
+
+		period_balance_cond = period_balance_cond + ["period_start_date < '%s'" % period_start_date]
+		date_cond = date_cond + ["posting_date >= '%s'" % period_start_date]
+
+	bal = frappe.db.sql("""
+		SELECT {0}
+		FROM `tabAccount Period Balance` gle
+		WHERE {1}""".format(select_field, " and ".join(period_balance_cond + cond)))[0][0]
+
+	if date:
+		bal = flt(bal) + flt(frappe.db.sql("""
+			SELECT {0}
+			FROM `tabGL Entry` gle
+			WHERE {1}""".format(select_field, " and ".join(date_cond + cond)))[0][0])
+
+	return flt(bal)
+
+
+def get_balances_on(accounts=None, date=None, party_type=None, parties=None, company=None,
+		in_account_currency=True, cost_center=None, account=None, ignore_account_permission=False):
+	"""
+		Returns balances as of date of multiple accounts as {account: balance} or, if party type and parties
+		are given, of multiple parties as {party: balance}, with the same result as get_balance_on for each.
+
+		Balances are read with a single query grouped by ledger account or party instead of a query per account
+		and balances of group accounts are rolled up from their ledger accounts using nested sets.
+	"""
+	if party_type and parties:
+		return get_party_balances_on(party_type, parties, date=date, company=company,
+			in_account_currency=in_account_currency, cost_center=cost_center, account=account,
+			ignore_account_permission=ignore_account_permission)
+
+	accounts = list(set(accounts or []))
+	out = frappe._dict((d, 0.0) for d in accounts)
+	if not accounts:
+		return out
+
+	year_start_date = get_year_start_date_for_balance(date, company)
+	if not year_start_date:
+		return out
+
+	if not (frappe.flags.ignore_account_permission or ignore_account_permission):
+		# user permissions are applied per account, as by check_permission in get_balance_on
+		permitted_accounts = set(d.name for d in frappe.get_list("Account", fields=["name"],
+			filters={"name": ["in", accounts]}))
+		for name in accounts:
+			if name not in permitted_accounts:
+				frappe.get_doc("Account", name).check_permission("read")
+
+	account_details = frappe.db.sql("""
+		select name, lft, rgt, is_group, report_type, account_currency, company
+		from `tabAccount`
+		where name in %s
+	""", [accounts], as_dict=1)
+
+	pl_accounts = [d for d in account_details if d.report_type == 'Profit and Loss']
+	bs_accounts = [d for d in account_details if d.report_type != 'Profit and Loss']
+
+	for report_type, report_type_accounts in (("Balance Sheet", bs_accounts), ("Profit and Loss", pl_accounts)):
+		if not report_type_accounts:
+			continue
+
+		ledger_balances = get_ledger_account_balances(report_type_accounts, report_type, date, year_start_date,
+			company=company, cost_center=cost_center)
+
+		for acc in report_type_accounts:
+			# If group and currency same as company,
+			# always return balance based on debit and credit in company currency
+			use_company_currency = not in_account_currency or (acc.is_group
+				and acc.account_currency == frappe.get_cached_value('Company', acc.company, "default_currency"))
+			balance_field = "balance" if use_company_currency else "balance_in_account_currency"
+
+			out[acc.name] = flt(sum(d[balance_field] for d in ledger_balances if acc.lft <= d.lft and d.rgt <= acc.rgt))
+
+	return out
+
+
+def get_ledger_account_balances(accounts, report_type, date, year_start_date, company=None, cost_center=None):
+	"""Returns balances of ledger accounts within the nested set ranges of the given accounts grouped by account"""
+	date_cond = []
+	period_balance_cond = []
+	cond = []
+	if date:
+		date_cond.append("gle.posting_date <= %s" % frappe.db.escape(cstr(date)))
+
+	if report_type == 'Profit and Loss':
+		# for pl accounts, get balance within a fiscal year
+		date_cond.append("gle.posting_date >= '%s' and gle.voucher_type != 'Period Closing Voucher'" \
+			% year_start_date)
+		period_balance_cond.append("gle.period_start_date >= '%s' and gle.is_period_closing = 0" \
+			% year_start_date)
+
+		if cost_center:
+			cond.append(get_cost_center_condition(cost_center))
+
+	# skip ranges contained in a preceding range so that ledger accounts are not repeated
+	ranges = []
+	for d in sorted(accounts, key=lambda d: d.lft):
+		if not ranges or d.rgt > ranges[-1][1]:
+			ranges.append((cint(d.lft), cint(d.rgt)))
+
+	cond.append("({0})".format(" or ".join("(ac.lft >= %s and ac.rgt <= %s)" % r for r in ranges)))
+
+	if company:
+		cond.append("gle.company = %s" % frappe.db.escape(company, percent=False))
+
+	def get_balances(table, conditions):
+		return frappe.db.sql("""
+			select gle.account, ac.lft, ac.rgt,
+				sum(gle.debit) - sum(gle.credit) as balance,
+				sum(gle.debit_in_account_currency) - sum(gle.credit_in_account_currency) as balance_in_account_currency
+			from `{0}` gle
+			inner join `tabAccount` ac on ac.name = gle.account
+			where {1}
+			group by gle.account
+		""".format(table, " and ".join(conditions)), as_dict=1)
+
+	if not (can_use_account_period_balances()
+			and (report_type != 'Profit and Loss' or getdate(year_start_date).day == 1)):
+		return get_balances("tabGL Entry", date_cond + cond)
+
+	# complete periods from Account Period Balance and the rest from GL Entry
+	if date:
+		period_start_date = get_period_start_date(date)
+		if get_period_end_date(date) == getdate(date):
+			period_start_date = add_days(get_period_end_date(date), 1)
+
+		period_balance_cond.append("gle.period_start_date < '%s'" % period_start_date)
+		date_cond.append("gle.posting_date >= '%s'" % period_start_date)
+
+	balances = get_balances("tabAccount Period Balance", period_balance_cond + cond)
+	if date:
+		balances += get_balances("tabGL Entry", date_cond + cond)
+
+	return balances
+
+
+def get_party_balances_on(party_type, parties, date=None, company=None, in_account_currency=True,
+		cost_center=None, account=None, ignore_account_permission=False):
+	"""Returns balances of multiple parties, optionally in an account, as {party: balance}"""
+	parties = list(set(parties))
+	out = frappe._dict((d, 0.0) for d in parties)
+
+	year_start_date = get_year_start_date_for_balance(date, company)
+	if not year_start_date:
+		return out
+
+	cond = [
+		"gle.party_type = %s" % frappe.db.escape(party_type),
+		"gle.party in ({0})".format(", ".join(frappe.db.escape(d, percent=False) for d in parties))
+	]
+
+	if date:
+		cond.append("gle.posting_date <= %s" % frappe.db.escape(cstr(date)))
+
+	if account:
+		acc = frappe.get_cached_doc("Account", account)
+		if not (frappe.flags.ignore_account_permission or ignore_account_permission):
+			acc.check_permission("read")
+
+		if acc.report_type == 'Profit and Loss':
+			cond.append("gle.posting_date >= '%s' and gle.voucher_type != 'Period Closing Voucher'" \
+				% year_start_date)
+			if cost_center:
+				cond.append(get_cost_center_condition(cost_center))
+
+		if acc.is_group:
+			cond.append("""exists (
+				select name from `tabAccount` ac where ac.name = gle.account
+				and ac.lft >= %s and ac.rgt <= %s
+			)""" % (acc.lft, acc.rgt))
+
+			if acc.account_currency == frappe.get_cached_value('Company', acc.company, "default_currency"):
+				in_account_currency = False
+		else:
+			cond.append("gle.account = %s" % frappe.db.escape(account, percent=False))
+
+	if company:
+		cond.append("gle.company = %s" % frappe.db.escape(company, percent=False))
+
+	if in_account_currency:
+		select_field = "sum(gle.debit_in_account_currency) - sum(gle.credit_in_account_currency)"
+	else:
+		select_field = "sum(gle.debit) - sum(gle.credit)"
+
+	# party balances are not summarized
+	for party, balance in frappe.db.sql("""
+		select gle.party, {0}
+		from `tabGL Entry` gle
+		where {1}
+		group by gle.party
+	""".format(select_field, " and ".join(cond))):
+		out[party] = flt(balance)
+
+	return out
+
+
+def get_year_start_date_for_balance(date, company=None):
+	"""Returns start date of the fiscal year of date for balances or None if date is older than any fiscal year"""
+	try:
+		return get_fiscal_year(date or nowdate(), company=company, verbose=0)[1]
+	except FiscalYearError:
+		if getdate(date) > getdate(nowdate()):
+			# if fiscal year not found and the date is greater than today
+			# get fiscal year for today's date and its corresponding year start date
+			return get_fiscal_year(nowdate(), verbose=1)[1]
+
+
+def get_cost_center_condition(cost_center):
+	cc = frappe.get_cached_doc("Cost Center", cost_center)
+	if cc.is_group:
+		return """exists (
+			select 1 from `tabCost Center` cc where cc.name = gle.cost_center
+			and cc.lft >= %s and cc.rgt <= %s
+		)""" % (cc.lft, cc.rgt)
+	else:
+		return "gle.cost_center = %s" % frappe.db.escape(cost_center, percent=False)
+
+
 def get_balance_on_voucher(voucher_type, voucher_no, party_type, party, account, dr_or_cr=None, include_original_references=False):
 	if not dr_or_cr:
 		if erpnext.get_party_account_type(party_type) == 'Receivable':
@@ -701,6 +926,9 @@ def get_company_default(company, fieldname):
 
 
 def fix_total_debit_credit():
+	from erpnext.accounts.doctype.account_period_balance.account_period_balance import \
+		add_voucher_to_account_period_balances, remove_voucher_from_account_period_balances
+
 	vouchers = frappe.db.sql("""select voucher_type, voucher_no,
 		sum(debit) - sum(credit) as diff
 		from `tabGL Entry`
@@ -711,10 +939,12 @@ def fix_total_debit_credit():
 		if abs(d.diff) > 0:
 			dr_or_cr = d.voucher_type == "Sales Invoice" and "credit" or "debit"
 
+			remove_voucher_from_account_period_balances(d.voucher_type, d.voucher_no)
 			frappe.db.sql("""update `tabGL Entry` set %s = %s + %s
 				where voucher_type = %s and voucher_no = %s and %s > 0 limit 1""" %
 				(dr_or_cr, dr_or_cr, '%s', '%s', '%s', dr_or_cr),
 				(d.diff, d.voucher_type, d.voucher_no))
+			add_voucher_to_account_period_balances(d.voucher_type, d.voucher_no)
 
 
 def get_stock_and_account_balance(account=None, posting_date=None, company=None):
@@ -918,12 +1148,17 @@ def get_children(doctype, parent, company, is_root=False):
 	if doctype == 'Account':
 		sort_accounts(acc, is_root, key="value")
 		company_currency = frappe.get_cached_value('Company',  company,  "default_currency")
+		account_names = [each.get("value") for each in acc]
+		balances = get_balances_on(account_names, in_account_currency=False, company=company)
+		balances_in_account_currency = get_balances_on([each.get("value") for each in acc
+			if each.account_currency != company_currency], company=company)
+
 		for each in acc:
 			each["company_currency"] = company_currency
-			each["balance"] = flt(get_balance_on(each.get("value"), in_account_currency=False, company=company))
+			each["balance"] = flt(balances.get(each.get("value")))
 
 			if each.account_currency != company_currency:
-				each["balance_in_account_currency"] = flt(get_balance_on(each.get("value"), company=company))
+				each["balance_in_account_currency"] = flt(balances_in_account_currency.get(each.get("value")))
 
 	return acc
 
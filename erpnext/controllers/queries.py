@@ -8,6 +8,8 @@ from frappe.desk.reportview import get_match_cond, get_filters_cond
 from frappe.utils import nowdate, getdate, flt, cstr, cint
 from collections import defaultdict
 from frappe.utils import unique
+from erpnext.stock.doctype.item_search_token.item_search_token import get_item_search_query, get_item_search_fields,\
+	is_item_search_token_index_current
 
 
 # searches for active employees
@@ -195,17 +197,39 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 		if not field in ["name", "item_name", "item_group", "brand"]]
 
 	if extra_searchfields:
-		columns = ", " + ", ".join(extra_searchfields)
+		columns = ", " + ", ".join(["tabItem.{0}".format(field) for field in extra_searchfields])
 
 	searchfields = searchfields + [field for field in [searchfield or "name", "item_code", "item_group", "item_name"]
 		if not field in searchfields]
-	searchfields = " or ".join([field + " like %(txt)s" for field in searchfields])
 
-	# Description Conditions
-	description_cond = ''
-	if frappe.db.count('Item', cache=True) < 50000:
-		# scan description only if items are less than 50000
-		description_cond = 'or tabItem.description LIKE %(txt)s'
+	# Search using Item Search Tokens if all search fields are indexed
+	item_search = None
+	if set(searchfields) <= set(["name", "item_code", "item_name"] + get_item_search_fields()) \
+			and is_item_search_token_index_current():
+		item_search = get_item_search_query(txt)
+
+	search_join = ""
+	search_order_by = ""
+	search_values = {}
+	if item_search:
+		search_join = "inner join ({0}) item_search on item_search.item_code = tabItem.name".format(item_search[0])
+		search_order_by = "item_search.search_rank,"
+		search_values = item_search[1]
+		search_cond = ""
+	else:
+		searchfields = " or ".join([field + " like %(txt)s" for field in searchfields])
+
+		# Description Conditions
+		description_cond = ''
+		if frappe.db.count('Item', cache=True) < 50000:
+			# scan description only if items are less than 50000
+			description_cond = 'or tabItem.description LIKE %(txt)s'
+
+		search_cond = """and (
+			{scond}
+			or tabItem.name IN (select parent from `tabItem Barcode` where barcode LIKE %(txt)s)
+			{description_cond}
+		)""".format(scond=searchfields, description_cond=description_cond)
 
 	# Item applicability conditions
 	has_applicable_items_cond = ""
@@ -240,42 +264,44 @@ def item_query(doctype, txt, searchfield, start, page_len, filters, as_dict=Fals
 
 	default_conditions = "and {0}".format(" and ".join(default_conditions)) if default_conditions else ""
 
+	values = {
+		"today": nowdate(),
+		"txt": "%%%s%%" % txt,
+		"_txt": txt.replace("%", ""),
+		"start": start,
+		"page_len": page_len
+	}
+	values.update(search_values)
+
 	return frappe.db.sql("""select tabItem.name,
 		if(length(tabItem.item_name) > 50,
-			concat(substr(tabItem.item_name, 1, 50), "..."), item_name) as item_name,
+			concat(substr(tabItem.item_name, 1, 50), "..."), tabItem.item_name) as item_name,
 		tabItem.item_group, tabItem.brand
 		{columns}
 		from tabItem
+		{search_join}
 		where tabItem.docstatus < 2
 			{default_conditions}
-			and (
-				{scond}
-				or tabItem.name IN (select parent from `tabItem Barcode` where barcode LIKE %(txt)s)
-				{description_cond}
-			)
+			{search_cond}
 			{fcond}
 			{mcond}
 			{has_applicable_items_cond}
 		order by
-			if(locate(%(_txt)s, name), locate(%(_txt)s, name), 99999),
-			if(locate(%(_txt)s, item_name), locate(%(_txt)s, item_name), 99999),
-			idx desc,
-			name, item_name
+			{search_order_by}
+			if(locate(%(_txt)s, tabItem.name), locate(%(_txt)s, tabItem.name), 99999),
+			if(locate(%(_txt)s, tabItem.item_name), locate(%(_txt)s, tabItem.item_name), 99999),
+			tabItem.idx desc,
+			tabItem.name, tabItem.item_name
 		limit %(start)s, %(page_len)s """.format(
 			columns=columns,
+			search_join=search_join,
 			default_conditions=default_conditions,
-			scond=searchfields,
+			search_cond=search_cond,
+			search_order_by=search_order_by,
 			fcond=get_filters_cond(doctype, filters, conditions).replace('%', '%%'),
 			mcond=get_match_cond(doctype).replace('%', '%%'),
-			description_cond=description_cond,
 			has_applicable_items_cond=has_applicable_items_cond),
-			{
-				"today": nowdate(),
-				"txt": "%%%s%%" % txt,
-				"_txt": txt.replace("%", ""),
-				"start": start,
-				"page_len": page_len
-			}, as_dict=as_dict)
+			values, as_dict=as_dict)
 
 
 @frappe.whitelist()
@@ -719,13 +745,14 @@ def get_batch_no(doctype, txt, searchfield, start, page_len, filters):
 		cond += " and (batch.expiry_date is null or batch.expiry_date >= %(posting_date)s)"
 
 	if filters.get("warehouse"):
-		cond += " and sle.warehouse = %(warehouse)s"
+		cond += " and bb.warehouse = %(warehouse)s"
 
 	batch_nos = None
 	args = {
 		'item_code': filters.get("item_code"),
 		'warehouse': filters.get("warehouse"),
 		'posting_date': filters.get('posting_date'),
+		'stock_uom': frappe.get_cached_value("Item", filters.get("item_code"), "stock_uom"),
 		'txt': "%{0}%".format(txt),
 		"start": start,
 		"page_len": page_len
@@ -734,29 +761,29 @@ def get_batch_no(doctype, txt, searchfield, start, page_len, filters):
 	if filters.get("show_all") or filters.get("is_return"):
 		having_clause = ""
 	elif filters.get("show_negative"):
-		having_clause = "having sum(sle.actual_qty) != 0"
+		having_clause = "having round(sum(bb.actual_qty), 9) != 0"
 	else:
-		having_clause = "having sum(sle.actual_qty) > 0"
+		having_clause = "having round(sum(bb.actual_qty), 9) > 0"
 
 	if filters.get("is_return") or filters.get('is_receipt'):
 		having_clause = ""
 
 	batch_nos = frappe.db.sql("""
-		select sle.batch_no,
-			sum(sle.actual_qty), sle.stock_uom,
-			min(timestamp(sle.posting_date, sle.posting_time)) as received_dt,
+		select bb.batch_no,
+			round(sum(bb.actual_qty), 9), %(stock_uom)s,
+			min(bb.received_date) as received_dt,
 			batch.manufacturing_date,
 			batch.expiry_date
-		from `tabStock Ledger Entry` sle
-		inner join `tabBatch` batch on sle.batch_no = batch.name
+		from `tabBatch Balance` bb
+		inner join `tabBatch` batch on bb.batch_no = batch.name
 		where
 			batch.disabled = 0
-			and sle.item_code = %(item_code)s
-			and sle.batch_no like %(txt)s
+			and bb.item_code = %(item_code)s
+			and bb.batch_no like %(txt)s
 			{cond}
-		group by batch_no
+		group by bb.batch_no
 		{having_clause}
-		order by batch.expiry_date, received_dt, sle.batch_no desc
+		order by batch.expiry_date, received_dt, bb.batch_no desc
 		limit %(start)s, %(page_len)s
 	""".format(
 		cond=cond,
@@ -192,6 +192,23 @@ doc_events = {
 	"Contact": {
 		"on_trash": "erpnext.support.doctype.issue.issue.update_issue",
 	},
+	("Pricing Rule", "Item Group", "Customer Group", "Territory", "Supplier Group"): {
+		"on_change": "erpnext.accounts.doctype.pricing_rule.utils.clear_pricing_rule_index",
+		"on_trash": "erpnext.accounts.doctype.pricing_rule.utils.clear_pricing_rule_index",
+		"after_rename": "erpnext.accounts.doctype.pricing_rule.utils.clear_pricing_rule_index"
+	},
+	("BOM", "Item"): {
+		"on_change": "erpnext.manufacturing.doctype.bom.bom_explosion.clear_bom_explosion_cache",
+		"on_trash": "erpnext.manufacturing.doctype.bom.bom_explosion.clear_bom_explosion_cache",
+		"after_rename": "erpnext.manufacturing.doctype.bom.bom_explosion.clear_bom_explosion_cache"
+	},
+	"Item Group": {
+		"after_rename": "erpnext.stock.doctype.item_search_token.item_search_token.update_item_search_tokens_of_item_group"
+	},
+	"Property Setter": {
+		"on_update": "erpnext.stock.doctype.item_search_token.item_search_token.queue_rebuild_item_search_tokens",
+		"on_trash": "erpnext.stock.doctype.item_search_token.item_search_token.queue_rebuild_item_search_tokens"
+	},
 }
 
 naming_series_variables = {
@@ -213,9 +230,13 @@ scheduler_events = {
 		"erpnext.erpnext_integrations.doctype.amazon_mws_settings.amazon_mws_settings.schedule_get_order_details",
 		"erpnext.erpnext_integrations.doctype.plaid_settings.plaid_settings.automatic_synchronization",
 		"erpnext.hr.doctype.shift_type.shift_type.process_auto_attendance_for_all_shifts",
+		"erpnext.hr.doctype.payroll_entry.payroll_entry.fail_stale_payroll_chunks",
 		"erpnext.support.doctype.issue.issue.set_service_level_agreement_variance",
 		"erpnext.erpnext_integrations.fbr_pos_integration.post_fbr_pos_invoices_without_number",
 	],
+	"hourly_long": [
+		"erpnext.stock.doctype.repost_item_valuation.repost_item_valuation.repost_entries",
+	],
 	"daily": [
 		"erpnext.stock.reorder_item.reorder_item",
 		"erpnext.support.doctype.issue.issue.auto_close_tickets",
@@ -240,6 +261,7 @@ scheduler_events = {
 	],
 	"daily_long": [
 		"erpnext.setup.doctype.email_digest.email_digest.send",
+		"erpnext.stock.doctype.stock_closing_balance.stock_closing_balance.create_stock_closing_balances",
 		"erpnext.manufacturing.doctype.bom_update_tool.bom_update_tool.update_latest_price_in_all_boms",
 		"erpnext.hr.doctype.leave_ledger_entry.leave_ledger_entry.process_expired_allocation",
 		"erpnext.hr.doctype.leave_encashment.leave_encashment.generate_leave_encashment",
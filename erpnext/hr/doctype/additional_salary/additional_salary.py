@@ -57,21 +57,68 @@ def get_additional_salary_component(employee, start_date, end_date, component_ty
 		'component_type': "Earning" if component_type == "earnings" else "Deduction"
 	}, as_dict=1)
 
+	return make_additional_salary_components(additional_components)
+
+def get_additional_salary_components_for_employees(employees, start_date, end_date):
+	"""Returns {(employee, component_type): additional salary components} of multiple employees"""
+	if not employees:
+		return {}
+
+	additional_components = frappe.db.sql("""
+		select employee, type, salary_component, sum(amount) as amount, overwrite_salary_structure_amount,
+			deduct_full_tax_on_selected_payroll_date
+		from `tabAdditional Salary`
+		where employee in %(employees)s
+			and docstatus = 1
+			and payroll_date between %(from_date)s and %(to_date)s
+		group by employee, type, salary_component, overwrite_salary_structure_amount
+		order by employee, type, salary_component, overwrite_salary_structure_amount
+	""", {
+		'employees': employees,
+		'from_date': start_date,
+		'to_date': end_date
+	}, as_dict=1)
+
+	rows_by_employee = {}
+	for d in additional_components:
+		component_type = "earnings" if d.type == "Earning" else "deductions"
+		rows_by_employee.setdefault((d.employee, component_type), []).append(d)
+
+	component_details = get_salary_component_details(list(set(d.salary_component for d in additional_components)))
+	return {key: make_additional_salary_components(rows, component_details)
+		for key, rows in rows_by_employee.items()}
+
+def make_additional_salary_components(additional_components, component_details=None):
+	if component_details is None:
+		component_details = get_salary_component_details(list(set(d.salary_component for d in additional_components)))
+
 	additional_components_list = []
-	component_fields = ["depends_on_payment_days", "salary_component_abbr", "is_tax_applicable", "variable_based_on_taxable_salary", 'type' , 'do_not_include_in_total']
 	for d in additional_components:
 		struct_row = frappe._dict({'salary_component': d.salary_component})
-		component = frappe.get_all("Salary Component", filters={'name': d.salary_component}, fields=component_fields)
+		component = component_details.get(d.salary_component)
 		if component:
-			struct_row.update(component[0])
+			struct_row.update(component)
 
 		struct_row['deduct_full_tax_on_selected_payroll_date'] = d.deduct_full_tax_on_selected_payroll_date
 		struct_row['is_additional_component'] = 1
 
 		additional_components_list.append(frappe._dict({
 			'amount': d.amount,
-			'type': component[0].type,
+			'type': component.type,
 			'struct_row': struct_row,
 			'overwrite': d.overwrite_salary_structure_amount,
 		}))
-	return additional_components_list
\ No newline at end of file
+	return additional_components_list
+
+def get_salary_component_details(salary_components):
+	if not salary_components:
+		return {}
+
+	component_fields = ["name", "depends_on_payment_days", "salary_component_abbr", "is_tax_applicable",
+		"variable_based_on_taxable_salary", 'type' , 'do_not_include_in_total']
+
+	out = {}
+	for d in frappe.get_all("Salary Component", filters={'name': ['in', salary_components]}, fields=component_fields):
+		out[d.pop("name")] = d
+
+	return out
@@ -156,6 +156,26 @@ def mark_absent(employee, attendance_date, shift=None):
 		return attendance.name
 
 
+def make_auto_attendance(employee, attendance_date, status, shift=None, working_hours=None, late_entry=False,
+		early_exit=False):
+	"""Creates a submitted Attendance marked by auto attendance, inserted directly as submitted"""
+	attendance = frappe.get_doc({
+		'doctype': 'Attendance',
+		'employee': employee,
+		'attendance_date': attendance_date,
+		'status': status,
+		'working_hours': working_hours,
+		'company': frappe.db.get_value("Employee", employee, "company", cache=1),
+		'shift': shift,
+		'late_entry': late_entry,
+		'early_exit': early_exit,
+		'docstatus': 1
+	})
+	attendance.flags.from_auto_attendance = True
+	attendance.insert()
+	return attendance
+
+
 def get_marked_attendance_dates_between(employee, start_date, end_date):
 	return frappe.db.sql_list("""
 		select attendance_date
@@ -164,3 +184,16 @@ def get_marked_attendance_dates_between(employee, start_date, end_date):
 			and attendance_date between %(start_date)s and %(end_date)s
 		order by attendance_date
 	""", {"employee": employee, "start_date": start_date, "end_date": end_date})
+
+
+def get_marked_attendance_of_employees(employees, start_date, end_date):
+	"""Returns a set of (employee, attendance_date) of submitted Attendance of employees between the dates"""
+	if not employees:
+		return set()
+
+	return set(frappe.db.sql("""
+		select employee, attendance_date
+		from `tabAttendance`
+		where docstatus = 1 and employee in %(employees)s
+			and attendance_date between %(start_date)s and %(end_date)s
+	""", {"employees": employees, "start_date": start_date, "end_date": end_date}))
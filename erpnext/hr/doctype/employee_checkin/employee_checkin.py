@@ -3,7 +3,7 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe.utils import cint, get_datetime
+from frappe.utils import cint, get_datetime, getdate
 from frappe.model.document import Document
 from frappe import _
 
@@ -190,6 +190,68 @@ def mark_attendance_and_link_log(logs, attendance_status, attendance_date, worki
 		frappe.throw(_('{} is an invalid Attendance Status.').format(attendance_status))
 
 
+def mark_attendance_and_link_logs(shift_attendance, shift=None):
+	"""Creates attendances for multiple sets of logs and links the attendances to the Employee Checkins in bulk.
+	Note: Logs of dates that already have an attendance are marked as skipped.
+
+	:param shift_attendance: List of dicts with logs, attendance_status, attendance_date, working_hours, late_entry and early_exit.
+	"""
+	from erpnext.hr.doctype.attendance.attendance import get_marked_attendance_of_employees, make_auto_attendance
+
+	if not shift_attendance:
+		return
+
+	for d in shift_attendance:
+		if d.attendance_status not in ('Skip', 'Present', 'Absent', 'Half Day'):
+			frappe.throw(_('{} is an invalid Attendance Status.').format(d.attendance_status))
+
+	dates = [getdate(d.attendance_date) for d in shift_attendance]
+	marked_attendance = get_marked_attendance_of_employees(list(set(d.logs[0].employee for d in shift_attendance)),
+		min(dates), max(dates))
+
+	skipped_logs = []
+	attendance_logs = {}
+	for d in shift_attendance:
+		log_names = [x.name for x in d.logs]
+		employee = d.logs[0].employee
+		attendance_date = getdate(d.attendance_date)
+
+		if d.attendance_status == 'Skip' or (employee, attendance_date) in marked_attendance:
+			skipped_logs += log_names
+			continue
+
+		attendance = make_auto_attendance(employee, attendance_date, d.attendance_status, shift,
+			d.working_hours, d.late_entry, d.early_exit)
+		marked_attendance.add((employee, attendance_date))
+		attendance_logs[attendance.name] = log_names
+
+	if skipped_logs:
+		frappe.db.sql("""update `tabEmployee Checkin`
+			set skip_auto_attendance = 1
+			where name in %s""", [skipped_logs])
+
+	link_logs_to_attendance(attendance_logs)
+
+
+def link_logs_to_attendance(attendance_logs, chunk_size=500):
+	"""Sets attendance of Employee Checkins from {attendance: [log names]} with a query per chunk of logs"""
+	log_attendance = [(log_name, attendance) for attendance, log_names in attendance_logs.items()
+		for log_name in log_names]
+
+	for i in range(0, len(log_attendance), chunk_size):
+		chunk = log_attendance[i:i + chunk_size]
+
+		values = []
+		for log_name, attendance in chunk:
+			values += [log_name, attendance]
+
+		frappe.db.sql("""
+			update `tabEmployee Checkin`
+			set attendance = case name {0} end
+			where name in %s
+		""".format(" ".join(["when %s then %s"] * len(chunk))), values + [[log_name for log_name, attendance in chunk]])
+
+
 def calculate_working_hours(logs, check_in_out_type, working_hours_calc_type):
 	"""Given a set of logs in chronological order calculates the total working hours based on the parameters.
 	Zero is returned for all invalid cases.
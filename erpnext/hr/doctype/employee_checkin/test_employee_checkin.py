@@ -7,7 +7,8 @@ from frappe.utils import now_datetime, nowdate, to_timedelta
 import unittest
 from datetime import timedelta
 
-from erpnext.hr.doctype.employee_checkin.employee_checkin import add_log_based_on_employee_field, mark_attendance_and_link_log, calculate_working_hours
+from erpnext.hr.doctype.employee_checkin.employee_checkin import add_log_based_on_employee_field, mark_attendance_and_link_log, calculate_working_hours, \
+	mark_attendance_and_link_logs
 from erpnext.hr.doctype.employee.test_employee import make_employee
 
 class TestEmployeeCheckin(unittest.TestCase):
@@ -43,6 +44,32 @@ class TestEmployeeCheckin(unittest.TestCase):
 			'employee':employee, 'attendance_date':now_date})
 		self.assertEqual(attendance_count, 1)		
 
+	def test_mark_attendance_and_link_logs(self):
+		employee = make_employee("test_mark_attendance_and_link_logs@example.com")
+		frappe.db.delete('Attendance', {'employee': employee})
+
+		now_date = nowdate()
+		logs = make_n_checkins(employee, 2, 2)
+		duplicate_logs = make_n_checkins(employee, 2, 1)
+		mark_attendance_and_link_logs([
+			frappe._dict(logs=logs, attendance_status='Present', attendance_date=now_date, working_hours=8.2),
+			frappe._dict(logs=duplicate_logs, attendance_status='Present', attendance_date=now_date, working_hours=1),
+		])
+
+		attendance = frappe.db.get_value('Attendance', {'employee': employee, 'attendance_date': now_date,
+			'docstatus': 1}, ['name', 'status', 'working_hours'], as_dict=1)
+		self.assertEqual(attendance.status, 'Present')
+		self.assertEqual(attendance.working_hours, 8.2)
+
+		log_names = [log.name for log in logs]
+		self.assertEqual(frappe.db.count('Employee Checkin', {'name': ['in', log_names],
+			'attendance': attendance.name}), 2)
+
+		# logs of a date with an attendance already marked are skipped
+		log_names = [log.name for log in duplicate_logs]
+		self.assertEqual(frappe.db.count('Employee Checkin', {'name': ['in', log_names],
+			'skip_auto_attendance': 1}), 2)
+
 	def test_calculate_working_hours(self):
 		check_in_out_type = ['Alternating entries as IN and OUT during the same shift',
 			'Strictly based on Log Type in Employee Checkin'] 
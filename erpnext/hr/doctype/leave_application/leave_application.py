@@ -10,7 +10,9 @@ from erpnext.hr.doctype.leave_block_list.leave_block_list import get_applicable_
 from erpnext.hr.doctype.employee.employee import get_holiday_list_for_employee
 from erpnext.buying.doctype.supplier_scorecard.supplier_scorecard import daterange
 from erpnext.hr.doctype.leave_ledger_entry.leave_ledger_entry import create_leave_ledger_entry,\
-	delete_expired_leave_ledger_entry, get_leave_allocation
+	delete_expired_leave_ledger_entry, get_leave_allocation, load_leave_ledger_cache, clear_leave_ledger_cache,\
+	get_cached_leave_ledger_entries, get_cached_pending_leaves
+from erpnext.hr.doctype.holiday_list.holiday_list import get_holiday_dates_between
 from erpnext.hr.utils import get_employee_leave_policy
 
 
@@ -63,6 +65,9 @@ class LeaveApplication(Document):
 		# notify leave applier about cancellation
 		self.notify_employee()
 
+	def on_change(self):
+		clear_leave_ledger_cache(self.employee)
+
 	def validate_applicable_after(self):
 		if self.leave_type:
 			leave_type = frappe.get_doc("Leave Type", self.leave_type)
@@ -468,6 +473,15 @@ class LeaveApplication(Document):
 
 def get_allocation_expiry(employee, leave_type, to_date, from_date):
 	''' Returns expiry of carry forward allocation in leave ledger entry '''
+	ledger_entries = get_cached_leave_ledger_entries(employee)
+	if ledger_entries is not None:
+		if not from_date or not to_date:
+			return None
+
+		expiry = [d.to_date for d in ledger_entries if d.leave_type == leave_type and d.is_carry_forward
+			and d.transaction_type == 'Leave Allocation' and getdate(from_date) <= d.to_date <= getdate(to_date)]
+		return expiry[0] if expiry else None
+
 	expiry = frappe.get_all("Leave Ledger Entry",
 		filters={
 			'employee': employee,
@@ -502,7 +516,7 @@ def get_number_of_leave_days(employee, leave_type, from_date, to_date, half_day=
 	else:
 		number_of_days = date_diff(to_date, from_date) + 1
 
-	if not late_deduction and not frappe.db.get_value("Leave Type", leave_type, "include_holiday"):
+	if not late_deduction and not frappe.get_cached_value("Leave Type", leave_type, "include_holiday"):
 		number_of_days = flt(number_of_days) - flt(get_holidays(employee, from_date, to_date, holiday_list=holiday_list))
 
 	return number_of_days
@@ -527,18 +541,22 @@ def get_number_of_late_days(employee, from_date, to_date):
 
 @frappe.whitelist()
 def get_leave_details(employee, date):
+	is_new_cache = load_leave_ledger_cache([employee])
+	try:
+		return _get_leave_details(employee, date)
+	finally:
+		if is_new_cache:
+			clear_leave_ledger_cache()
+
+def _get_leave_details(employee, date):
 	allocation_records = get_leave_allocation_records(employee, date)
+	total_allocated_leaves_map = get_total_allocated_leaves(employee, date)
+
 	leave_allocation = {}
 	for d in allocation_records:
 		allocation = allocation_records.get(d, frappe._dict())
 
-		total_allocated_leaves = frappe.db.get_value('Leave Allocation', {
-			'from_date': ('<=', date),
-			'to_date': ('>=', date),
-			'leave_type': allocation.leave_type,
-			'employee': employee,
-			'docstatus': 1
-		}, 'SUM(total_leaves_allocated)') or 0
+		total_allocated_leaves = total_allocated_leaves_map.get(allocation.leave_type) or 0
 
 		remaining_leaves = get_leave_balance_on(employee, d, date, to_date = allocation.to_date,
 			consider_all_leaves_in_the_allocation_period=True)
@@ -561,6 +579,40 @@ def get_leave_details(employee, date):
 
 	return ret
 
+def get_total_allocated_leaves(employee, date):
+	''' Returns {leave_type: total leaves allocated} of submitted Leave Allocations active on date '''
+	return frappe._dict(frappe.db.sql("""
+		select leave_type, sum(total_leaves_allocated)
+		from `tabLeave Allocation`
+		where employee = %(employee)s and docstatus = 1
+			and from_date <= %(date)s and to_date >= %(date)s
+		group by leave_type
+	""", {"employee": employee, "date": date}))
+
+def get_leave_balances(employees, date, leave_types=None, to_date=None,
+		consider_all_leaves_in_the_allocation_period=False):
+	'''
+		Returns leave balances of multiple employees as {employee: {leave_type: balance}},
+		loading their leave ledger once instead of per employee and leave type
+		:param employees: list of employee names
+		:param leave_types: leave types to get balance of, defaults to leave types allocated on date
+		See get_leave_balance_on for other params
+	'''
+	is_new_cache = load_leave_ledger_cache(employees)
+	try:
+		out = {}
+		for employee in employees:
+			employee_leave_types = leave_types or list(get_leave_allocation_records(employee, date))
+			out[employee] = {}
+			for leave_type in employee_leave_types:
+				out[employee][leave_type] = get_leave_balance_on(employee, leave_type, date, to_date=to_date,
+					consider_all_leaves_in_the_allocation_period=consider_all_leaves_in_the_allocation_period)
+
+		return out
+	finally:
+		if is_new_cache:
+			clear_leave_ledger_cache()
+
 @frappe.whitelist()
 def get_leave_balance_on(employee, leave_type, date, to_date=None, consider_all_leaves_in_the_allocation_period=False):
 	'''
@@ -587,7 +639,25 @@ def get_leave_balance_on(employee, leave_type, date, to_date=None, consider_all_
 
 def get_leave_allocation_records(employee, date, leave_type=None):
 	''' returns the total allocated leaves and carry forwarded leaves based on ledger entries '''
+	ledger_entries = get_cached_leave_ledger_entries(employee)
+	if ledger_entries is not None:
+		allocation_details = get_allocation_details_from_ledger_entries(ledger_entries, date, leave_type)
+	else:
+		allocation_details = get_allocation_details(employee, date, leave_type)
+
+	allocated_leaves = frappe._dict()
+	for d in allocation_details:
+		allocated_leaves.setdefault(d.leave_type, frappe._dict({
+			"from_date": d.from_date,
+			"to_date": d.to_date,
+			"total_leaves_allocated": flt(d.cf_leaves) + flt(d.new_leaves),
+			"unused_leaves": d.cf_leaves,
+			"new_leaves_allocated": d.new_leaves,
+			"leave_type": d.leave_type
+		}))
+	return allocated_leaves
 
+def get_allocation_details(employee, date, leave_type=None):
 	conditions = ("and leave_type='%s'" % leave_type) if leave_type else ""
 	allocation_details = frappe.db.sql("""
 		SELECT
@@ -609,20 +679,46 @@ def get_leave_allocation_records(employee, date, leave_type=None):
 		GROUP BY employee, leave_type
 	""".format(conditions), dict(date=date, employee=employee), as_dict=1) #nosec
 
-	allocated_leaves = frappe._dict()
-	for d in allocation_details:
-		allocated_leaves.setdefault(d.leave_type, frappe._dict({
-			"from_date": d.from_date,
-			"to_date": d.to_date,
-			"total_leaves_allocated": flt(d.cf_leaves) + flt(d.new_leaves),
-			"unused_leaves": d.cf_leaves,
-			"new_leaves_allocated": d.new_leaves,
-			"leave_type": d.leave_type
+	return allocation_details
+
+def get_allocation_details_from_ledger_entries(ledger_entries, date, leave_type=None):
+	''' returns allocation details grouped by leave type as in get_allocation_details from cached ledger entries '''
+	date = getdate(date)
+
+	allocation_details = {}
+	for d in ledger_entries:
+		if d.docstatus != 1 or d.transaction_type != "Leave Allocation" or d.is_expired or d.is_lwp:
+			continue
+		if leave_type and d.leave_type != leave_type:
+			continue
+		if not (d.from_date <= date <= d.to_date):
+			continue
+
+		details = allocation_details.setdefault(d.leave_type, frappe._dict({
+			"cf_leaves": 0, "new_leaves": 0, "from_date": d.from_date, "to_date": d.to_date, "leave_type": d.leave_type
 		}))
-	return allocated_leaves
+		if d.is_carry_forward:
+			details.cf_leaves += flt(d.leaves)
+		else:
+			details.new_leaves += flt(d.leaves)
+
+		details.from_date = min(details.from_date, d.from_date)
+		details.to_date = max(details.to_date, d.to_date)
+
+	return list(allocation_details.values())
 
 def get_pending_leaves_for_period(employee, leave_type, from_date, to_date):
 	''' Returns leaves that are pending approval '''
+	pending_leaves = get_cached_pending_leaves(employee)
+	if pending_leaves is not None:
+		if not from_date or not to_date:
+			return 0.0
+
+		from_date, to_date = getdate(from_date), getdate(to_date)
+		leaves = sum([flt(d.total_leave_days) for d in pending_leaves if d.leave_type == leave_type
+			and (from_date <= d.from_date <= to_date or from_date <= d.to_date <= to_date)])
+		return leaves if leaves else 0.0
+
 	leaves = frappe.get_all("Leave Application",
 		filters={
 			"employee": employee,
@@ -680,8 +776,11 @@ def get_leaves_for_period(employee, leave_type, from_date, to_date, do_not_skip_
 			# fetch half day date for leaves with half days
 			if leave_entry.leaves % 1:
 				half_day = 1
-				half_day_date = frappe.db.get_value('Leave Application',
-					{'name': leave_entry.transaction_name}, ['half_day_date'])
+				if 'half_day_date' in leave_entry:
+					half_day_date = leave_entry.half_day_date
+				else:
+					half_day_date = frappe.db.get_value('Leave Application',
+						{'name': leave_entry.transaction_name}, ['half_day_date'])
 
 			leave_days += get_number_of_leave_days(employee, leave_type,
 				leave_entry.from_date, leave_entry.to_date, half_day, half_day_date,
@@ -692,11 +791,25 @@ def get_leaves_for_period(employee, leave_type, from_date, to_date, do_not_skip_
 def skip_expiry_leaves(leave_entry, date):
 	''' Checks whether the expired leaves coincide with the to_date of leave balance check.
 		This allows backdated leave entry creation for non carry forwarded allocation '''
-	end_date = frappe.db.get_value("Leave Allocation", {'name': leave_entry.transaction_name}, ['to_date'])
+	if 'allocation_to_date' in leave_entry:
+		end_date = leave_entry.allocation_to_date
+	else:
+		end_date = frappe.db.get_value("Leave Allocation", {'name': leave_entry.transaction_name}, ['to_date'])
 	return True if getdate(end_date) == getdate(date) and not leave_entry.is_carry_forward else False
 
 def get_leave_entries(employee, leave_type, from_date, to_date):
 	''' Returns leave entries between from_date and to_date. '''
+	ledger_entries = get_cached_leave_ledger_entries(employee)
+	if ledger_entries is not None:
+		if not from_date or not to_date:
+			return []
+
+		from_date, to_date = getdate(from_date), getdate(to_date)
+		return [frappe._dict(d) for d in ledger_entries if d.leave_type == leave_type and d.docstatus == 1
+			and (flt(d.leaves) < 0 or d.is_expired)
+			and (from_date <= d.from_date <= to_date or from_date <= d.to_date <= to_date
+				or (d.from_date < from_date and d.to_date > to_date))]
+
 	return frappe.db.sql("""
 		SELECT
 			employee, leave_type, from_date, to_date, leaves, transaction_name, transaction_type, holiday_list,
@@ -722,6 +835,10 @@ def get_holidays(employee, from_date, to_date, holiday_list = None):
 	if not holiday_list:
 		holiday_list = get_holiday_list_for_employee(employee)
 
+	if frappe.flags.leave_ledger_cache:
+		# holidays of the cached Holiday List are used while computing balances in bulk
+		return len(set(get_holiday_dates_between(holiday_list, from_date, to_date)))
+
 	holidays = frappe.db.sql("""select count(distinct holiday_date) from `tabHoliday` h1, `tabHoliday List` h2
 		where h1.parent = h2.name and h1.holiday_date between %s and %s
 		and h2.name = %s""", (from_date, to_date, holiday_list))[0][0]
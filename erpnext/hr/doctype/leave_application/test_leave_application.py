@@ -408,6 +408,25 @@ class TestLeaveApplication(unittest.TestCase):
 
 		self.assertEqual(get_leave_balance_on(employee.name, leave_type.name, nowdate(), add_days(nowdate(), 8)), 21)
 
+	def test_leave_balances_in_bulk(self):
+		from erpnext.hr.doctype.leave_application.leave_application import get_leave_balances
+
+		employee = get_employee()
+		leave_type = create_leave_type(
+			leave_type_name="_Test_CF_leave_expiry",
+			is_carry_forward=1,
+			expire_carry_forwarded_leaves_after_days=90)
+		leave_type.submit()
+
+		create_carry_forwarded_allocation(employee, leave_type)
+
+		for date, to_date in ((nowdate(), add_days(nowdate(), 8)), (add_days(nowdate(), -85), add_days(nowdate(), -84))):
+			balances = get_leave_balances([employee.name], date, [leave_type.name], to_date)
+			self.assertEqual(balances[employee.name][leave_type.name],
+				get_leave_balance_on(employee.name, leave_type.name, date, to_date))
+
+		self.assertFalse(frappe.flags.leave_ledger_cache)
+
 	def test_earned_leaves_creation(self):
 		leave_period = get_leave_period()
 		employee = get_employee()
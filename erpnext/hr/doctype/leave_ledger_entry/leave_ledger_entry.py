@@ -13,7 +13,12 @@ class LeaveLedgerEntry(Document):
 		if getdate(self.from_date) > getdate(self.to_date):
 			frappe.throw(_("To date needs to be before from date"))
 
+	def on_submit(self):
+		clear_leave_ledger_cache(self.employee)
+
 	def on_cancel(self):
+		clear_leave_ledger_cache(self.employee)
+
 		# allow cancellation of expiry leaves
 		if self.is_expired:
 			frappe.db.set_value("Leave Allocation", self.transaction_name, "expired", 0)
@@ -58,6 +63,8 @@ def create_leave_ledger_entry(ref_doc, args, submit=True):
 	else:
 		delete_ledger_entry(ledger)
 
+	clear_leave_ledger_cache(ledger.employee)
+
 
 def delete_ledger_entry(ledger):
 	''' Delete ledger entry on cancel of leave application/allocation/encashment '''
@@ -75,6 +82,8 @@ def delete_ledger_entry(ledger):
 			`transaction_name`=%s
 			OR `name`=%s""", (ledger.transaction_name, expired_entry))
 
+	clear_leave_ledger_cache(ledger.employee)
+
 
 def get_previous_expiry_ledger_entry(ledger):
 	''' Returns the expiry ledger entry having same creation date as the ledger entry to be cancelled '''
@@ -233,6 +242,7 @@ def delete_expired_leave_ledger_entry(leave_allocation):
 	)
 	if name:
 		frappe.db.sql("""DELETE FROM `tabLeave Ledger Entry` WHERE `name`=%s""", (name))
+		clear_leave_ledger_cache()
 
 
 def get_allocation_leave_balance_summary(allocation_name):
@@ -254,3 +264,73 @@ def get_allocation_leave_balance_summary(allocation_name):
 	leaves_summary.used_leaves = total_leaves
 	leaves_summary.leave_balance = flt(total_leaves) + flt(leaves_summary.allocated_leaves)
 	return leaves_summary
+
+
+def load_leave_ledger_cache(employees):
+	"""
+		Loads Leave Ledger Entries and open Leave Applications of employees with a query each,
+		so that leave balances of the employees are computed without queries per leave type.
+
+		Returns True if the cache was not loaded before, in which case the caller should clear it once done.
+	"""
+	is_new = frappe.flags.leave_ledger_cache is None
+	if is_new:
+		frappe.flags.leave_ledger_cache = frappe._dict({"ledger_entries": {}, "pending_leaves": {}})
+
+	cache = frappe.flags.leave_ledger_cache
+	employees = list(set([employee for employee in employees if employee and employee not in cache.ledger_entries]))
+	if not employees:
+		return is_new
+
+	for employee in employees:
+		cache.ledger_entries[employee] = []
+		cache.pending_leaves[employee] = []
+
+	for d in frappe.db.sql("""
+		SELECT
+			lle.employee, lle.leave_type, lle.from_date, lle.to_date, lle.leaves, lle.transaction_name,
+			lle.transaction_type, lle.holiday_list, lle.is_carry_forward, lle.is_expired, lle.is_late_deduction,
+			lle.is_lwp, lle.docstatus, app.half_day_date, alloc.to_date as allocation_to_date
+		FROM `tabLeave Ledger Entry` lle
+		LEFT JOIN `tabLeave Application` app
+			ON lle.transaction_type = 'Leave Application' AND app.name = lle.transaction_name
+		LEFT JOIN `tabLeave Allocation` alloc
+			ON lle.transaction_type = 'Leave Allocation' AND alloc.name = lle.transaction_name
+		WHERE lle.employee in %s
+		ORDER BY lle.creation
+	""", [employees], as_dict=1):
+		cache.ledger_entries[d.employee].append(d)
+
+	for d in frappe.db.sql("""
+		SELECT employee, leave_type, from_date, to_date, total_leave_days
+		FROM `tabLeave Application`
+		WHERE status = 'Open' AND employee in %s
+	""", [employees], as_dict=1):
+		cache.pending_leaves[d.employee].append(d)
+
+	return is_new
+
+
+def clear_leave_ledger_cache(employee=None):
+	cache = frappe.flags.leave_ledger_cache
+	if not cache:
+		return
+
+	if employee:
+		cache.ledger_entries.pop(employee, None)
+		cache.pending_leaves.pop(employee, None)
+	else:
+		frappe.flags.leave_ledger_cache = None
+
+
+def get_cached_leave_ledger_entries(employee):
+	"""Returns Leave Ledger Entries of the employee if loaded by load_leave_ledger_cache, otherwise None"""
+	cache = frappe.flags.leave_ledger_cache
+	if cache:
+		return cache.ledger_entries.get(employee)
+
+
+def get_cached_pending_leaves(employee):
+	cache = frappe.flags.leave_ledger_cache
+	if cache:
+		return cache.pending_leaves.get(employee)
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2017, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import add_days, cint, cstr, flt, getdate
+from erpnext.hr.doctype.holiday_list.holiday_list import get_default_holiday_list
+from erpnext.hr.doctype.additional_salary.additional_salary import get_additional_salary_components_for_employees
+
+
+class PayrollContext(object):
+	"""
+		Records required to compute Salary Slips of a set of employees for a payroll period,
+		loaded with a query per record type instead of queries per employee.
+
+		A Salary Slip uses the context set in slip.flags.payroll_context only if it is for the same
+		period and payroll frequency, otherwise it loads the records itself.
+	"""
+	def __init__(self, employees, start_date, end_date, payroll_frequency=None):
+		self.employees = list(set(employees))
+		self.start_date = getdate(start_date)
+		self.end_date = getdate(end_date)
+		self.payroll_frequency = payroll_frequency
+
+		self._taxable_earnings = {}
+		self._tax_paid = {}
+
+		self.load()
+
+	def applies_to(self, salary_slip):
+		return bool(salary_slip.employee in self.employee_details
+			and salary_slip.start_date and salary_slip.end_date
+			and getdate(salary_slip.start_date) == self.start_date
+			and getdate(salary_slip.end_date) == self.end_date
+			and cstr(salary_slip.payroll_frequency) == cstr(self.payroll_frequency))
+
+	def load(self):
+		self.employee_details = {}
+		self.salary_structure_assignments = {}
+		self.holidays = {}
+		self.leave_applications = {}
+		self.late_deduction_leaves = {}
+		self.attendance = {}
+		self.timesheets = {}
+		self.additional_salary_components = {}
+
+		if not self.employees:
+			return
+
+		self.load_employee_details()
+		self.load_salary_structure_assignments()
+		self.load_holidays()
+		self.load_leave_applications()
+		self.load_late_deduction_leaves()
+		self.load_attendance()
+		self.load_timesheets()
+
+		self.additional_salary_components = get_additional_salary_components_for_employees(self.employees,
+			self.start_date, self.end_date)
+
+	def get_values(self):
+		return {'employees': self.employees, 'start_date': self.start_date, 'end_date': self.end_date}
+
+	def load_employee_details(self):
+		for d in frappe.db.sql("select * from `tabEmployee` where name in %(employees)s",
+				self.get_values(), as_dict=1):
+			d.doctype = "Employee"
+			self.employee_details[d.name] = d
+
+	def load_salary_structure_assignments(self):
+		for d in frappe.db.sql("""
+			select sa.*, ss.is_active as salary_structure_is_active, ss.docstatus as salary_structure_docstatus,
+				ss.payroll_frequency as salary_structure_payroll_frequency
+			from `tabSalary Structure Assignment` sa
+			left join `tabSalary Structure` ss on sa.salary_structure = ss.name
+			where sa.docstatus = 1 and sa.employee in %(employees)s
+			order by sa.from_date desc
+		""", self.get_values(), as_dict=1):
+			d.doctype = "Salary Structure Assignment"
+			self.salary_structure_assignments.setdefault(d.employee, []).append(d)
+
+	def load_holidays(self):
+		holiday_lists = set()
+		for d in self.employee_details.values():
+			d.holiday_list_for_payroll = d.holiday_list or get_default_holiday_list(d.company)
+			if d.holiday_list_for_payroll:
+				holiday_lists.add(d.holiday_list_for_payroll)
+
+		if holiday_lists:
+			for d in frappe.db.sql("""
+				select parent, holiday_date
+				from `tabHoliday`
+				where parent in %(holiday_lists)s and holiday_date between %(start_date)s and %(end_date)s
+			""", dict(self.get_values(), holiday_lists=list(holiday_lists)), as_dict=1):
+				self.holidays.setdefault(d.parent, []).append(getdate(d.holiday_date))
+
+	def load_leave_applications(self):
+		for d in frappe.db.sql("""
+			select app.employee, app.from_date, app.to_date, app.half_day, app.half_day_date,
+				type.is_lwp, type.include_holiday
+			from `tabLeave Application` app, `tabLeave Type` type
+			where type.name = app.leave_type
+				and app.docstatus = 1
+				and app.late_deduction = 0
+				and ifnull(app.salary_slip, '') = ''
+				and app.employee in %(employees)s
+				and app.from_date <= %(end_date)s and app.to_date >= %(start_date)s
+		""", self.get_values(), as_dict=1):
+			self.leave_applications.setdefault(d.employee, []).append(d)
+
+	def load_late_deduction_leaves(self):
+		for d in frappe.db.sql("""
+			select lle.employee, lle.is_lwp, type.is_lwp as leave_type_is_lwp, lle.leaves, lle.from_date, lle.to_date
+			from `tabLeave Ledger Entry` lle
+			left join `tabLeave Type` type on type.name = lle.leave_type
+			where lle.docstatus = 1 and lle.is_late_deduction = 1
+				and lle.employee in %(employees)s
+				and lle.from_date <= %(end_date)s and %(start_date)s <= lle.to_date
+		""", self.get_values(), as_dict=1):
+			self.late_deduction_leaves.setdefault(d.employee, []).append(d)
+
+	def load_attendance(self):
+		for d in frappe.db.sql("""
+			select employee, attendance_date, status, late_entry
+			from `tabAttendance`
+			where docstatus = 1
+				and ifnull(leave_application, '') = ''
+				and employee in %(employees)s
+				and attendance_date between %(start_date)s and %(end_date)s
+		""", self.get_values(), as_dict=1):
+			self.attendance.setdefault(d.employee, []).append(d)
+
+	def load_timesheets(self):
+		for d in frappe.db.sql("""
+			select name, employee, total_hours
+			from `tabTimesheet`
+			where employee in %(employees)s and start_date between %(start_date)s and %(end_date)s
+				and (status = 'Submitted' or status = 'Billed')
+		""", self.get_values(), as_dict=1):
+			self.timesheets.setdefault(d.employee, []).append(d)
+
+	def get_employee_details(self, employee):
+		return self.employee_details.get(employee)
+
+	def get_salary_structure(self, employee, joining_date, payroll_frequency=None):
+		"""Returns the Salary Structure of the latest active assignment of the employee as in SalarySlip.get_salary_structure"""
+		dates = [self.start_date, self.end_date]
+		if joining_date:
+			dates.append(getdate(joining_date))
+
+		for d in self.salary_structure_assignments.get(employee, []):
+			if d.salary_structure_docstatus != 1 or d.salary_structure_is_active != 'Yes':
+				continue
+			if payroll_frequency and d.salary_structure_payroll_frequency != payroll_frequency:
+				continue
+			if getdate(d.from_date) <= max(dates):
+				return d.salary_structure
+
+	def get_salary_structure_assignment(self, employee, salary_structure, on_date):
+		for d in self.salary_structure_assignments.get(employee, []):
+			if d.salary_structure == salary_structure and getdate(d.from_date) <= getdate(on_date):
+				return d
+
+	def get_employee_data_for_eval(self, employee, salary_structure, on_date):
+		assignment = self.get_salary_structure_assignment(employee, salary_structure, on_date)
+		if not assignment:
+			return None
+
+		data = frappe._dict(assignment)
+		for fieldname in ("salary_structure_is_active", "salary_structure_docstatus", "salary_structure_payroll_frequency"):
+			data.pop(fieldname, None)
+
+		data.update(self.employee_details[employee])
+		data.pop("holiday_list_for_payroll", None)
+		return data
+
+	def get_holidays(self, employee, start_date, end_date):
+		"""Returns holiday dates as strings, or None if the dates are not within the period or the Holiday List is not set"""
+		start_date, end_date = getdate(start_date), getdate(end_date)
+		if start_date < self.start_date or end_date > self.end_date:
+			return None
+
+		holiday_list = self.employee_details[employee].holiday_list_for_payroll
+		if not holiday_list:
+			return None
+
+		return [cstr(d) for d in self.holidays.get(holiday_list, []) if start_date <= d <= end_date]
+
+	def get_leave_count(self, employee, holidays, working_days, start_date, end_date, consider_absent_as_lwp=True):
+		"""Returns leave counts of the employee the same way as the per day queries of SalarySlip.get_leave_count"""
+		out = frappe._dict({
+			'leave_without_pay': 0,
+			'leave_with_pay': 0,
+			'late_leave_with_pay': 0,
+			'total_leave': 0,
+		})
+
+		leave_applications = self.leave_applications.get(employee, [])
+		for d in range(working_days):
+			dt = add_days(cstr(self.start_date), d)
+			date = getdate(dt)
+
+			leave = None
+			for app in leave_applications:
+				if getdate(app.from_date) <= date <= getdate(app.to_date) \
+						and (app.include_holiday or dt not in holidays):
+					leave = app
+					break
+
+			if leave:
+				half_day = leave.half_day if (leave.half_day_date and getdate(leave.half_day_date) == date) \
+					or leave.to_date == leave.from_date else 0
+				leave_count = 0.5 if cint(half_day) else 1
+
+				out.total_leave += leave_count
+				if leave.is_lwp:
+					out.leave_without_pay += leave_count
+				else:
+					out.leave_with_pay += leave_count
+
+		# Late Deduction Leaves
+		start_date, end_date = getdate(start_date), getdate(end_date)
+		late_leave_data = {}
+		for lle in self.late_deduction_leaves.get(employee, []):
+			if getdate(lle.from_date) <= end_date and start_date <= getdate(lle.to_date):
+				late_leave = late_leave_data.setdefault(cint(lle.is_lwp),
+					frappe._dict({'is_lwp': lle.leave_type_is_lwp, 'leaves': 0}))
+				late_leave.leaves += -1 * flt(lle.leaves)
+
+		for lle in late_leave_data.values():
+			out.total_leave += lle.leaves
+			if lle.is_lwp:
+				out.leave_without_pay += lle.leaves
+			else:
+				out.late_leave_with_pay += lle.leaves
+				out.leave_with_pay += lle.leaves
+
+		if consider_absent_as_lwp:
+			for att in self.attendance.get(employee, []):
+				if start_date <= getdate(att.attendance_date) <= end_date:
+					if att.status == 'Half Day':
+						out.leave_without_pay += 0.5
+					elif att.status == 'Absent':
+						out.leave_without_pay += 1
+
+		return out
+
+	def get_late_days(self, employee, holidays):
+		return len([att for att in self.attendance.get(employee, [])
+			if att.status == 'Present' and cint(att.late_entry) and cstr(att.attendance_date) not in holidays])
+
+	def get_timesheets(self, employee):
+		return self.timesheets.get(employee, [])
+
+	def get_additional_salary_components(self, employee, component_type):
+		return self.additional_salary_components.get((employee, component_type), [])
+
+	def get_taxable_earnings_for_prev_period(self, employee, start_date, end_date, allow_tax_exemption=False):
+		key = (cstr(start_date), cstr(end_date), cint(allow_tax_exemption))
+		if key not in self._taxable_earnings:
+			values = dict(self.get_values(), from_date=start_date, to_date=end_date)
+
+			taxable_earnings = dict(frappe.db.sql("""
+				select ss.employee, sum(sd.amount)
+				from
+					`tabSalary Detail` sd join `tabSalary Slip` ss on sd.parent=ss.name
+				where
+					sd.parentfield='earnings'
+					and sd.is_tax_applicable=1
+					and is_flexible_benefit=0
+					and ss.docstatus=1
+					and ss.employee in %(employees)s
+					and ss.start_date between %(from_date)s and %(to_date)s
+					and ss.end_date between %(from_date)s and %(to_date)s
+				group by ss.employee
+			""", values))
+
+			exempted_amount = {}
+			if allow_tax_exemption:
+				exempted_amount = dict(frappe.db.sql("""
+					select ss.employee, sum(sd.amount)
+					from
+						`tabSalary Detail` sd join `tabSalary Slip` ss on sd.parent=ss.name
+					where
+						sd.parentfield='deductions'
+						and sd.exempted_from_income_tax=1
+						and is_flexible_benefit=0
+						and ss.docstatus=1
+						and ss.employee in %(employees)s
+						and ss.start_date between %(from_date)s and %(to_date)s
+						and ss.end_date between %(from_date)s and %(to_date)s
+					group by ss.employee
+				""", values))
+
+			self._taxable_earnings[key] = {emp: flt(taxable_earnings.get(emp)) - flt(exempted_amount.get(emp))
+				for emp in self.employees}
+
+		return self._taxable_earnings[key].get(employee, 0)
+
+	def get_tax_paid_in_period(self, employee, start_date, end_date, tax_component):
+		key = (cstr(start_date), cstr(end_date), tax_component)
+		if key not in self._tax_paid:
+			self._tax_paid[key] = dict(frappe.db.sql("""
+				select ss.employee, sum(sd.amount)
+				from
+					`tabSalary Detail` sd join `tabSalary Slip` ss on sd.parent=ss.name
+				where
+					sd.parentfield='deductions'
+					and sd.salary_component=%(salary_component)s
+					and sd.variable_based_on_taxable_salary=1
+					and ss.docstatus=1
+					and ss.employee in %(employees)s
+					and ss.start_date between %(from_date)s and %(to_date)s
+					and ss.end_date between %(from_date)s and %(to_date)s
+				group by ss.employee
+			""", dict(self.get_values(), from_date=start_date, to_date=end_date, salary_component=tax_component)))
+
+		return flt(self._tax_paid[key].get(employee))
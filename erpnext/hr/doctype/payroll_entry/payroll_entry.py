@@ -5,12 +5,21 @@
 import frappe
 from frappe.model.document import Document
 from dateutil.relativedelta import relativedelta
-from frappe.utils import cint, flt, add_days, getdate, add_to_date, DATE_FORMAT, date_diff, formatdate
+from frappe.utils import cint, cstr, flt, add_days, getdate, add_to_date, DATE_FORMAT, date_diff, formatdate,\
+	now_datetime
 from frappe import _, scrub
 from erpnext.accounts.utils import get_fiscal_year
 from erpnext.hr.doctype.employee.employee import get_holiday_list_for_employee
 from erpnext.accounts.general_ledger import get_round_off_account_and_cost_center
 from erpnext.accounts.utils import get_allow_cost_center_in_entry_of_bs_account
+from erpnext.hr.doctype.payroll_entry.payroll_context import PayrollContext
+
+
+payroll_chunk_size = 200
+payroll_chunk_timeout = 1500
+
+# employees queued for longer than this are assumed to be lost with a crashed or timed out chunk
+stale_payroll_chunk_minutes = 240
 
 
 class PayrollEntry(Document):
@@ -166,25 +175,27 @@ class PayrollEntry(Document):
 
 		employees = [d.employee for d in self.get_employees()]
 		if employees:
-			args = frappe._dict({
-				"salary_slip_based_on_timesheet": self.salary_slip_based_on_timesheet,
-				"payroll_frequency": self.payroll_frequency,
-				"start_date": self.start_date,
-				"end_date": self.end_date,
-				"company": self.company,
-				"posting_date": self.posting_date,
-				"deduct_tax_for_unclaimed_employee_benefits": self.deduct_tax_for_unclaimed_employee_benefits,
-				"deduct_tax_for_unsubmitted_tax_exemption_proof": self.deduct_tax_for_unsubmitted_tax_exemption_proof,
-				"payroll_entry": self.name
-			})
 			if len(employees) > 30:
-				self.queue_action('_create_salary_slips_for_employees', timeout=600, employees=employees, args=args)
+				self.queue_payroll_chunks("create", employees)
 			else:
-				self._create_salary_slips_for_employees(employees, args, publish_progress=False)
+				self._create_salary_slips_for_employees(employees, self.get_salary_slip_args(), publish_progress=False)
 				# since this method is called via frm.call this doc needs to be updated manually
 				self.reload()
 
-	def _create_salary_slips_for_employees(self, employees, args, publish_progress=True):
+	def get_salary_slip_args(self):
+		return frappe._dict({
+			"salary_slip_based_on_timesheet": self.salary_slip_based_on_timesheet,
+			"payroll_frequency": self.payroll_frequency,
+			"start_date": self.start_date,
+			"end_date": self.end_date,
+			"company": self.company,
+			"posting_date": self.posting_date,
+			"deduct_tax_for_unclaimed_employee_benefits": self.deduct_tax_for_unclaimed_employee_benefits,
+			"deduct_tax_for_unsubmitted_tax_exemption_proof": self.deduct_tax_for_unsubmitted_tax_exemption_proof,
+			"payroll_entry": self.name
+		})
+
+	def _create_salary_slips_for_employees(self, employees, args, publish_progress=True, raise_exception=True):
 		self.check_permission('write')
 
 		employees_with_existing_salary_slips = []
@@ -197,21 +208,27 @@ class PayrollEntry(Document):
 					and employee in %s
 		""", (args.company, args.start_date, args.end_date, employees))
 
+		payroll_context = self.get_payroll_context([employee for employee in employees
+			if employee not in employees_with_existing_salary_slips], args)
+
+		def create_salary_slip(employee):
+			salary_slip = frappe.get_doc(dict(args, doctype="Salary Slip", employee=employee))
+			salary_slip.flags.from_payroll_entry = True
+			salary_slip.flags.payroll_context = payroll_context
+			salary_slip.insert()
+
 		for count, employee in enumerate(employees):
 			if employee not in employees_with_existing_salary_slips:
-				args.update({
-					"doctype": "Salary Slip",
-					"employee": employee
-				})
-				salary_slip = frappe.get_doc(args)
-				salary_slip.flags.from_payroll_entry = True
-				salary_slip.insert()
+				self.process_employee(employee, create_salary_slip, "Created", raise_exception)
+			else:
+				self.set_payroll_status([employee], "Created")
 
 			if publish_progress:
 				frappe.publish_progress((count + 1) * 100 / len(employees), title=_("Creating Salary Slips..."))
 
-		self.db_set("salary_slips_created", 1)
-		self.notify_update()
+		if raise_exception:
+			self.db_set("salary_slips_created", 1)
+			self.notify_update()
 
 	@frappe.whitelist()
 	def update_salary_slips(self):
@@ -223,17 +240,24 @@ class PayrollEntry(Document):
 		salary_slips = self.get_salary_slips(docstatus=0)
 		if salary_slips:
 			if len(salary_slips) > 30:
-				self.queue_action('_update_salary_slips', timeout=600, salary_slips=salary_slips)
+				self.queue_payroll_chunks("update", salary_slips)
 			else:
 				self._update_salary_slips(salary_slips, publish_progress=False)
 				frappe.msgprint(_("Updated Salary Slips Successfully"))
 
-	def _update_salary_slips(self, salary_slips, publish_progress=True):
+	def _update_salary_slips(self, salary_slips, publish_progress=True, raise_exception=True):
 		self.check_permission('write')
-		for count, ss in enumerate(salary_slips):
+
+		payroll_context = self.get_payroll_context([ss.employee for ss in salary_slips])
+
+		def update_salary_slip(ss):
 			doc = frappe.get_doc("Salary Slip", ss.name)
 			doc.flags.from_payroll_entry = True
+			doc.flags.payroll_context = payroll_context
 			doc.save()
+
+		for count, ss in enumerate(salary_slips):
+			self.process_employee(ss.employee, lambda: update_salary_slip(ss), "Updated", raise_exception)
 			if publish_progress:
 				frappe.publish_progress((count + 1) * 100 / len(salary_slips), title=_("Updating Salary Slips..."))
 
@@ -242,28 +266,40 @@ class PayrollEntry(Document):
 		self.check_permission('write')
 		salary_slips = self.get_salary_slips(docstatus=0)
 		if len(salary_slips) > 30:
-			self.queue_action('_submit_salary_slips', timeout=600, salary_slips=salary_slips)
+			self.queue_payroll_chunks("submit", salary_slips)
 		else:
 			self._submit_salary_slips(salary_slips, publish_progress=False)
 
-	def _submit_salary_slips(self, salary_slips, publish_progress=True):
+	def _submit_salary_slips(self, salary_slips, publish_progress=True, raise_exception=True):
 		self.check_permission('write')
 		submitted_ss = []
 		not_submitted_ss = []
 		frappe.flags.via_payroll_entry = True
+		payroll_context = self.get_payroll_context([ss.employee for ss in salary_slips])
+
+		def submit_salary_slip(ss_obj):
+			ss_obj.submit()
+			submitted_ss.append(ss_obj)
 
 		for count, ss in enumerate(salary_slips):
 			ss_obj = frappe.get_doc("Salary Slip", ss.name)
 			ss_obj.flags.from_payroll_entry = True
+			ss_obj.flags.payroll_context = payroll_context
 			if ss_obj.net_pay < 0:
 				not_submitted_ss.append(ss.name)
+				self.set_payroll_status([ss_obj.employee], "Skipped", _("Net Pay cannot be negative"))
 			else:
-				ss_obj.submit()
-				submitted_ss.append(ss_obj)
+				self.process_employee(ss_obj.employee, lambda: submit_salary_slip(ss_obj), "Submitted", raise_exception)
 
 			if publish_progress:
 				frappe.publish_progress((count + 1) * 100 / len(salary_slips), title=_("Submitting Salary Slips..."))
 
+		if not raise_exception:
+			# accruals are posted once all the queued chunks are processed
+			if submitted_ss:
+				self.email_salary_slip(submitted_ss)
+			return
+
 		self.make_accrual_jv_entry()
 		if submitted_ss:
 			self.email_salary_slip(submitted_ss)
@@ -281,6 +317,101 @@ class PayrollEntry(Document):
 		if not_submitted_ss:
 			frappe.msgprint(_("Could not submit some Salary Slips"))
 
+	def get_payroll_context(self, employees, args=None):
+		"""Returns records of employees required by their Salary Slips, loaded together for the payroll period"""
+		args = args or self.get_salary_slip_args()
+		return PayrollContext(employees, args.start_date, args.end_date, args.payroll_frequency)
+
+	def process_employee(self, employee, method, status, raise_exception=True):
+		"""Runs method for an employee and sets payroll status, or rolls back and sets the error if it fails"""
+		if raise_exception:
+			method()
+			self.set_payroll_status([employee], status)
+			return
+
+		frappe.db.savepoint("payroll_employee")
+		try:
+			method()
+		except Exception as e:
+			frappe.db.rollback(save_point="payroll_employee")
+			frappe.local.message_log = []
+			self.set_payroll_status([employee], "Failed", cstr(e) or frappe.get_traceback())
+		else:
+			self.set_payroll_status([employee], status)
+
+	def set_payroll_status(self, employees, status, error=None):
+		if not employees:
+			return
+
+		# time of queuing is kept to fail employees of chunks that never finish
+		frappe.db.sql("""
+			update `tabPayroll Employee Detail`
+			set payroll_status = %s, payroll_error = %s, payroll_queued_on = %s
+			where parent = %s and parenttype = 'Payroll Entry' and employee in %s
+		""", (status, error, now_datetime() if status == "Queued" else None, self.name, employees))
+
+	def queue_payroll_chunks(self, action, items):
+		"""
+			Queues employees or salary slips in chunks that are processed by background workers,
+			each chunk is committed independently and can be retried
+		"""
+		if action == "create":
+			employees = items
+		else:
+			employees = [d.employee for d in items]
+			items = [d.name for d in items]
+
+		# failures of a previous run do not block this run
+		frappe.db.sql("""
+			update `tabPayroll Employee Detail`
+			set payroll_status = ''
+			where parent = %s and parenttype = 'Payroll Entry' and payroll_status = 'Failed'
+		""", self.name)
+		self.set_payroll_status(employees, "Queued")
+
+		for i in range(0, len(items), payroll_chunk_size):
+			frappe.enqueue("erpnext.hr.doctype.payroll_entry.payroll_entry.process_payroll_chunk",
+				queue="long", timeout=payroll_chunk_timeout, enqueue_after_commit=True,
+				payroll_entry=self.name, action=action, items=items[i:i + payroll_chunk_size])
+
+		frappe.msgprint(_("Salary Slips are queued for processing in {0} batches")
+			.format(len(range(0, len(items), payroll_chunk_size))), alert=True)
+
+	def finish_payroll_chunks(self, action):
+		"""Completes the action once all the queued employees are processed, posting accruals only if none failed"""
+		# lock the Payroll Entry so that only the last chunk to finish completes the action
+		# and read its state after the lock as another chunk may have completed it meanwhile
+		salary_slips_submitted = frappe.db.sql("""
+			select salary_slips_submitted
+			from `tabPayroll Entry`
+			where name = %s
+			for update
+		""", self.name)[0][0]
+
+		status_count = dict(frappe.db.sql("""
+			select payroll_status, count(*)
+			from `tabPayroll Employee Detail`
+			where parent = %s and parenttype = 'Payroll Entry'
+			group by payroll_status
+		""", self.name))
+
+		total = sum(status_count.values())
+		pending = status_count.get("Queued", 0)
+		if total:
+			frappe.publish_progress((total - pending) * 100 / total, title=_("Processing Salary Slips..."),
+				doctype=self.doctype, docname=self.name)
+
+		if pending:
+			return
+
+		if action == "create":
+			self.db_set("salary_slips_created", 1)
+		elif action == "submit" and not status_count.get("Failed") and not cint(salary_slips_submitted):
+			self.make_accrual_jv_entry()
+			self.db_set("salary_slips_submitted", 1)
+
+		self.notify_update()
+
 	def email_salary_slip(self, submitted_ss):
 		if frappe.db.get_single_value("HR Settings", "email_salary_slip_to_employee"):
 			for ss in submitted_ss:
@@ -526,7 +657,7 @@ class PayrollEntry(Document):
 		cond = self.get_filter_condition()
 
 		salary_slips = frappe.db.sql("""
-			select ss.name, ss.salary_structure, ss.rounded_total
+			select ss.name, ss.employee, ss.salary_structure, ss.rounded_total
 			from `tabSalary Slip` ss
 			where ss.docstatus = %s
 				and ss.start_date >= %s and ss.end_date <= %s
@@ -711,6 +842,56 @@ class PayrollEntry(Document):
 		return marked_days
 
 
+def process_payroll_chunk(payroll_entry, action, items):
+	"""Creates, updates or submits the salary slips of a chunk of employees queued by a Payroll Entry"""
+	doc = frappe.get_doc("Payroll Entry", payroll_entry)
+
+	if action == "create":
+		doc._create_salary_slips_for_employees(items, doc.get_salary_slip_args(), publish_progress=False,
+			raise_exception=False)
+	else:
+		salary_slips = frappe.get_all("Salary Slip", fields=["name", "employee", "docstatus"],
+			filters={"name": ["in", items], "docstatus": ["<", 2]})
+		draft_salary_slips = [d for d in salary_slips if d.docstatus == 0]
+
+		if action == "update":
+			doc._update_salary_slips(draft_salary_slips, publish_progress=False, raise_exception=False)
+		else:
+			# salary slips submitted in a previous attempt of the chunk are not submitted again
+			doc.set_payroll_status([d.employee for d in salary_slips if d.docstatus == 1], "Submitted")
+			doc._submit_salary_slips(draft_salary_slips, publish_progress=False, raise_exception=False)
+
+	frappe.db.commit()
+
+	doc.finish_payroll_chunks(action)
+	frappe.db.commit()
+
+
+def fail_stale_payroll_chunks():
+	"""
+		Marks employees queued by Payroll Entries that were never processed as failed, so that the
+		Payroll Entry completes and the failed employees can be queued again
+	"""
+	stale_before = add_to_date(now_datetime(), minutes=-stale_payroll_chunk_minutes)
+	stale_entries = frappe.db.sql_list("""
+		select distinct parent
+		from `tabPayroll Employee Detail`
+		where parenttype = 'Payroll Entry' and payroll_status = 'Queued' and payroll_queued_on < %s
+	""", stale_before)
+
+	for payroll_entry in stale_entries:
+		doc = frappe.get_doc("Payroll Entry", payroll_entry)
+		frappe.db.sql("""
+			update `tabPayroll Employee Detail`
+			set payroll_status = 'Failed', payroll_error = %s, payroll_queued_on = null
+			where parent = %s and parenttype = 'Payroll Entry' and payroll_status = 'Queued'
+				and payroll_queued_on < %s
+		""", (_("Processing did not finish in time"), payroll_entry, stale_before))
+
+		doc.finish_payroll_chunks("submit" if doc.salary_slips_created else "create")
+		frappe.db.commit()
+
+
 @frappe.whitelist()
 def get_start_end_dates(payroll_frequency, start_date=None, company=None):
 	'''Returns dict of start and end dates for given payroll frequency based on start_date'''
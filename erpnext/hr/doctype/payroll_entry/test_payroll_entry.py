@@ -96,6 +96,30 @@ class TestPayrollEntry(unittest.TestCase):
 		if salary_slip.docstatus == 0:
 			frappe.delete_doc('Salary Slip', name)
 
+	def test_payroll_context(self):
+		from erpnext.hr.doctype.payroll_entry.payroll_context import PayrollContext
+
+		employee = make_employee("test_employee@payroll_context.com")
+		frappe.db.set_value("Employee", employee, "holiday_list", make_holiday("test holiday for payroll context"))
+		make_salary_structure("Test Salary Structure for Payroll Context", "Monthly", employee)
+
+		dates = get_start_end_dates('Monthly', nowdate())
+		args = dict(doctype="Salary Slip", employee=employee, payroll_frequency="Monthly",
+			start_date=dates.start_date, end_date=dates.end_date, posting_date=nowdate())
+
+		salary_slip = frappe.get_doc(args)
+		salary_slip.validate()
+
+		salary_slip_with_context = frappe.get_doc(args)
+		salary_slip_with_context.flags.payroll_context = PayrollContext([employee], dates.start_date,
+			dates.end_date, "Monthly")
+		self.assertTrue(salary_slip_with_context.get_payroll_context())
+		salary_slip_with_context.validate()
+
+		for fieldname in ("salary_structure", "total_working_days", "payment_days", "leave_without_pay",
+				"gross_pay", "total_deduction", "net_pay"):
+			self.assertEqual(salary_slip_with_context.get(fieldname), salary_slip.get(fieldname))
+
 
 def make_payroll_entry(**args):
 	args = frappe._dict(args)
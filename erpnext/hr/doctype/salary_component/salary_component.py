@@ -2,6 +2,7 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
 from frappe.model.naming import append_number_if_name_exists
 
@@ -9,6 +10,12 @@ class SalaryComponent(Document):
 	def validate(self):
 		self.validate_abbr()
 
+	def on_update(self):
+		frappe.flags.salary_component_abbrs = None
+
+	def on_trash(self):
+		frappe.flags.salary_component_abbrs = None
+
 	def validate_abbr(self):
 		if not self.salary_component_abbr:
 			self.salary_component_abbr = ''.join([c[0] for c in
@@ -17,3 +24,10 @@ class SalaryComponent(Document):
 		self.salary_component_abbr = self.salary_component_abbr.strip()
 		self.salary_component_abbr = append_number_if_name_exists('Salary Component', self.salary_component_abbr,
 			'salary_component_abbr', separator='_', filters={"name": ["!=", self.name]})
+
+def get_salary_component_abbrs():
+	"""Returns abbreviations of all Salary Components, loaded once and shared by the salary slips of a run"""
+	if frappe.flags.salary_component_abbrs is None:
+		frappe.flags.salary_component_abbrs = frappe.get_all("Salary Component", pluck="salary_component_abbr")
+
+	return frappe.flags.salary_component_abbrs
@@ -14,6 +14,8 @@ from erpnext.utilities.transaction_base import TransactionBase
 from frappe.utils.background_jobs import enqueue
 from erpnext.hr.doctype.additional_salary.additional_salary import get_additional_salary_component
 from erpnext.hr.doctype.salary_structure_assignment.salary_structure_assignment import get_salary_structure_assignment
+from erpnext.hr.doctype.salary_structure.salary_structure import get_compiled_condition_and_formula
+from erpnext.hr.doctype.salary_component.salary_component import get_salary_component_abbrs
 from erpnext.hr.doctype.income_tax_slab.income_tax_slab import get_applicable_income_tax_slab
 from erpnext.hr.doctype.payroll_period.payroll_period import get_period_factor, get_payroll_period
 from erpnext.hr.doctype.employee_benefit_application.employee_benefit_application import get_benefit_component_amount
@@ -157,20 +159,25 @@ class SalarySlip(TransactionBase):
 			salary_structure = self.get_salary_structure(joining_date, relieving_date)
 
 			if salary_structure:
-				self._salary_structure_doc = frappe.get_doc('Salary Structure', salary_structure)
+				self._salary_structure_doc = frappe.get_cached_doc('Salary Structure', salary_structure)
 				self.salary_slip_based_on_timesheet = self._salary_structure_doc.salary_slip_based_on_timesheet or 0
 				self.set_time_sheet()
 				self.pull_sal_struct()
 
+	def get_payroll_context(self):
+		"""Returns records prefetched by the Payroll Entry if they are for this slip's employee and period"""
+		payroll_context = self.flags.payroll_context
+		if payroll_context and payroll_context.applies_to(self):
+			return payroll_context
+
 	def set_time_sheet(self):
 		if self.salary_slip_based_on_timesheet:
 			self.set("timesheets", [])
-			timesheets = frappe.db.sql("""
-				select *
-				from `tabTimesheet`
-				where employee = %(employee)s and start_date BETWEEN %(start_date)s AND %(end_date)s
-				and (status = 'Submitted' or status = 'Billed')
-			""", {'employee': self.employee, 'start_date': self.start_date, 'end_date': self.end_date}, as_dict=1)
+			payroll_context = self.get_payroll_context()
+			if payroll_context:
+				timesheets = payroll_context.get_timesheets(self.employee)
+			else:
+				timesheets = self.get_timesheets()
 
 			for data in timesheets:
 				self.append('timesheets', {
@@ -178,12 +185,36 @@ class SalarySlip(TransactionBase):
 					'working_hours': data.total_hours
 				})
 
+	def get_timesheets(self):
+		return frappe.db.sql("""
+			select *
+			from `tabTimesheet`
+			where employee = %(employee)s and start_date BETWEEN %(start_date)s AND %(end_date)s
+			and (status = 'Submitted' or status = 'Billed')
+		""", {'employee': self.employee, 'start_date': self.start_date, 'end_date': self.end_date}, as_dict=1)
+
 	def get_salary_structure(self, joining_date, relieving_date):
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			st_name = payroll_context.get_salary_structure(self.employee, joining_date, self.payroll_frequency)
+			st_name = [(st_name,)] if st_name else None
+		else:
+			st_name = self.get_salary_structure_from_assignment(joining_date)
+
+		if st_name:
+			self.salary_structure = st_name[0][0]
+			return self.salary_structure
+		else:
+			self.salary_structure = None
+			frappe.msgprint(_("No active or default Salary Structure found for employee {0} for the given dates")
+				.format(self.employee), title=_('Salary Structure Missing'))
+
+	def get_salary_structure_from_assignment(self, joining_date):
 		extra_condition = ""
 		if self.payroll_frequency:
 			extra_condition += "and ss.payroll_frequency = %(payroll_frequency)s"
 
-		st_name = frappe.db.sql("""
+		return frappe.db.sql("""
 			select sa.salary_structure
 			from `tabSalary Structure Assignment` sa
 			inner join `tabSalary Structure` ss on sa.salary_structure = ss.name
@@ -200,14 +231,6 @@ class SalarySlip(TransactionBase):
 			'payroll_frequency': self.payroll_frequency,
 		})
 
-		if st_name:
-			self.salary_structure = st_name[0][0]
-			return self.salary_structure
-		else:
-			self.salary_structure = None
-			frappe.msgprint(_("No active or default Salary Structure found for employee {0} for the given dates")
-				.format(self.employee), title=_('Salary Structure Missing'))
-
 	def pull_sal_struct(self):
 		from erpnext.hr.doctype.salary_structure.salary_structure import make_salary_slip
 
@@ -222,6 +245,10 @@ class SalarySlip(TransactionBase):
 		make_salary_slip(self._salary_structure_doc.name, self)
 
 	def calculate_late_days(self, holidays):
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			return payroll_context.get_late_days(self.employee, holidays)
+
 		late_days = 0
 
 		holidays = "','".join(holidays)
@@ -316,6 +343,12 @@ class SalarySlip(TransactionBase):
 		return payment_days
 
 	def get_holidays_for_employee(self, start_date, end_date):
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			holidays = payroll_context.get_holidays(self.employee, start_date, end_date)
+			if holidays is not None:
+				return holidays
+
 		holiday_list = get_holiday_list_for_employee(self.employee)
 		holidays = frappe.db.sql_list('''select holiday_date from `tabHoliday`
 			where
@@ -332,8 +365,6 @@ class SalarySlip(TransactionBase):
 		return holidays
 
 	def get_leave_count(self, holidays, working_days, joining_date, relieving_date):
-		holidays = "','".join(holidays)
-
 		start_date = self.start_date
 		if joining_date and getdate(self.start_date) <= getdate(joining_date) <= getdate(self.end_date):
 			start_date = joining_date
@@ -342,6 +373,13 @@ class SalarySlip(TransactionBase):
 		if relieving_date and getdate(self.start_date) <= getdate(relieving_date) <= getdate(self.end_date):
 			end_date = relieving_date
 
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			return payroll_context.get_leave_count(self.employee, holidays, working_days, start_date, end_date,
+				consider_absent_as_lwp=not cint(frappe.get_cached_value("HR Settings", None, "do_not_consider_absent_as_lwp")))
+
+		holidays = "','".join(holidays)
+
 		out = frappe._dict({
 			'leave_without_pay': 0,
 			'leave_with_pay': 0,
@@ -472,7 +510,7 @@ class SalarySlip(TransactionBase):
 
 	def calculate_component_amounts(self, component_type):
 		if not getattr(self, '_salary_structure_doc', None):
-			self._salary_structure_doc = frappe.get_doc('Salary Structure', self.salary_structure)
+			self._salary_structure_doc = frappe.get_cached_doc('Salary Structure', self.salary_structure)
 
 		payroll_period = get_payroll_period(self.start_date, self.end_date, self.company)
 
@@ -496,17 +534,12 @@ class SalarySlip(TransactionBase):
 		'''Returns data for evaluating formula'''
 		data = frappe._dict()
 
-		salary_structure_assignment = get_salary_structure_assignment(self.employee, self.salary_structure,
-			self.end_date or self.posting_date)
-		data.update(frappe.get_doc("Salary Structure Assignment", salary_structure_assignment).as_dict())
-
-		data.update(frappe.get_doc("Employee", self.employee).as_dict())
+		data.update(self.get_employee_data_for_eval())
 		data.update(self.as_dict())
 
 		# set values for components
-		salary_components = frappe.get_all("Salary Component", fields=["salary_component_abbr"])
-		for sc in salary_components:
-			data.setdefault(sc.salary_component_abbr, 0)
+		for abbr in get_salary_component_abbrs():
+			data.setdefault(abbr, 0)
 
 		for key in ('earnings', 'deductions'):
 			for d in self.get(key):
@@ -514,17 +547,41 @@ class SalarySlip(TransactionBase):
 
 		return data
 
+	def get_employee_data_for_eval(self):
+		'''Returns Salary Structure Assignment and Employee values for evaluating formula, loaded once per slip'''
+		key = (self.employee, self.salary_structure, self.end_date or self.posting_date)
+		if getattr(self, '_employee_data_for_eval', None) and self._employee_data_for_eval[0] == key:
+			return self._employee_data_for_eval[1]
+
+		data = None
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			data = payroll_context.get_employee_data_for_eval(self.employee, self.salary_structure,
+				self.end_date or self.posting_date)
+
+		if data is not None:
+			self._employee_data_for_eval = (key, data)
+			return data
+
+		data = frappe._dict()
+		salary_structure_assignment = get_salary_structure_assignment(self.employee, self.salary_structure,
+			self.end_date or self.posting_date)
+		data.update(frappe.get_doc("Salary Structure Assignment", salary_structure_assignment).as_dict())
+		data.update(frappe.get_doc("Employee", self.employee).as_dict())
+
+		self._employee_data_for_eval = (key, data)
+		return data
+
 	def eval_condition_and_formula(self, d, data):
 		try:
-			condition = d.condition.strip().replace("\n", " ") if d.condition else None
+			condition, formula = get_compiled_condition_and_formula(self._salary_structure_doc, d)
 			if condition:
-				if not frappe.safe_eval(condition, self.whitelisted_globals, data):
+				if not self.eval_compiled_formula(condition, data):
 					return None
 			amount = d.amount
 			if d.amount_based_on_formula:
-				formula = d.formula.strip().replace("\n", " ") if d.formula else None
 				if formula:
-					amount = flt(frappe.safe_eval(formula, self.whitelisted_globals, data), d.precision("amount"))
+					amount = flt(self.eval_compiled_formula(formula, data), d.precision("amount"))
 			if amount:
 				data[d.abbr] = amount
 
@@ -538,6 +595,10 @@ class SalarySlip(TransactionBase):
 			frappe.throw(_("Error in formula or condition: {0}".format(e)))
 			raise
 
+	def eval_compiled_formula(self, code, data):
+		eval_globals = dict(self.whitelisted_globals, __builtins__={})
+		return eval(code, eval_globals, data)
+
 	def add_employee_benefits(self, payroll_period):
 		for struct_row in self._salary_structure_doc.get("earnings"):
 			if struct_row.is_flexible_benefit == 1:
@@ -564,8 +625,12 @@ class SalarySlip(TransactionBase):
 						self.update_component_row(frappe._dict(last_benefit.struct_row), amount, "earnings")
 
 	def add_additional_salary_components(self, component_type):
-		additional_components = get_additional_salary_component(self.employee,
-			self.start_date, self.end_date, component_type)
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			additional_components = payroll_context.get_additional_salary_components(self.employee, component_type)
+		else:
+			additional_components = get_additional_salary_component(self.employee,
+				self.start_date, self.end_date, component_type)
 		self.additional_components = additional_components
 		if additional_components:
 			for additional_component in additional_components:
@@ -723,6 +788,11 @@ class SalarySlip(TransactionBase):
 		return income_tax_slab_doc
 
 	def get_taxable_earnings_for_prev_period(self, start_date, end_date, allow_tax_exemption=False):
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			return payroll_context.get_taxable_earnings_for_prev_period(self.employee, start_date, end_date,
+				allow_tax_exemption)
+
 		taxable_earnings = frappe.db.sql("""
 			select sum(sd.amount)
 			from
@@ -767,6 +837,10 @@ class SalarySlip(TransactionBase):
 
 	def get_tax_paid_in_period(self, start_date, end_date, tax_component):
 		# find total_tax_paid, tax paid for benefit, additional_salary
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			return payroll_context.get_tax_paid_in_period(self.employee, start_date, end_date, tax_component)
+
 		total_tax_paid = flt(frappe.db.sql("""
 			select
 				sum(sd.amount)
@@ -1160,11 +1234,15 @@ class SalarySlip(TransactionBase):
 		self.calculate_net_pay()
 
 	def set_employee_details(self):
-		employee_details = frappe.db.get_value("Employee", self.employee, [
-			"department", "designation", "branch",
-			"salary_mode", "bank_name", "bank_ac_no",
-			"date_of_joining", "relieving_date",
-		], as_dict=1)
+		payroll_context = self.get_payroll_context()
+		if payroll_context:
+			employee_details = payroll_context.get_employee_details(self.employee)
+		else:
+			employee_details = frappe.db.get_value("Employee", self.employee, [
+				"department", "designation", "branch",
+				"salary_mode", "bank_name", "bank_ac_no",
+				"date_of_joining", "relieving_date",
+			], as_dict=1)
 
 		if employee_details:
 			self.department = employee_details.department
@@ -187,3 +187,37 @@ def get_employees(salary_structure):
 			Assign {1} to an Employee to preview Salary Slip").format(salary_structure, salary_structure))
 
 	return list(set([d.employee for d in employees]))
+
+
+compiled_formula_cache = {}
+
+def get_compiled_condition_and_formula(salary_structure, row):
+	"""
+		Returns code objects of the condition and formula of a Salary Structure row,
+		compiled once per Salary Structure and its modified timestamp
+	"""
+	key = (frappe.local.site, salary_structure.name)
+	cached = compiled_formula_cache.get(key)
+	if not cached or cached[0] != cstr(salary_structure.modified):
+		cached = compiled_formula_cache[key] = (cstr(salary_structure.modified), {})
+
+	row_key = (row.parentfield, row.idx)
+	compiled = cached[1].get(row_key)
+	if not compiled:
+		compiled = cached[1][row_key] = (
+			compile_salary_formula(row.condition),
+			compile_salary_formula(row.formula) if row.amount_based_on_formula else None
+		)
+
+	return compiled
+
+def compile_salary_formula(code):
+	"""Returns a code object of a condition or formula to be evaluated the same way as frappe.safe_eval"""
+	code = code.strip().replace("\n", " ") if code else None
+	if not code:
+		return None
+
+	if "__" in code:
+		frappe.throw(_('Illegal rule {0}. Cannot use "__"').format(frappe.bold(code)))
+
+	return compile(code, "<salary formula>", "eval")
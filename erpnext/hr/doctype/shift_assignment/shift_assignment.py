@@ -19,6 +19,28 @@ class ShiftAssignment(Document):
 		if self.end_date:
 			self.validate_from_to_dates('start_date', 'end_date')
 
+	def on_submit(self):
+		self.reset_absent_checked_till()
+
+	def on_cancel(self):
+		self.reset_absent_checked_till()
+
+	def reset_absent_checked_till(self):
+		"""Absents are marked again from the start date in the shift and the default shifts of the employees,
+		since the shift of the dates changes for a back dated assignment"""
+		from erpnext.hr.doctype.shift_type.shift_type import reset_absent_checked_till
+
+		if self.global_shift:
+			shift_types = frappe.db.sql_list("""
+				select distinct default_shift from `tabEmployee`
+				where company = %s and ifnull(default_shift, '') != ''""", self.company)
+		else:
+			shift_types = [frappe.db.get_value("Employee", self.employee, "default_shift")]
+
+		for shift_type in set([self.shift_type] + shift_types):
+			if shift_type:
+				reset_absent_checked_till(shift_type, self.start_date, None if self.global_shift else self.employee)
+
 	def validate_employee_mandatory(self):
 		if not self.global_shift:
 			if not self.employee:
@@ -3,19 +3,26 @@
 # For license information, please see license.txt
 
 from datetime import timedelta
+import json
+import zlib
 
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import cint, getdate, get_datetime, date_diff, add_days
+from frappe.utils import cint, cstr, getdate, get_datetime, date_diff, add_days
+from frappe.utils.background_jobs import get_jobs
 from erpnext.hr.doctype.shift_assignment.shift_assignment import get_actual_start_end_datetime_of_shift, get_employee_shift
-from erpnext.hr.doctype.employee_checkin.employee_checkin import mark_attendance_and_link_log, calculate_working_hours
-from erpnext.hr.doctype.attendance.attendance import get_marked_attendance_dates_between, mark_absent
+from erpnext.hr.doctype.employee_checkin.employee_checkin import mark_attendance_and_link_logs, calculate_working_hours
+from erpnext.hr.doctype.attendance.attendance import get_marked_attendance_of_employees, make_auto_attendance
 from erpnext.hr.doctype.employee.employee import get_holiday_list_for_employee
 from erpnext.hr.doctype.holiday_list.holiday_list import is_holiday, get_holiday_dates_between
 from collections import OrderedDict
 
 
+# employees of a shift are processed in this many jobs by the scheduler
+auto_attendance_shards = 8
+
+
 class ShiftType(Document):
 	@frappe.whitelist()
 	def enqueue_auto_attendance(self):
@@ -31,52 +38,74 @@ class ShiftType(Document):
 		self.queue_action('process_auto_attendance', timeout=600)
 		frappe.msgprint(_("Auto Attendance Marking Started"), alert=True)
 
-	def process_auto_attendance(self):
+	def process_auto_attendance(self, shard=None, shard_count=None, publish_progress=True, update_logs=True):
+		"""
+			Marks attendance from unprocessed checkins and absents for employees of the shift.
+			If shard_count is given, only employees in the shard are processed.
+			Pass update_logs=False if the shift of the checkins was already updated by the caller.
+		"""
 		if not self.process_attendance_after:
 			return
 		if not self.last_sync_of_checkin:
 			return
 
-		update_shift_in_logs(self.process_attendance_after, self.last_sync_of_checkin, publish_progress=True)
-
-		filters = {
-			'skip_auto_attendance': '0',
-			'attendance': ('is', 'not set'),
-			'time': ('>=', self.process_attendance_after),
-			'shift_actual_end': ('<', self.last_sync_of_checkin),
-			'shift': self.name,
-			'employee': ('is', 'set')
-		}
+		if update_logs:
+			update_shift_in_logs(self.process_attendance_after, self.last_sync_of_checkin,
+				publish_progress=publish_progress, shard=shard, shard_count=shard_count)
 
-		logs = frappe.get_all('Employee Checkin', fields="*", filters=filters, order_by="employee, time")
 		grouped_logs = OrderedDict()
-		for d in logs:
+		for d in self.get_unprocessed_logs(shard, shard_count):
 			key = (d.employee, d.shift_start)
 			if key not in grouped_logs:
 				grouped_logs[key] = []
 
 			grouped_logs[key].append(d)
 
-		assigned_employees = self.get_assigned_employees(self.process_attendance_after, True)
-
-		total_tasks = len(grouped_logs) + len(assigned_employees)
-		completed_tasks = 0
-
+		shift_attendance = []
 		for (employee, shift_start), single_shift_logs in grouped_logs.items():
 			attendance_status, working_hours, late_entry, early_exit = self.get_attendance(single_shift_logs)
-			mark_attendance_and_link_log(single_shift_logs, attendance_status, shift_start.date(),
-				working_hours, late_entry, early_exit, self.name)
+			shift_attendance.append(frappe._dict({
+				'logs': single_shift_logs,
+				'attendance_status': attendance_status,
+				'attendance_date': shift_start.date(),
+				'working_hours': working_hours,
+				'late_entry': late_entry,
+				'early_exit': early_exit,
+			}))
 
-			completed_tasks += 1
-			frappe.publish_progress(completed_tasks * 100 / total_tasks,
-				title=_("Marking Attendance..."), description=_("Marking Attendance from Checkins"))
+		if cint(publish_progress):
+			frappe.publish_progress(50, title=_("Marking Attendance..."),
+				description=_("Marking Attendance from Checkins"))
 
-		for employee in assigned_employees:
-			self.mark_absent_for_dates_with_no_attendance(employee)
+		mark_attendance_and_link_logs(shift_attendance, self.name)
 
-			completed_tasks += 1
-			frappe.publish_progress(completed_tasks * 100 / total_tasks,
-				title=_("Marking Attendance..."), description=_("Marking Absents for missing Attendances"))
+		if cint(publish_progress):
+			frappe.publish_progress(75, title=_("Marking Attendance..."),
+				description=_("Marking Absents for missing Attendances"))
+
+		assigned_employees = [employee for employee in self.get_assigned_employees(self.process_attendance_after, True)
+			if is_employee_in_shard(employee, shard, shard_count)]
+		self.mark_absent_for_dates_with_no_attendance(assigned_employees, shard, shard_count)
+
+		if cint(publish_progress):
+			frappe.publish_progress(100, title=_("Marking Attendance..."))
+
+	def get_unprocessed_logs(self, shard=None, shard_count=None):
+		return frappe.db.sql("""
+			select name, employee, time, log_type, shift_start, shift_end, shift_actual_start, shift_actual_end
+			from `tabEmployee Checkin`
+			where skip_auto_attendance = 0
+				and ifnull(attendance, '') = ''
+				and time >= %(process_attendance_after)s
+				and shift_actual_end < %(last_sync_of_checkin)s
+				and shift = %(shift)s
+				and ifnull(employee, '') != '' {0}
+			order by employee, time
+		""".format(get_employee_shard_condition(shard, shard_count)), {
+			'process_attendance_after': self.process_attendance_after,
+			'last_sync_of_checkin': self.last_sync_of_checkin,
+			'shift': self.name,
+		}, as_dict=1)
 
 	def get_attendance(self, logs, ignore_working_hour_threshold=False):
 		"""Return attendance_status, working_hours for a set of logs belonging to a single shift.
@@ -154,40 +183,83 @@ class ShiftType(Document):
 
 		return early_exit_count >= cint(self.half_day_if_monthly_early_exit_count)
 
-	def mark_absent_for_dates_with_no_attendance(self, employee):
-		"""Marks Absents for the given employee on working days in this shift that have no attendance marked.
-		The Absent status is marked starting from 'process_attendance_after' or employee creation date.
+	def mark_absent_for_dates_with_no_attendance(self, employees, shard=None, shard_count=None):
+		"""Marks Absents for the given employees on working days in this shift that have no attendance marked.
+		The Absent status is marked starting from 'process_attendance_after' or employee creation date,
+		skipping the dates already checked for the employee in the previous runs of the shard.
 		"""
-		dates = self.get_dates_for_attendance(employee)
+		checked_till = self.get_absent_checked_till(shard, shard_count)
+
+		employee_date_ranges = {}
+		for employee in employees:
+			from_date = add_days(checked_till[employee], 1) if checked_till.get(employee) \
+				else getdate(self.process_attendance_after)
+			date_range = self.get_date_range_for_attendance(employee, from_date)
+			if date_range:
+				employee_date_ranges[employee] = date_range
+
+		if not employee_date_ranges:
+			return
+
+		start_date = min(start for start, end in employee_date_ranges.values())
+		end_date = max(end for start, end in employee_date_ranges.values())
+		marked_attendance = get_marked_attendance_of_employees(list(employee_date_ranges), start_date, end_date)
 
-		for date in dates:
-			shift_details = get_employee_shift(employee, date, True)
-			if shift_details and shift_details.shift_type.name == self.name:
-				mark_absent(employee, date, self.name)
+		for employee, (start, end) in employee_date_ranges.items():
+			for date in self.get_dates_for_attendance(employee, start, end, marked_attendance):
+				shift_details = get_employee_shift(employee, date, True)
+				if shift_details and shift_details.shift_type.name == self.name:
+					make_auto_attendance(employee, date, 'Absent', self.name)
 
-	def get_dates_for_attendance(self, employee):
+		self.set_absent_checked_till(dict((employee, end) for employee, (start, end) in employee_date_ranges.items()),
+			shard, shard_count)
+
+	def get_date_range_for_attendance(self, employee, from_date):
+		"""Returns (start date, end date) of the employee for marking absents from from_date"""
 		date_of_joining, relieving_date = frappe.db.get_value("Employee", employee,
 			("date_of_joining", "relieving_date"), cache=1)
 
 		if not date_of_joining:
-			return []
+			return None
 
-		start_date = max(getdate(self.process_attendance_after), date_of_joining)
+		start_date = max(getdate(from_date), date_of_joining)
 		actual_shift_datetime = get_actual_start_end_datetime_of_shift(employee, get_datetime(self.last_sync_of_checkin), True)
 		last_shift_time = actual_shift_datetime[0] if actual_shift_datetime[0] else get_datetime(self.last_sync_of_checkin)
 		prev_shift = get_employee_shift(employee, last_shift_time.date()-timedelta(days=1), True, 'reverse')
 		if prev_shift:
 			end_date = min(prev_shift.start_datetime.date(), relieving_date) if relieving_date else prev_shift.start_datetime.date()
 		else:
-			return []
+			return None
+
+		if end_date < start_date:
+			return None
 
+		return start_date, end_date
+
+	def get_dates_for_attendance(self, employee, start_date, end_date, marked_attendance):
 		# skip marking absent on holidays and marked attendnace
 		date_range = get_date_range(start_date, end_date)
 		holiday_list = self.get_holiday_list(employee)
 		holiday_dates = get_holiday_dates_between(holiday_list, start_date, end_date)
-		marked_attendance_dates = get_marked_attendance_dates_between(employee, start_date, end_date)
 
-		return sorted(set(date_range) - set(holiday_dates) - set(marked_attendance_dates))
+		return sorted(date for date in set(date_range) - set(holiday_dates)
+			if (employee, date) not in marked_attendance)
+
+	def get_absent_checked_till(self, shard=None, shard_count=None):
+		"""Returns {employee: date} till which absents were marked for the shard since 'Process Attendance After' was set"""
+		value = get_absent_checked_till(self.name, shard, shard_count)
+		if value.get("process_attendance_after") != cstr(getdate(self.process_attendance_after)):
+			return {}
+
+		return dict((employee, getdate(date)) for employee, date in value.get("employees", {}).items())
+
+	def set_absent_checked_till(self, employee_dates, shard=None, shard_count=None):
+		checked_till = self.get_absent_checked_till(shard, shard_count)
+		for employee, date in employee_dates.items():
+			if not checked_till.get(employee) or checked_till[employee] < getdate(date):
+				checked_till[employee] = getdate(date)
+
+		set_absent_checked_till(self.name, getdate(self.process_attendance_after), checked_till, shard, shard_count)
 
 	def get_assigned_employees(self, from_date=None, consider_default_shift=False):
 		args = {
@@ -231,33 +303,130 @@ class ShiftType(Document):
 
 
 def process_auto_attendance_for_all_shifts():
-	shift_list = frappe.get_all('Shift Type', 'name', {'enable_auto_attendance': 1}, as_list=True)
-	for shift in shift_list:
-		doc = frappe.get_doc('Shift Type', shift[0])
-		doc.process_auto_attendance()
+	"""Enqueues a job per shard of employees, unless the job of the previous run for the shard is still pending"""
+	queued_jobs = get_jobs(site=frappe.local.site, queue="long", key="job_name").get(frappe.local.site) or []
+	for shard in range(auto_attendance_shards):
+		job_name = get_auto_attendance_job_name(shard, auto_attendance_shards)
+		if job_name in queued_jobs:
+			continue
+
+		frappe.enqueue("erpnext.hr.doctype.shift_type.shift_type.process_auto_attendance_for_shard",
+			queue="long", timeout=3000, enqueue_after_commit=True, job_name=job_name,
+			shard=shard, shard_count=auto_attendance_shards)
+
+
+def process_auto_attendance_for_shard(shard, shard_count):
+	shift_list = frappe.get_all('Shift Type', {'enable_auto_attendance': 1},
+		['name', 'process_attendance_after', 'last_sync_of_checkin'])
+	shift_list = [d for d in shift_list if d.process_attendance_after and d.last_sync_of_checkin]
+	if not shift_list:
+		return
+
+	# checkins are not filtered by shift, so their shift is updated once for all the shifts
+	update_shift_in_logs(min(d.process_attendance_after for d in shift_list),
+		max(d.last_sync_of_checkin for d in shift_list), publish_progress=False, shard=shard, shard_count=shard_count)
+
+	for d in shift_list:
+		doc = frappe.get_doc('Shift Type', d.name)
+		doc.process_auto_attendance(shard=shard, shard_count=shard_count, publish_progress=False, update_logs=False)
+
+
+def get_auto_attendance_job_name(shard, shard_count):
+	return "process_auto_attendance_for_shard:{0}/{1}".format(cint(shard), cint(shard_count))
+
+
+def is_employee_in_shard(employee, shard=None, shard_count=None):
+	"""Returns True if the employee is in the shard, using the same hash as get_employee_shard_condition"""
+	if cint(shard_count) <= 1:
+		return True
+
+	return zlib.crc32(cstr(employee).encode("utf-8")) % cint(shard_count) == cint(shard)
+
+
+def get_employee_shard_condition(shard=None, shard_count=None, fieldname="employee"):
+	if cint(shard_count) <= 1:
+		return ""
+
+	return "and crc32({0}) %% {1} = {2}".format(fieldname, cint(shard_count), cint(shard))
+
+
+def get_absent_checked_till_key(shift_type, shard=None, shard_count=None):
+	if cint(shard_count) <= 1:
+		return "auto_attendance_absent_checked_till:{0}".format(shift_type)
+
+	return "auto_attendance_absent_checked_till:{0}:{1}/{2}".format(shift_type, cint(shard), cint(shard_count))
+
+
+def get_absent_checked_till(shift_type, shard=None, shard_count=None):
+	value = frappe.db.get_global(get_absent_checked_till_key(shift_type, shard, shard_count))
+	try:
+		value = json.loads(value) if value else {}
+	except ValueError:
+		# stored by an older version as a single date for the shard, checked again per employee
+		value = {}
+
+	return value if isinstance(value, dict) else {}
+
+
+def set_absent_checked_till(shift_type, process_attendance_after, employee_dates, shard=None, shard_count=None):
+	frappe.db.set_global(get_absent_checked_till_key(shift_type, shard, shard_count), json.dumps({
+		"process_attendance_after": cstr(process_attendance_after),
+		"employees": dict((employee, cstr(date)) for employee, date in employee_dates.items())
+	}))
+
+
+def reset_absent_checked_till(shift_type, from_date, employee=None):
+	"""Moves back the dates till which absents were marked for the shift, so that the dates from from_date
+	are checked again e.g. after a back dated Shift Assignment. Resets all employees if employee is not given."""
+	till_date = add_days(getdate(from_date), -1)
+
+	for shard, shard_count in [(None, None)] + [(shard, auto_attendance_shards) for shard in range(auto_attendance_shards)]:
+		if employee and not is_employee_in_shard(employee, shard, shard_count):
+			continue
+
+		value = get_absent_checked_till(shift_type, shard, shard_count)
+		employee_dates = value.get("employees")
+		if not employee_dates:
+			continue
+
+		changed = False
+		for emp, date in employee_dates.items():
+			if (not employee or emp == employee) and getdate(date) > till_date:
+				employee_dates[emp] = till_date
+				changed = True
+
+		if changed:
+			set_absent_checked_till(shift_type, value.get("process_attendance_after"), employee_dates, shard, shard_count)
 
 
 @frappe.whitelist()
-def update_shift_in_logs(process_attendance_after=None, last_sync_of_checkin=None, publish_progress=True):
+def update_shift_in_logs(process_attendance_after=None, last_sync_of_checkin=None, publish_progress=True,
+		shard=None, shard_count=None):
 	frappe.has_permission("Shift Type", "write", throw=True)
 
-	filters = {
-		'skip_auto_attendance': '0',
-		'attendance': ('is', 'not set'),
-		'shift': ('is', 'set'),
-		'employee': ('is', 'set'),
-	}
+	conditions = []
 
 	if not process_attendance_after:
 		process_attendance_after = frappe.db.sql("select min(process_attendance_after) from `tabShift Type`")
 		process_attendance_after = process_attendance_after[0][0] if process_attendance_after else None
 
 	if process_attendance_after:
-		filters['time'] = ('>=', process_attendance_after)
+		conditions.append("and time >= %(process_attendance_after)s")
 	if last_sync_of_checkin:
-		filters['shift_actual_end'] = ('<', last_sync_of_checkin)
-
-	logs = frappe.get_all('Employee Checkin', fields="name", filters=filters)
+		conditions.append("and shift_actual_end < %(last_sync_of_checkin)s")
+
+	logs = frappe.db.sql("""
+		select name
+		from `tabEmployee Checkin`
+		where skip_auto_attendance = 0
+			and ifnull(attendance, '') = ''
+			and ifnull(shift, '') != ''
+			and ifnull(employee, '') != ''
+			{0} {1}
+	""".format(" ".join(conditions), get_employee_shard_condition(shard, shard_count)), {
+		'process_attendance_after': process_attendance_after,
+		'last_sync_of_checkin': last_sync_of_checkin,
+	}, as_dict=1)
 
 	total_tasks = len(logs)
 	completed_tasks = 0
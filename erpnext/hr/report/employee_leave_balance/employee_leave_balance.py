@@ -3,9 +3,11 @@
 
 import frappe
 from frappe import _
-from frappe.utils import flt, add_days
+from frappe.utils import flt, add_days, getdate
 from erpnext.hr.doctype.leave_application.leave_application \
 	import get_leave_balance_on, get_leaves_for_period
+from erpnext.hr.doctype.leave_ledger_entry.leave_ledger_entry \
+	import load_leave_ledger_cache, clear_leave_ledger_cache, get_cached_leave_ledger_entries
 
 def execute(filters=None):
 	leave_types = frappe.db.sql_list("select name from `tabLeave Type` order by name asc")
@@ -44,7 +46,6 @@ def get_conditions(filters):
 	return conditions
 
 def get_data(filters, leave_types):
-	user = frappe.session.user
 	conditions = get_conditions(filters)
 
 	if filters.to_date <= filters.from_date:
@@ -56,6 +57,16 @@ def get_data(filters, leave_types):
 
 	department_approver_map = get_department_leave_approver_map(filters.get('department'))
 
+	is_new_cache = load_leave_ledger_cache([employee.name for employee in active_employees])
+	try:
+		return get_leave_balance_rows(filters, leave_types, active_employees, department_approver_map)
+	finally:
+		if is_new_cache:
+			clear_leave_ledger_cache()
+
+def get_leave_balance_rows(filters, leave_types, active_employees, department_approver_map):
+	user = frappe.session.user
+
 	data = []
 	for employee in active_employees:
 		leave_approvers = department_approver_map.get(employee.department_name, [])
@@ -121,6 +132,13 @@ def get_allocated_and_expired_leaves(records, from_date, to_date):
 	return new_allocation, expired_leaves
 
 def get_leave_ledger_entries(from_date, to_date, employee, leave_type):
+	ledger_entries = get_cached_leave_ledger_entries(employee)
+	if ledger_entries is not None:
+		from_date, to_date = getdate(from_date), getdate(to_date)
+		return [d for d in ledger_entries if d.leave_type == leave_type and d.docstatus == 1
+			and (from_date <= d.from_date <= to_date or from_date <= d.to_date <= to_date
+				or (d.from_date < from_date and d.to_date > to_date))]
+
 	records= frappe.db.sql("""
 		SELECT
 			employee, leave_type, from_date, to_date, leaves, transaction_name, transaction_type
@@ -6,6 +6,7 @@ from frappe.utils import flt
 from frappe import _
 from erpnext.hr.doctype.leave_application.leave_application import get_leaves_for_period, get_leave_balance_on
 from erpnext.hr.report.employee_leave_balance.employee_leave_balance import calculate_leaves_details , get_department_leave_approver_map
+from erpnext.hr.doctype.leave_ledger_entry.leave_ledger_entry import load_leave_ledger_cache, clear_leave_ledger_cache
 
 def execute(filters=None):
 	if filters.to_date <= filters.from_date:
@@ -68,13 +69,22 @@ def get_data(filters):
 
 	conditions = get_conditions(filters)
 
-	user = frappe.session.user
 	department_approver_map = get_department_leave_approver_map(filters.get('department'))
 
 	active_employees = frappe.get_list('Employee',
 		filters=conditions,
 		fields=['name', 'employee_name', 'department', 'user_id', 'leave_approver'])
 
+	is_new_cache = load_leave_ledger_cache([employee.name for employee in active_employees])
+	try:
+		return get_leave_balance_rows(filters, leave_types, active_employees, department_approver_map)
+	finally:
+		if is_new_cache:
+			clear_leave_ledger_cache()
+
+def get_leave_balance_rows(filters, leave_types, active_employees, department_approver_map):
+	user = frappe.session.user
+
 	data = []
 
 	for leave_type in leave_types:
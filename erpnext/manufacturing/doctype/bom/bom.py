@@ -10,6 +10,8 @@ from frappe.model.document import Document
 from erpnext.stock.get_item_details import (get_conversion_factor, get_price_list_data, get_default_warehouse,
 	get_default_cost_center)
 from erpnext.stock.doctype.item_alternative.item_alternative import has_alternative_item
+from erpnext.manufacturing.doctype.bom.bom_explosion import (get_bom_explosion_items, get_cached_explosion,
+	clear_bom_explosion_cache)
 from frappe.core.doctype.version.version import get_diff
 from frappe.model.utils import get_fetch_values
 import functools
@@ -22,6 +24,11 @@ form_grid_templates = {
 
 force_fields = ["stock_uom"]
 
+bom_item_cost_fields = ["conversion_factor", "stock_qty", "rate", "amount", "base_rate", "base_amount",
+	"qty_consumed_per_unit"]
+exploded_item_cost_fields = ["qty", "stock_qty", "rate", "amount", "qty_consumed_per_unit",
+	"stock_qty_consumed_per_unit"]
+
 
 class BOM(Document):
 	def get_feed(self):
@@ -249,6 +256,8 @@ class BOM(Document):
 			save = False
 
 		existing_bom_cost = self.total_cost
+		existing_item_values = {d.name: d.as_dict() for d in self.get("items")}
+		fetch_fields = set()
 
 		for d in self.get("items"):
 			if not d.get("item_code"):
@@ -256,7 +265,9 @@ class BOM(Document):
 
 			d.conversion_factor = get_conversion_factor(d.item_code, d.uom).get("conversion_factor") or 1
 			d.stock_qty = flt(d.conversion_factor) * flt(d.qty)
-			d.update(get_fetch_values(d.doctype, 'item_code', d.item_code))
+			fetch_values = get_fetch_values(d.doctype, 'item_code', d.item_code)
+			fetch_fields.update(fetch_values.keys())
+			d.update(fetch_values)
 
 			rate = self.get_rm_rate({
 				"item_code": d.item_code,
@@ -273,17 +284,16 @@ class BOM(Document):
 			d.base_rate = flt(d.rate) * flt(self.conversion_rate)
 			d.base_amount = flt(d.amount) * flt(self.conversion_rate)
 
-			if save:
-				d.db_update()
-
 		if self.docstatus == 1:
 			self.flags.ignore_validate_update_after_submit = True
 
 		self.calculate_cost()
 		if save:
-			self.db_update()
+			self.db_update_cost(existing_item_values, bom_item_cost_fields + sorted(fetch_fields))
 			self.notify_update()
-		self.update_exploded_items()
+			self.update_exploded_item_costs()
+		else:
+			self.update_exploded_items()
 
 		# update parent BOMs
 		if self.total_cost != existing_bom_cost and update_parent:
@@ -296,6 +306,14 @@ class BOM(Document):
 		if not from_child_bom:
 			frappe.msgprint(_("Cost Updated"), alert=True)
 
+	def db_update_cost(self, existing_item_values, fields):
+		"""Writes changed BOM Item costs in bulk and BOM totals without saving the document"""
+		changed_items = [d for d in self.get("items")
+			if any(d.get(f) != existing_item_values.get(d.name, {}).get(f) for f in fields)]
+
+		bulk_update_child_rows("BOM Item", changed_items, fields)
+		self.db_update()
+
 	def update_parent_cost(self):
 		if self.total_cost:
 			cost = self.total_cost / self.quantity
@@ -572,6 +590,27 @@ class BOM(Document):
 		self.get_exploded_items()
 		self.add_exploded_items()
 
+	def update_exploded_item_costs(self):
+		"""Updates qty and rates of existing Flat BOM items in bulk, or rewrites Flat BOM if its items are changed"""
+		self.get_exploded_items()
+
+		existing_items = {(d.item_code, d.uom): d for d in self.get("exploded_items")}
+		if len(existing_items) != len(self.get("exploded_items")) or set(existing_items) != set(self.cur_exploded_items):
+			self.add_exploded_items()
+			return
+
+		for key, args in self.cur_exploded_items.items():
+			ch = existing_items[key]
+			ch.qty = args.qty
+			ch.stock_qty = args.stock_qty
+			ch.rate = args.rate
+			ch.amount = flt(ch.qty) * flt(ch.rate)
+			ch.qty_consumed_per_unit = flt(ch.qty) / flt(self.quantity)
+			ch.stock_qty_consumed_per_unit = flt(ch.stock_qty) / flt(self.quantity)
+
+		bulk_update_child_rows("BOM Explosion Item", self.get("exploded_items"), exploded_item_cost_fields)
+		clear_bom_explosion_cache()
+
 	def get_exploded_items(self):
 		""" Get all raw materials including items from child bom"""
 		self.cur_exploded_items = {}
@@ -610,29 +649,7 @@ class BOM(Document):
 
 	def get_child_exploded_items(self, bom_no, qty, skip_transfer_for_manufacture=0):
 		""" Add all items from Flat BOM of child BOM"""
-		# Did not use qty_consumed_per_unit in the query, as it leads to rounding loss
-		child_fb_items = frappe.db.sql("""
-			SELECT
-				bom_item.item_code,
-				bom_item.item_name,
-				bom_item.description,
-				bom_item.source_warehouse,
-				bom_item.operation,
-				bom_item.uom,
-				bom_item.qty,
-				bom_item.stock_uom,
-				bom_item.stock_qty,
-				bom_item.rate,
-				bom_item.skip_transfer_for_manufacture,
-				bom_item.qty / ifnull(bom.quantity, 1) AS qty_consumed_per_unit
-			FROM `tabBOM Explosion Item` bom_item, tabBOM bom
-			WHERE
-				bom_item.parent = bom.name
-				AND bom.name = %s
-				AND bom.docstatus = 1
-		""", bom_no, as_dict = 1)
-
-		for d in child_fb_items:
+		for d in get_bom_explosion_items(bom_no):
 			new_qty = d['qty_consumed_per_unit'] * qty
 			new_stock_qty = new_qty * ((d['stock_qty'] / d['qty']) or 1)
 			self.add_to_cur_exploded_items(frappe._dict({
@@ -668,6 +685,9 @@ class BOM(Document):
 			if self.docstatus == 1:
 				ch.db_insert()
 
+		if self.docstatus == 1:
+			clear_bom_explosion_cache()
+
 	def validate_bom_links(self):
 		if not self.is_active:
 			act_pbom = frappe.db.sql("""select distinct bom_item.parent from `tabBOM Item` bom_item
@@ -712,16 +732,46 @@ def get_bom_items_as_dict(
 ):
 	items_dict = {}
 
+	items = get_bom_items_per_unit(bom, fetch_exploded, fetch_scrap_items, fetch_qty_in_stock_uom)
+
+	# Create dict
+	for item in items:
+		if not include_non_stock_items and not cint(item.is_stock_item):
+			continue
+
+		item = frappe._dict(item)
+		del item["is_stock_item"]
+		item.qty = flt(item.qty) * flt(qty)
+
+		if item.item_code in items_dict:
+			items_dict[item.item_code]["qty"] += flt(item.qty)
+		else:
+			items_dict[item.item_code] = item
+
+	# Set additional values
+	for item, item_details in items_dict.items():
+		item_doc = frappe.get_cached_doc("Item", item)
+		defaults_args = frappe._dict({"company": company})
+
+		item_details.default_warehouse = get_default_warehouse(item_doc, defaults_args)
+		item_details.cost_center = get_default_cost_center(item_doc, defaults_args)
+
+	return items_dict
+
+
+def get_bom_items_per_unit(bom, fetch_exploded=1, fetch_scrap_items=0, fetch_qty_in_stock_uom=True):
+	"""Returns BOM Items, Explosion Items or Scrap Items with qty per unit of BOM from the BOM explosion cache"""
 	# Did not use qty_consumed_per_unit in the query, as it leads to rounding loss
 	query = """
 		SELECT
 			bom_item.item_code,
 			item.item_name,
-			sum(bom_item.{qty_field}/ifnull(bom.quantity, 1)) * %(qty)s as qty,
+			sum(bom_item.{qty_field}/ifnull(bom.quantity, 1)) as qty,
 			bom_item.idx,
 			item.image,
 			bom.project,
-			item.stock_uom
+			item.stock_uom,
+			item.is_stock_item
 			{select_columns}
 		FROM `tab{table}` bom_item
 		INNER JOIN `tabBOM` bom ON bom_item.parent = bom.name
@@ -729,66 +779,41 @@ def get_bom_items_as_dict(
 		WHERE
 			bom_item.docstatus < 2
 			and bom.name = %(bom)s
-			and item.is_stock_item in (1, {is_stock_item})
-			{where_conditions}
 		GROUP BY item_code, stock_uom
 		ORDER BY idx
 	"""
 
-	is_stock_item = 0 if include_non_stock_items else 1
-	if cint(fetch_exploded):
-		uom_fields = ""
-		if not fetch_qty_in_stock_uom:
-			uom_fields = ", bom_item.stock_qty / bom_item.qty as conversion_factor, bom_item.uom"
-
-		query = query.format(
-			table="BOM Explosion Item",
-			where_conditions="",
-			is_stock_item=is_stock_item,
-			qty_field="stock_qty" if fetch_qty_in_stock_uom else "qty",
-			select_columns=""", bom_item.source_warehouse, bom_item.operation,
-				bom_item.skip_transfer_for_manufacture, bom_item.description, bom_item.rate,
-				(Select idx from `tabBOM Item` where item_code = bom_item.item_code and parent = %(parent)s limit 1) as idx
-				{0}""".format(uom_fields)
-		)
-		items = frappe.db.sql(query, { "parent": bom, "qty": qty, "bom": bom, "company": company }, as_dict=True)
-	elif fetch_scrap_items:
-		query = query.format(
-			table="BOM Scrap Item",
-			where_conditions="",
-			select_columns=", bom_item.idx, item.description",
-			is_stock_item=is_stock_item,
-			qty_field="stock_qty"
-		)
-		items = frappe.db.sql(query, { "qty": qty, "bom": bom, "company": company }, as_dict=True)
-	else:
-		query = query.format(
-			table="BOM Item",
-			where_conditions="",
-			is_stock_item=is_stock_item,
-			qty_field="stock_qty" if fetch_qty_in_stock_uom else "qty",
-			select_columns = """, bom_item.uom, bom_item.conversion_factor, bom_item.source_warehouse,
-				bom_item.idx, bom_item.operation, bom_item.skip_transfer_for_manufacture,
-				bom_item.description, bom_item.base_rate as rate """
-		)
-		items = frappe.db.sql(query, { "qty": qty, "bom": bom, "company": company }, as_dict=True)
-
-	# Create dict
-	for item in items:
-		if item.item_code in items_dict:
-			items_dict[item.item_code]["qty"] += flt(item.qty)
+	def generator():
+		if cint(fetch_exploded):
+			uom_fields = ""
+			if not fetch_qty_in_stock_uom:
+				uom_fields = ", bom_item.stock_qty / bom_item.qty as conversion_factor, bom_item.uom"
+
+			return frappe.db.sql(query.format(
+				table="BOM Explosion Item",
+				qty_field="stock_qty" if fetch_qty_in_stock_uom else "qty",
+				select_columns=""", bom_item.source_warehouse, bom_item.operation,
+					bom_item.skip_transfer_for_manufacture, bom_item.description, bom_item.rate,
+					(Select idx from `tabBOM Item` where item_code = bom_item.item_code and parent = %(parent)s limit 1) as idx
+					{0}""".format(uom_fields)
+			), {"parent": bom, "bom": bom}, as_dict=True)
+		elif fetch_scrap_items:
+			return frappe.db.sql(query.format(
+				table="BOM Scrap Item",
+				select_columns=", bom_item.idx, item.description",
+				qty_field="stock_qty"
+			), {"bom": bom}, as_dict=True)
 		else:
-			items_dict[item.item_code] = item
-
-	# Set additional values
-	for item, item_details in items_dict.items():
-		item_doc = frappe.get_cached_doc("Item", item)
-		defaults_args = frappe._dict({"company": company})
-
-		item_details.default_warehouse = get_default_warehouse(item_doc, defaults_args)
-		item_details.cost_center = get_default_cost_center(item_doc, defaults_args)
+			return frappe.db.sql(query.format(
+				table="BOM Item",
+				qty_field="stock_qty" if fetch_qty_in_stock_uom else "qty",
+				select_columns = """, bom_item.uom, bom_item.conversion_factor, bom_item.source_warehouse,
+					bom_item.idx, bom_item.operation, bom_item.skip_transfer_for_manufacture,
+					bom_item.description, bom_item.base_rate as rate """
+			), {"bom": bom}, as_dict=True)
 
-	return items_dict
+	key = ("bom_items_per_unit", bom, cint(fetch_exploded), cint(fetch_scrap_items), cint(fetch_qty_in_stock_uom))
+	return get_cached_explosion(key, generator)
 
 
 @frappe.whitelist()
@@ -865,7 +890,32 @@ def get_children(doctype, parent=None, is_root=False, **filters):
 		return bom_items
 
 
+def bulk_update_child_rows(doctype, rows, fields, chunk_size=100):
+	"""Writes fields of child rows using one UPDATE statement per chunk"""
+	for i in range(0, len(rows), chunk_size):
+		chunk = rows[i:i + chunk_size]
+
+		set_clauses = []
+		values = []
+		for fieldname in fields:
+			set_clauses.append("`{0}` = case name {1} end".format(fieldname, " ".join(["when %s then %s"] * len(chunk))))
+			for d in chunk:
+				values += [d.name, d.get(fieldname)]
+
+		values += [d.name for d in chunk]
+
+		frappe.db.sql("""
+			update `tab{0}`
+			set {1}
+			where name in ({2})
+		""".format(doctype, ", ".join(set_clauses), ", ".join(["%s"] * len(chunk))), values)
+
+
 def get_boms_in_bottom_up_order(bom_no=None):
+	return get_active_bom_graph().topological_sort(parent_bom=bom_no)
+
+
+def get_active_bom_graph():
 	from erpnext.manufacturing.doctype.bom.bom_tree import BOMGraph
 
 	bom_nos = frappe.db.sql_list("""
@@ -885,9 +935,7 @@ def get_boms_in_bottom_up_order(bom_no=None):
 	for d in bom_edges:
 		bom_graph.add_edge(d.parent, d.child)
 
-	sorted_boms = bom_graph.topological_sort(parent_bom=bom_no)
-
-	return sorted_boms
+	return bom_graph
 
 
 def add_additional_cost(stock_entry, work_order):
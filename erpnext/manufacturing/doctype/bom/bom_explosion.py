@@ -0,0 +1,143 @@
+# Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import frappe
+from frappe.utils import cint, flt
+from erpnext.utilities.versioned_cache import get_versioned_cache, clear_versioned_cache
+
+
+max_cached_explosions = 5000
+
+
+def get_bom_explosion_cache():
+	"""
+		Returns the in process cache of BOM explosions for the site
+
+		The cache is reset in a process when a BOM is modified, or when it is cleared
+		by an update of a BOM or an Item.
+	"""
+	return get_versioned_cache("bom_explosion", get_bom_fingerprint, max_size=max_cached_explosions)
+
+
+def get_bom_fingerprint():
+	return frappe.db.sql("select max(modified) from `tabBOM`")[0][0]
+
+
+def clear_bom_explosion_cache(doc=None, method=None):
+	clear_versioned_cache("bom_explosion")
+
+
+def get_cached_explosion(key, generator):
+	cache = get_bom_explosion_cache()
+	if key not in cache:
+		cache[key] = generator()
+
+	return cache[key]
+
+
+def get_bom_item_rows(bom_no):
+	"""Returns BOM Items grouped by item code with stock qty per unit of BOM and Item details used for planning"""
+	def generator():
+		return frappe.db.sql("""
+			SELECT
+				bom_item.item_code, item.default_material_request_type, item.item_name,
+				ifnull(sum(bom_item.stock_qty/ifnull(bom.quantity, 1)), 0) as qty_per_unit,
+				item.is_sub_contracted_item as is_sub_contracted, bom_item.source_warehouse,
+				item.default_bom as default_bom, bom_item.description as description,
+				bom_item.stock_uom as stock_uom, item.min_order_qty as min_order_qty,
+				item.purchase_uom, item_uom.conversion_factor, item.is_stock_item
+			FROM
+				`tabBOM Item` bom_item
+				JOIN `tabBOM` bom ON bom.name = bom_item.parent
+				JOIN tabItem item ON bom_item.item_code = item.name
+				LEFT JOIN `tabUOM Conversion Detail` item_uom
+					ON item.name = item_uom.parent and item_uom.uom = item.purchase_uom
+			where
+				bom.name = %s
+				and bom_item.docstatus < 2
+			group by bom_item.item_code""", bom_no, as_dict=1)
+
+	return get_cached_explosion(("bom_items", bom_no), generator)
+
+
+def get_flat_bom_items(bom_no, include_non_stock_items=False, include_subcontracted_items=False,
+		explode_sub_assemblies=False):
+	"""
+		Returns leaf items of a BOM with qty per unit of the root BOM and the path of BOMs they are reached by,
+		exploding sub assemblies through their default BOM in the same order as they are listed
+	"""
+	def generator():
+		out = []
+		explode(bom_no, 1, (bom_no,))
+		return out
+
+	def explode(bom, parent_qty, path):
+		for d in get_bom_item_rows(bom):
+			if not include_non_stock_items and not cint(d.is_stock_item):
+				continue
+
+			qty_per_unit = flt(parent_qty) * flt(d.qty_per_unit)
+
+			if not explode_sub_assemblies or not d.default_bom:
+				out.append(frappe._dict(d, qty_per_unit=qty_per_unit, path=path))
+
+			if explode_sub_assemblies and d.default_bom and d.default_bom not in path:
+				if ((d.default_material_request_type in ["Manufacture", "Purchase"] and
+					not d.is_sub_contracted) or (d.is_sub_contracted and include_subcontracted_items)):
+					if qty_per_unit > 0:
+						explode(d.default_bom, qty_per_unit, path + (d.default_bom,))
+
+	key = ("flat_bom_items", bom_no, cint(include_non_stock_items), cint(include_subcontracted_items),
+		cint(explode_sub_assemblies))
+	return get_cached_explosion(key, generator)
+
+
+def get_bom_explosion_items(bom_no):
+	"""Returns BOM Explosion Items of a submitted BOM with qty consumed per unit of BOM"""
+	def generator():
+		# Did not use qty_consumed_per_unit in the query, as it leads to rounding loss
+		return frappe.db.sql("""
+			SELECT
+				bom_item.item_code,
+				bom_item.item_name,
+				bom_item.description,
+				bom_item.source_warehouse,
+				bom_item.operation,
+				bom_item.uom,
+				bom_item.qty,
+				bom_item.stock_uom,
+				bom_item.stock_qty,
+				bom_item.rate,
+				bom_item.skip_transfer_for_manufacture,
+				bom_item.qty / ifnull(bom.quantity, 1) AS qty_consumed_per_unit
+			FROM `tabBOM Explosion Item` bom_item, tabBOM bom
+			WHERE
+				bom_item.parent = bom.name
+				AND bom.name = %s
+				AND bom.docstatus = 1
+		""", bom_no, as_dict=1)
+
+	return get_cached_explosion(("explosion_items", bom_no), generator)
+
+
+def get_bom_explosion_item_rows(bom_no):
+	"""Returns BOM Explosion Items grouped by item code and stock uom with stock qty per unit of BOM and Item details used for planning"""
+	def generator():
+		return frappe.db.sql("""
+			select bei.item_code, item.default_bom as bom,
+				ifnull(sum(bei.stock_qty/ifnull(bom.quantity, 1)), 0) as qty_per_unit, item.item_name,
+				bei.description, bei.stock_uom, item.min_order_qty, bei.source_warehouse,
+				item.default_material_request_type, item.purchase_uom, item_uom.conversion_factor,
+				item.is_stock_item
+			from
+				`tabBOM Explosion Item` bei
+				JOIN `tabBOM` bom ON bom.name = bei.parent
+				JOIN `tabItem` item ON item.name = bei.item_code
+				LEFT JOIN `tabUOM Conversion Detail` item_uom
+					ON item.name = item_uom.parent and item_uom.uom = item.purchase_uom
+			where
+				bei.docstatus < 2
+				and bom.name = %s
+			group by bei.item_code, bei.stock_uom""", bom_no, as_dict=1)
+
+	return get_cached_explosion(("explosion_item_rows", bom_no), generator)
@@ -29,3 +29,20 @@ class BOMGraph:
 				self._topological_sort_util(child_bom, visited, stack)
 
 		stack.append(bom_no)
+
+	def get_ancestors(self, bom_nos):
+		"""Returns bom_nos along with all the BOMs they are used in"""
+		parents = {}
+		for parent, children in self.graph.items():
+			for child_bom in children:
+				parents.setdefault(child_bom, []).append(parent)
+
+		ancestors = set()
+		stack = list(bom_nos)
+		while stack:
+			bom_no = stack.pop()
+			if bom_no not in ancestors:
+				ancestors.add(bom_no)
+				stack += parents.get(bom_no, [])
+
+		return ancestors
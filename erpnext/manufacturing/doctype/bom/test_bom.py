@@ -56,6 +56,22 @@ class TestBOM(unittest.TestCase):
 
 		self.assertTrue(_get_default_bom_in_item(), bom.name)
 
+	def test_bom_explosion_cache(self):
+		from erpnext.manufacturing.doctype.bom.bom_explosion import get_flat_bom_items, get_bom_explosion_cache
+
+		bom_no = get_default_bom()
+		flat_items = get_flat_bom_items(bom_no, include_non_stock_items=True)
+		self.assertEqual(sorted(d.item_code for d in flat_items),
+			sorted(d["item_code"] for d in test_records[2]["items"]))
+		self.assertEqual([d.path for d in flat_items], [(bom_no,)] * len(flat_items))
+		self.assertTrue(get_flat_bom_items(bom_no, include_non_stock_items=True) is flat_items)
+
+		# cache is invalidated on update of a BOM
+		bom = frappe.get_doc("BOM", bom_no)
+		bom.save()
+		self.assertFalse(get_bom_explosion_cache())
+		self.assertFalse(get_flat_bom_items(bom_no, include_non_stock_items=True) is flat_items)
+
 	def test_update_bom_cost_in_all_boms(self):
 		# get current rate for '_Test Item 2'
 		rm_rate = frappe.db.sql("""select rate from `tabBOM Item`
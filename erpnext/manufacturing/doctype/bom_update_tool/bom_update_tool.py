@@ -3,10 +3,11 @@
 # For license information, please see license.txt
 
 import frappe, json
-from frappe.utils import cstr, flt
+from frappe.utils import cstr, flt, now_datetime
 from frappe import _
 from six import string_types
-from erpnext.manufacturing.doctype.bom.bom import get_boms_in_bottom_up_order
+from erpnext.manufacturing.doctype.bom.bom import get_active_bom_graph
+from erpnext.manufacturing.doctype.bom.bom_explosion import clear_bom_explosion_cache
 from frappe.model.document import Document
 import click
 
@@ -19,6 +20,7 @@ class BOMUpdateTool(Document):
 		self.update_new_bom(unit_cost)
 
 		frappe.cache().delete_key('bom_children')
+		clear_bom_explosion_cache()
 		bom_list = self.get_parent_boms(self.new_bom)
 
 		with click.progressbar(bom_list) as bom_list:
@@ -97,7 +99,7 @@ def enqueue_replace_bom(args):
 @frappe.whitelist()
 def enqueue_update_cost():
 	frappe.enqueue("erpnext.manufacturing.doctype.bom_update_tool.bom_update_tool.update_cost",
-		timeout=40000, queue="long")
+		timeout=40000, queue="long", update_all_boms=True)
 	frappe.msgprint(_("Queued for updating latest price in all Bill of Materials. It may take a few minutes."))
 
 
@@ -118,10 +120,82 @@ def replace_bom(args):
 	frappe.db.auto_commit_on_many_writes = 0
 
 
-def update_cost():
+def update_cost(update_all_boms=False):
+	"""
+		Updates cost of BOMs in bottom up order. Unless update_all_boms is set, only the BOMs using items
+		whose rates may have changed since the last update and the BOMs they are used in are updated
+	"""
 	frappe.db.auto_commit_on_many_writes = 1
-	bom_list = get_boms_in_bottom_up_order()
+	update_started = now_datetime()
+
+	last_updated = None if update_all_boms else frappe.db.get_global("bom_cost_last_updated")
+	bom_list = get_boms_to_update_cost(last_updated)
 	for bom in bom_list:
 		frappe.get_doc("BOM", bom).update_cost(update_parent=False, from_child_bom=True)
 
+	frappe.db.set_global("bom_cost_last_updated", str(update_started))
 	frappe.db.auto_commit_on_many_writes = 0
+
+
+def get_boms_to_update_cost(from_datetime=None):
+	"""Returns active BOMs in bottom up order, filtered by rate changes since from_datetime if given"""
+	bom_graph = get_active_bom_graph()
+	bom_list = bom_graph.topological_sort()
+	if not from_datetime:
+		return bom_list
+
+	changed_items = get_items_with_changed_rates(from_datetime)
+
+	changed_boms = set(frappe.db.sql_list("""
+		select name
+		from `tabBOM`
+		where docstatus = 1 and is_active = 1 and modified >= %s
+	""", from_datetime))
+
+	changed_items = list(changed_items)
+	for i in range(0, len(changed_items), 500):
+		chunk = changed_items[i:i + 500]
+		changed_boms.update(frappe.db.sql_list("""
+			select distinct bom.name
+			from `tabBOM` bom
+			where bom.docstatus = 1 and bom.is_active = 1
+				and (exists(select i.name from `tabBOM Item` i
+						where i.parent = bom.name and i.parenttype = 'BOM' and i.item_code in %(items)s)
+					or exists(select i.name from `tabBOM Scrap Item` i
+						where i.parent = bom.name and i.parenttype = 'BOM' and i.item_code in %(items)s))
+		""", {"items": chunk}))
+
+	affected_boms = bom_graph.get_ancestors(changed_boms)
+	return [bom for bom in bom_list if bom in affected_boms]
+
+
+def get_items_with_changed_rates(from_datetime):
+	"""
+		Returns items whose valuation rate, buying price list rate, last purchase rate or
+		Item master may have changed since from_datetime
+	"""
+	changed_items = set()
+
+	# valuation rate is updated in Bin by the stock ledger
+	changed_items.update(frappe.db.sql_list("""
+		select distinct item_code from `tabBin` where modified >= %s
+	""", from_datetime))
+
+	changed_items.update(frappe.db.sql_list("""
+		select distinct item_code from `tabItem Price` where buying = 1 and modified >= %s
+	""", from_datetime))
+
+	changed_items.update(frappe.db.sql_list("""
+		select name from `tabItem` where modified >= %s
+	""", from_datetime))
+
+	# last purchase rate is updated on submission and cancellation of buying transactions
+	for doctype in ("Purchase Order", "Purchase Receipt", "Purchase Invoice"):
+		changed_items.update(frappe.db.sql_list("""
+			select distinct i.item_code
+			from `tab{0} Item` i
+			inner join `tab{0}` p on p.name = i.parent
+			where p.docstatus > 0 and p.modified >= %s
+		""".format(doctype), from_datetime))
+
+	return changed_items
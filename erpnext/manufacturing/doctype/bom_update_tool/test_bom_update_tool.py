@@ -6,7 +6,7 @@ import unittest
 import frappe
 from erpnext.stock.doctype.item.test_item import create_item
 from erpnext.manufacturing.doctype.production_plan.test_production_plan import make_bom
-from erpnext.manufacturing.doctype.bom_update_tool.bom_update_tool import update_cost
+from erpnext.manufacturing.doctype.bom_update_tool.bom_update_tool import update_cost, get_boms_to_update_cost
 
 test_records = frappe.get_test_records('BOM')
 
@@ -57,3 +57,19 @@ class TestBOMUpdateTool(unittest.TestCase):
 
 		doc.load_from_db()
 		self.assertEquals(doc.total_cost, 200)
+
+	def test_boms_to_update_cost(self):
+		from erpnext.manufacturing.doctype.bom.test_bom import get_default_bom
+
+		update_cost()
+		last_updated = frappe.db.get_global("bom_cost_last_updated")
+
+		bom_no = get_default_bom("_Test Item Home Desktop Manufactured")
+		parent_bom_no = get_default_bom("_Test FG Item 2")
+		self.assertFalse(parent_bom_no in get_boms_to_update_cost(last_updated))
+
+		frappe.db.set_value("Item", "_Test Item 2", "valuation_rate", 100)
+		boms_to_update = get_boms_to_update_cost(last_updated)
+
+		# parent BOM is updated after the BOM it uses
+		self.assertTrue(boms_to_update.index(bom_no) < boms_to_update.index(parent_bom_no))
@@ -10,6 +10,7 @@ from frappe.model.document import Document
 from frappe.utils import cstr, flt, cint, nowdate, add_days, comma_and, now_datetime, ceil
 from frappe.utils.csvutils import build_csv_response
 from erpnext.manufacturing.doctype.bom.bom import validate_bom_no, get_children
+from erpnext.manufacturing.doctype.bom.bom_explosion import get_flat_bom_items, get_bom_explosion_item_rows
 from erpnext.manufacturing.doctype.work_order.work_order import get_item_details
 from erpnext.stock.get_item_details import get_default_warehouse
 
@@ -449,69 +450,40 @@ def download_raw_materials(doc):
 	build_csv_response(item_list, doc.name)
 
 def get_exploded_items(item_details, company, bom_no, include_non_stock_items, planned_qty=1):
-	for d in frappe.db.sql("""select bei.item_code, item.default_bom as bom,
-			ifnull(sum(bei.stock_qty/ifnull(bom.quantity, 1)), 0)*%s as qty, item.item_name,
-			bei.description, bei.stock_uom, item.min_order_qty, bei.source_warehouse,
-			item.default_material_request_type, item.min_order_qty,
-			item.purchase_uom, item_uom.conversion_factor
-		from
-			`tabBOM Explosion Item` bei
-			JOIN `tabBOM` bom ON bom.name = bei.parent
-			JOIN `tabItem` item ON item.name = bei.item_code
-			LEFT JOIN `tabUOM Conversion Detail` item_uom
-				ON item.name = item_uom.parent and item_uom.uom = item.purchase_uom
-		where
-			bei.docstatus < 2
-			and bom.name=%s and item.is_stock_item in (1, {0})
-		group by bei.item_code, bei.stock_uom""".format(0 if include_non_stock_items else 1),
-		(planned_qty, bom_no), as_dict=1):
-			item_details.setdefault(d.get('item_code'), d)
+	for d in get_bom_explosion_item_rows(bom_no):
+		if not include_non_stock_items and not cint(d.is_stock_item):
+			continue
+
+		if d.item_code not in item_details:
+			item_details[d.item_code] = frappe._dict({k: d.get(k) for k in exploded_item_fields},
+				qty=flt(d.qty_per_unit) * flt(planned_qty))
+
 	return item_details
 
+exploded_item_fields = ['item_code', 'bom', 'item_name', 'description', 'stock_uom', 'min_order_qty',
+	'source_warehouse', 'default_material_request_type', 'purchase_uom', 'conversion_factor']
+
 def get_subitems(doc, data, item_details, bom_no, company, include_non_stock_items,
 	include_subcontracted_items, parent_qty, planned_qty=1):
-	items = frappe.db.sql("""
-		SELECT
-			bom_item.item_code, default_material_request_type, item.item_name,
-			ifnull(%(parent_qty)s * sum(bom_item.stock_qty/ifnull(bom.quantity, 1)) * %(planned_qty)s, 0) as qty,
-			item.is_sub_contracted_item as is_sub_contracted, bom_item.source_warehouse,
-			item.default_bom as default_bom, bom_item.description as description,
-			bom_item.stock_uom as stock_uom, item.min_order_qty as min_order_qty,
-			item.purchase_uom, item_uom.conversion_factor
-		FROM
-			`tabBOM Item` bom_item
-			JOIN `tabBOM` bom ON bom.name = bom_item.parent
-			JOIN tabItem item ON bom_item.item_code = item.name
-			LEFT JOIN `tabUOM Conversion Detail` item_uom
-				ON item.name = item_uom.parent and item_uom.uom = item.purchase_uom
-		where
-			bom.name = %(bom)s
-			and bom_item.docstatus < 2
-			and item.is_stock_item in (1, {0})
-		group by bom_item.item_code""".format(0 if include_non_stock_items else 1),{
-			'bom': bom_no,
-			'parent_qty': parent_qty,
-			'planned_qty': planned_qty,
-			'company': company
-		}, as_dict=1)
+	flat_items = get_flat_bom_items(bom_no, include_non_stock_items, include_subcontracted_items,
+		explode_sub_assemblies=data.get('include_exploded_items'))
+
+	for d in flat_items:
+		qty = flt(parent_qty) * d.qty_per_unit * flt(planned_qty)
+		if d.item_code in item_details:
+			item_details[d.item_code].qty = item_details[d.item_code].qty + qty
+		else:
+			item_details[d.item_code] = frappe._dict({k: d.get(k) for k in subitem_fields}, qty=qty)
 
-	for d in items:
-		if not data.get('include_exploded_items') or not d.default_bom:
-			if d.item_code in item_details:
-				item_details[d.item_code].qty = item_details[d.item_code].qty + d.qty
-			else:
-				item_details[d.item_code] = d
-
-		if data.get('include_exploded_items') and d.default_bom:
-			if ((d.default_material_request_type in ["Manufacture", "Purchase"] and
-				not d.is_sub_contracted) or (d.is_sub_contracted and include_subcontracted_items)):
-				if d.qty > 0:
-					get_subitems(doc, data, item_details, d.default_bom, company,
-						include_non_stock_items, include_subcontracted_items, d.qty)
 	return item_details
 
+subitem_fields = ['item_code', 'default_material_request_type', 'item_name', 'is_sub_contracted',
+	'source_warehouse', 'default_bom', 'description', 'stock_uom', 'min_order_qty', 'purchase_uom',
+	'conversion_factor']
+
 def get_material_request_items(row, sales_order,
-	company, ignore_existing_ordered_qty, warehouse, bin_dict):
+	company, ignore_existing_ordered_qty, warehouse, bin_dict, reserved_qty_for_production=None,
+	must_be_whole_number=None):
 	from erpnext.stock.doctype.bin.bin import get_reserved_qty_for_production
 
 	total_qty = row['qty']
@@ -522,10 +494,15 @@ def get_material_request_items(row, sales_order,
 	required_qty = 0
 	projected_qty = bin_dict.get("projected_qty", 0)
 	if sales_order:
-		existing_work_orders = frappe.get_all("Work Order", filters={"sales_order": sales_order, "docstatus": 1})
-		for d in existing_work_orders:
-			reserved_qty = get_reserved_qty_for_production(row.item_code, warehouse, work_order=d.name)
-			projected_qty += flt(reserved_qty)
+		if reserved_qty_for_production is not None:
+			for reserved_qty in reserved_qty_for_production.get((sales_order, row.item_code, warehouse), []) \
+					if warehouse else []:
+				projected_qty += flt(reserved_qty)
+		else:
+			existing_work_orders = frappe.get_all("Work Order", filters={"sales_order": sales_order, "docstatus": 1})
+			for d in existing_work_orders:
+				reserved_qty = get_reserved_qty_for_production(row.item_code, warehouse, work_order=d.name)
+				projected_qty += flt(reserved_qty)
 
 	if ignore_existing_ordered_qty or projected_qty < 0:
 		required_qty = total_qty
@@ -543,7 +520,9 @@ def get_material_request_items(row, sales_order,
 				.format(row['purchase_uom'], row['stock_uom'], row.item_code))
 		required_qty = required_qty / row['conversion_factor']
 
-	if frappe.db.get_value("UOM", row['purchase_uom'], "must_be_whole_number"):
+	if must_be_whole_number is None:
+		must_be_whole_number = frappe.db.get_value("UOM", row['purchase_uom'], "must_be_whole_number")
+	if must_be_whole_number:
 		required_qty = ceil(required_qty)
 
 	return {
@@ -706,16 +685,8 @@ def get_items_for_material_requests(doc, ignore_existing_ordered_qty=None):
 			else:
 				so_item_details[sales_order][item_code] = details
 
-	mr_items = []
-	for sales_order, item_code in iteritems(so_item_details):
-		item_dict = so_item_details[sales_order]
-		for details in item_dict.values():
-			bin_dict = get_bin_details(details, doc.company, warehouse)
-			bin_dict = bin_dict[0] if bin_dict else {}
-
-			items = get_material_request_items(details, sales_order, company, ignore_existing_ordered_qty, warehouse, bin_dict)
-			if items:
-				mr_items.append(items)
+	mr_items = get_material_request_items_for_demand(so_item_details, company,
+		ignore_existing_ordered_qty, warehouse)
 
 	if not mr_items:
 		frappe.msgprint(_("""As raw materials projected quantity is more than required quantity, there is no need to create material request.
@@ -723,6 +694,108 @@ def get_items_for_material_requests(doc, ignore_existing_ordered_qty=None):
 
 	return mr_items
 
+def get_material_request_items_for_demand(so_item_details, company,
+		ignore_existing_ordered_qty, warehouse):
+	"""
+		Returns material request items for the demand of each sales order and item
+		netted against Bins, reserved qty for production and UOMs fetched in bulk
+	"""
+	demand = [(sales_order, details) for sales_order, item_dict in iteritems(so_item_details)
+		for details in item_dict.values()]
+	if not demand:
+		return []
+
+	item_codes = list(set(details.item_code for sales_order, details in demand))
+	bins = get_bins_for_items(item_codes, company)
+
+	bin_warehouses = list(set(warehouse or details.get('source_warehouse') or details.get('default_warehouse')
+		for sales_order, details in demand) - {None, ''})
+	warehouse_bounds = {}
+	if bin_warehouses:
+		warehouse_bounds = {d.name: (d.lft, d.rgt) for d in frappe.db.sql("""
+			select name, lft, rgt from `tabWarehouse` where name in %s
+		""", [bin_warehouses], as_dict=1)}
+
+	reserved_qty_for_production = get_reserved_qty_for_production_by_sales_order(
+		list(set(sales_order for sales_order, details in demand if sales_order)), item_codes)
+
+	uoms = list(set(details.get('purchase_uom') or details.get('stock_uom') for sales_order, details in demand))
+	whole_number_uoms = set(frappe.db.sql_list("""
+		select name from `tabUOM` where must_be_whole_number = 1 and name in %s
+	""", [uoms])) if uoms else set()
+
+	mr_items = []
+	for sales_order, details in demand:
+		bin_warehouse = warehouse or details.get('source_warehouse') or details.get('default_warehouse')
+		if bin_warehouse:
+			lft, rgt = warehouse_bounds[bin_warehouse]
+			item_bins = [d for d in bins.get(details.item_code, []) if d.lft >= lft and d.rgt <= rgt]
+		else:
+			item_bins = bins.get(details.item_code, [])
+
+		bin_dict = item_bins[0] if item_bins else {}
+
+		uom = details.get('purchase_uom') or details.get('stock_uom')
+		items = get_material_request_items(details, sales_order, company, ignore_existing_ordered_qty, warehouse,
+			bin_dict, reserved_qty_for_production=reserved_qty_for_production,
+			must_be_whole_number=uom in whole_number_uoms)
+		if items:
+			mr_items.append(items)
+
+	return mr_items
+
+def get_bins_for_items(item_codes, company):
+	"""Returns {item_code: [Bins]} of the company's warehouses with their lft and rgt"""
+	bins = {}
+	for i in range(0, len(item_codes), 500):
+		for d in frappe.db.sql("""
+			select bin.item_code, bin.warehouse, ifnull(bin.projected_qty, 0) as projected_qty,
+				ifnull(bin.actual_qty, 0) as actual_qty, wh.lft, wh.rgt
+			from `tabBin` bin
+			inner join `tabWarehouse` wh on wh.name = bin.warehouse
+			where bin.item_code in %s and wh.company = %s
+			order by bin.item_code, bin.warehouse
+		""", [item_codes[i:i + 500], company], as_dict=1):
+			bins.setdefault(d.item_code, []).append(frappe._dict({
+				'projected_qty': d.projected_qty,
+				'actual_qty': d.actual_qty,
+				'warehouse': d.warehouse,
+				'lft': d.lft,
+				'rgt': d.rgt
+			}))
+
+	return bins
+
+def get_reserved_qty_for_production_by_sales_order(sales_orders, item_codes):
+	"""Returns {(sales_order, item_code, warehouse): [reserved qty of each Work Order]}"""
+	out = {}
+	if not sales_orders or not item_codes:
+		return out
+
+	for d in frappe.db.sql("""
+		SELECT
+			pro.sales_order, item.item_code, item.source_warehouse,
+			IF(pro.skip_transfer = 1 or item.skip_transfer_for_manufacture = 1,
+				SUM((item.required_qty - item.consumed_qty) * item.conversion_factor),
+				SUM((item.required_qty - item.transferred_qty) * item.conversion_factor)
+			) as reserved_qty
+		FROM `tabWork Order` pro, `tabWork Order Item` item
+		WHERE
+			item.parent = pro.name
+			and pro.sales_order in %(sales_orders)s
+			and item.item_code in %(item_codes)s
+			and pro.docstatus = 1
+			and pro.status not in ('Stopped', 'Completed')
+			and (
+				((pro.skip_transfer = 0 and item.skip_transfer_for_manufacture = 0) and item.required_qty > item.transferred_qty)
+				or ((pro.skip_transfer = 1 or item.skip_transfer_for_manufacture = 1) and item.required_qty > item.consumed_qty)
+			)
+		GROUP BY pro.name, item.item_code, item.source_warehouse
+	""", {"sales_orders": sales_orders, "item_codes": item_codes}, as_dict=1):
+		out.setdefault((d.sales_order, d.item_code, d.source_warehouse), []).append(d.reserved_qty)
+
+	return out
+
 @frappe.whitelist()
 def get_item_data(item_code):
 	item_details = get_item_details(item_code)
@@ -0,0 +1,28 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_field
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import rebuild_account_period_balances
+
+
+def execute():
+	frappe.reload_doc('accounts', 'doctype', 'account_period_balance')
+
+	accounting_dimensions = frappe.db.sql("""select fieldname, label, document_type
+		from `tabAccounting Dimension`""", as_dict=1)
+
+	for count, d in enumerate(accounting_dimensions):
+		if frappe.db.get_value("Custom Field", {"dt": "Account Period Balance", "fieldname": d.fieldname}):
+			continue
+
+		create_custom_field("Account Period Balance", {
+			"fieldname": d.fieldname,
+			"label": d.label,
+			"fieldtype": "Link",
+			"options": d.document_type,
+			"insert_after": 'dimension_col_break' if count % 2 else 'accounting_dimensions_section',
+			"ignore_user_permissions": 1,
+			"owner": "Administrator"
+		})
+
+	frappe.clear_cache(doctype="Account Period Balance")
+
+	rebuild_account_period_balances()
@@ -0,0 +1,7 @@
+import frappe
+from erpnext.stock.doctype.batch_balance.batch_balance import rebuild_batch_balances
+
+
+def execute():
+	frappe.reload_doc('stock', 'doctype', 'batch_balance')
+	rebuild_batch_balances()
@@ -0,0 +1,7 @@
+import frappe
+from erpnext.stock.doctype.item_search_token.item_search_token import rebuild_item_search_tokens
+
+
+def execute():
+	frappe.reload_doc('stock', 'doctype', 'item_search_token')
+	rebuild_item_search_tokens()
@@ -5,6 +5,8 @@ import frappe, json
 from frappe.utils.nestedset import get_root_of
 from frappe.utils import cint
 from erpnext.accounts.doctype.pos_profile.pos_profile import get_item_groups
+from erpnext.stock.doctype.item_search_token.item_search_token import get_item_search_query,\
+	is_item_search_token_index_current
 
 from six import string_types
 
@@ -155,8 +157,18 @@ def get_conditions(item_code, serial_no, batch_no, barcode):
 	if serial_no or batch_no or barcode:
 		return "name = {0}".format(frappe.db.escape(item_code))
 
-	return """(name like {item_code}
-		or item_name like {item_code})""".format(item_code = frappe.db.escape('%' + item_code + '%'))
+	if not is_item_search_token_index_current():
+		return """(name like {item_code}
+			or item_name like {item_code})""".format(item_code = frappe.db.escape('%' + item_code + '%'))
+
+	item_search = get_item_search_query(item_code)
+	if not item_search:
+		return "1=1"
+
+	query, values = item_search
+	query = query % {key: frappe.db.escape(value, percent=False) for key, value in values.items()}
+
+	return "name in (select item_code from ({0}) item_search)".format(query)
 
 def get_item_group_condition(pos_profile):
 	cond = "and 1=1"
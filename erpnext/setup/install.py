@@ -9,6 +9,7 @@ from frappe import _
 from frappe.desk.page.setup_wizard.setup_wizard import add_all_roles_to
 from frappe.custom.doctype.custom_field.custom_field import create_custom_field
 from erpnext.setup.default_energy_point_rules import get_default_energy_point_rules
+from erpnext.stock.doctype.item_search_token.item_search_token import rebuild_item_search_tokens
 
 
 def after_install():
@@ -21,6 +22,7 @@ def after_install():
 	create_default_success_action()
 	create_default_energy_point_rules()
 	add_company_to_session_defaults()
+	rebuild_item_search_tokens()
 	frappe.db.commit()
 
 
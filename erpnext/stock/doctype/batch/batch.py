@@ -128,9 +128,10 @@ def get_batch_qty(batch_no=None, warehouse=None, item_code=None, posting_date=No
 
 	out = 0
 
-	date_cond = ""
-	if posting_date and posting_time:
-		date_cond = " and (posting_date, posting_time) <= ('{0}', '{1}')".format(posting_date, posting_time)
+	if not (posting_date and posting_time):
+		return get_batch_balance_qty(batch_no, warehouse, item_code)
+
+	date_cond = " and (posting_date, posting_time) <= ('{0}', '{1}')".format(posting_date, posting_time)
 
 	if batch_no and warehouse:
 		out = flt(frappe.db.sql("""
@@ -158,6 +159,36 @@ def get_batch_qty(batch_no=None, warehouse=None, item_code=None, posting_date=No
 	return out
 
 
+def get_batch_balance_qty(batch_no=None, warehouse=None, item_code=None):
+	"""Returns current batch qty in the same form as get_batch_qty from Batch Balance"""
+	out = 0
+
+	if batch_no and warehouse:
+		out = flt(frappe.db.sql("""
+			select sum(actual_qty)
+			from `tabBatch Balance`
+			where batch_no = %s and warehouse = %s
+		""", (batch_no, warehouse))[0][0] or 0)
+
+	if batch_no and not warehouse:
+		out = frappe.db.sql("""
+			select warehouse, actual_qty as qty
+			from `tabBatch Balance`
+			where batch_no = %s
+			order by warehouse
+		""", batch_no, as_dict=1)
+
+	if not batch_no and item_code and warehouse:
+		out = frappe.db.sql("""
+			select batch_no, actual_qty as qty
+			from `tabBatch Balance`
+			where item_code = %s and warehouse = %s
+			order by batch_no
+		""", (item_code, warehouse), as_dict=1)
+
+	return out
+
+
 def get_batch_qty_on(batch_no, warehouse, posting_date, posting_time):
 	res = frappe.db.sql("""
 		select sum(actual_qty)
@@ -409,19 +440,11 @@ def get_batch_received_date(batch_no, warehouse):
 
 def get_batches(item_code, warehouse, posting_date=None, posting_time=None, qty_condition="positive", sales_order_item=None):
 	if qty_condition == "both":
-		having = "having qty != 0"
+		qty_cond = "!= 0"
 	elif qty_condition == "negative":
-		having = "having qty < 0"
+		qty_cond = "< 0"
 	else:
-		having = "having qty > 0"
-
-	date_cond = ""
-	if posting_date:
-		date_cond = "and (b.expiry_date is null or b.expiry_date >= %(posting_date)s)"
-		if posting_time:
-			date_cond += " and (sle.posting_date, sle.posting_time) <= (%(posting_date)s, %(posting_time)s)"
-		else:
-			date_cond += " and sle.posting_date <= %(posting_date)s"
+		qty_cond = "> 0"
 
 	args = {
 		'item_code': item_code,
@@ -430,17 +453,33 @@ def get_batches(item_code, warehouse, posting_date=None, posting_time=None, qty_
 		'posting_time': posting_time
 	}
 
-	batches = frappe.db.sql("""
-		select b.name, sum(sle.actual_qty) as qty, b.expiry_date,
-			min(timestamp(sle.posting_date, sle.posting_time)) received_date
-		from `tabStock Ledger Entry` sle
-		join `tabBatch` b on b.name = sle.batch_no
-		where sle.item_code = %(item_code)s and sle.warehouse = %(warehouse)s
-			and (sle.packing_slip = '' or sle.packing_slip is null)
-			{0}
-		group by b.name
-		{1}
-	""".format(date_cond, having), args, as_dict=True)
+	if posting_date:
+		date_cond = "and (b.expiry_date is null or b.expiry_date >= %(posting_date)s)"
+		if posting_time:
+			date_cond += " and (sle.posting_date, sle.posting_time) <= (%(posting_date)s, %(posting_time)s)"
+		else:
+			date_cond += " and sle.posting_date <= %(posting_date)s"
+
+		batches = frappe.db.sql("""
+			select b.name, sum(sle.actual_qty) as qty, b.expiry_date,
+				min(timestamp(sle.posting_date, sle.posting_time)) received_date
+			from `tabStock Ledger Entry` sle
+			join `tabBatch` b on b.name = sle.batch_no
+			where sle.item_code = %(item_code)s and sle.warehouse = %(warehouse)s
+				and (sle.packing_slip = '' or sle.packing_slip is null)
+				{0}
+			group by b.name
+			having qty {1}
+		""".format(date_cond, qty_cond), args, as_dict=True)
+	else:
+		# qty in packing slips is not available for selection
+		batches = frappe.db.sql("""
+			select b.name, round(bb.actual_qty - bb.packed_qty, 9) as qty, b.expiry_date, bb.received_date
+			from `tabBatch Balance` bb
+			join `tabBatch` b on b.name = bb.batch_no
+			where bb.item_code = %(item_code)s and bb.warehouse = %(warehouse)s
+				and round(bb.actual_qty - bb.packed_qty, 9) {0}
+		""".format(qty_cond), args, as_dict=True)
 
 	batches = sorted(batches, key=lambda d: (d.expiry_date, d.received_date))
 
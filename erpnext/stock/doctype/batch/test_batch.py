@@ -5,7 +5,7 @@ import frappe
 from frappe.exceptions import ValidationError
 import unittest
 
-from erpnext.stock.doctype.batch.batch import get_batch_qty, UnableToSelectBatchError, get_batch_no
+from erpnext.stock.doctype.batch.batch import get_batch_qty, UnableToSelectBatchError, get_batch_no, get_batches
 from frappe.utils import cint
 from erpnext.stock.doctype.purchase_receipt.test_purchase_receipt import set_perpetual_inventory
 
@@ -174,6 +174,22 @@ class TestBatch(unittest.TestCase):
 
 		self.assertEqual(get_batch_qty('batch a', '_Test Warehouse - _TC'), 90)
 
+	def test_batch_balance(self):
+		'''Test batch balance is updated on submission and cancellation'''
+		self.make_batch_item('ITEM-BATCH-3')
+		stock_entry = self.make_new_batch_and_entry('ITEM-BATCH-3', 'batch c', '_Test Warehouse - _TC')
+
+		self.assertEqual(get_batch_qty('batch c', '_Test Warehouse - _TC'), 90)
+		self.assertEqual(get_batch_qty('batch c', '_Test Warehouse - _TC', posting_date=stock_entry.posting_date,
+			posting_time=stock_entry.posting_time), 90)
+		self.assertEqual([d.name for d in get_batches('ITEM-BATCH-3', '_Test Warehouse - _TC')], ['batch c'])
+
+		stock_entry.cancel()
+
+		self.assertEqual(get_batch_qty('batch c', '_Test Warehouse - _TC'), 0)
+		self.assertEqual(get_batch_qty(item_code='ITEM-BATCH-3', warehouse='_Test Warehouse - _TC'), [])
+		self.assertEqual(get_batches('ITEM-BATCH-3', '_Test Warehouse - _TC'), [])
+
 	@classmethod
 	def make_new_batch_and_entry(cls, item_name, batch_name, warehouse):
 		'''Make a new stock entry for given target warehouse and batch name of item'''
@@ -207,6 +223,8 @@ class TestBatch(unittest.TestCase):
 		stock_entry.insert()
 		stock_entry.submit()
 
+		return stock_entry
+
 	def test_batch_name_with_naming_series(self):
 		stock_settings = frappe.get_single('Stock Settings')
 		use_naming_series = cint(stock_settings.use_naming_series)
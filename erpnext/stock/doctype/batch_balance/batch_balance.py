@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+import hashlib
+from frappe.model.document import Document
+from frappe.utils import flt, cstr, get_datetime, now
+
+
+class BatchBalance(Document):
+	pass
+
+
+def get_batch_balance_name(item_code, warehouse, batch_no):
+	key = "\n".join([cstr(item_code), cstr(warehouse), cstr(batch_no)])
+	return hashlib.sha1(key.encode()).hexdigest()
+
+
+def update_batch_balances(sl_entries, sign=1):
+	"""Adds actual qty of Stock Ledger Entries to batch balances, or subtracts it if sign is -1"""
+	balances = {}
+	for sle in sl_entries:
+		if not sle.get("batch_no") or not sle.get("item_code") or not sle.get("warehouse"):
+			continue
+
+		key = (sle.get("item_code"), sle.get("warehouse"), sle.get("batch_no"))
+
+		balance = balances.get(key)
+		if not balance:
+			balance = balances[key] = frappe._dict({
+				"name": get_batch_balance_name(*key),
+				"item_code": key[0],
+				"warehouse": key[1],
+				"batch_no": key[2],
+				"actual_qty": 0.0,
+				"packed_qty": 0.0,
+				"received_date": None
+			})
+
+		balance.actual_qty += flt(sle.get("actual_qty")) * sign
+		if sle.get("packing_slip"):
+			balance.packed_qty += flt(sle.get("actual_qty")) * sign
+
+		if sign > 0 and (sle.get("received_date") or sle.get("posting_date")):
+			received_date = get_datetime(sle.get("received_date")
+				or "{0} {1}".format(sle.get("posting_date"), sle.get("posting_time") or "00:00:00"))
+			if not balance.received_date or received_date < balance.received_date:
+				balance.received_date = received_date
+
+	if balances:
+		insert_batch_balances(list(balances.values()))
+
+
+def insert_batch_balances(balances, chunk_size=500):
+	fields = ["item_code", "warehouse", "batch_no", "actual_qty", "packed_qty", "received_date"]
+	timestamp = now()
+	user = frappe.session.user
+
+	row_placeholder = "({0})".format(", ".join(["%s"] * (len(fields) + 5)))
+
+	for i in range(0, len(balances), chunk_size):
+		chunk = balances[i:i + chunk_size]
+
+		values = []
+		for d in chunk:
+			values += [d.name, timestamp, timestamp, user, user]
+			values += [d.get(f) for f in fields]
+
+		frappe.db.sql("""
+			insert into `tabBatch Balance`
+				(name, creation, modified, modified_by, owner, {fields})
+			values {rows}
+			on duplicate key update
+				actual_qty = actual_qty + values(actual_qty),
+				packed_qty = packed_qty + values(packed_qty),
+				received_date = least(ifnull(received_date, values(received_date)),
+					ifnull(values(received_date), received_date)),
+				modified = values(modified)
+		""".format(
+			fields=", ".join(["`{0}`".format(f) for f in fields]),
+			rows=", ".join([row_placeholder] * len(chunk))
+		), values)
+
+
+def remove_voucher_from_batch_balances(voucher_type, voucher_no):
+	"""Subtracts the Stock Ledger Entries of a voucher that are about to be deleted"""
+	sl_entries = frappe.db.sql("""
+		select item_code, warehouse, batch_no, packing_slip, sum(actual_qty) as actual_qty
+		from `tabStock Ledger Entry`
+		where voucher_type = %s and voucher_no = %s and ifnull(batch_no, '') != ''
+		group by item_code, warehouse, batch_no, packing_slip
+	""", (voucher_type, voucher_no), as_dict=1)
+
+	update_batch_balances(sl_entries, sign=-1)
+
+	return sl_entries
+
+
+def update_batch_received_dates(sl_entries):
+	"""
+		Resets received date of batches from their remaining Stock Ledger Entries
+		and removes batch balances that do not have any Stock Ledger Entries left
+	"""
+	for key in set((d.item_code, d.warehouse, d.batch_no) for d in sl_entries):
+		received_date = frappe.db.sql("""
+			select min(timestamp(posting_date, posting_time))
+			from `tabStock Ledger Entry`
+			where item_code = %s and warehouse = %s and batch_no = %s
+		""", key)[0][0]
+
+		if received_date:
+			frappe.db.sql("""
+				update `tabBatch Balance`
+				set received_date = %s
+				where name = %s
+			""", (received_date, get_batch_balance_name(*key)))
+		else:
+			frappe.db.sql("delete from `tabBatch Balance` where name = %s", get_batch_balance_name(*key))
+
+
+def rebuild_batch_balances(item_code=None, warehouse=None):
+	"""Rebuilds batch balances from Stock Ledger Entries"""
+	conditions = []
+	if item_code:
+		conditions.append("item_code = %(item_code)s")
+	if warehouse:
+		conditions.append("warehouse = %(warehouse)s")
+
+	conditions = " and ".join(conditions) or "1 = 1"
+	args = {"item_code": item_code, "warehouse": warehouse}
+
+	frappe.db.sql("delete from `tabBatch Balance` where {0}".format(conditions), args)
+
+	sl_entries = frappe.db.sql("""
+		select item_code, warehouse, batch_no, packing_slip,
+			sum(actual_qty) as actual_qty,
+			min(timestamp(posting_date, posting_time)) as received_date
+		from `tabStock Ledger Entry`
+		where {0} and ifnull(batch_no, '') != ''
+		group by item_code, warehouse, batch_no, packing_slip
+	""".format(conditions), args, as_dict=1)
+
+	update_batch_balances(sl_entries)
+
+
+def on_doctype_update():
+	frappe.db.add_index("Batch Balance", ["item_code", "warehouse"])
+	frappe.db.add_index("Batch Balance", ["batch_no", "warehouse"])
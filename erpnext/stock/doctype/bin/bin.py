@@ -2,7 +2,7 @@
 # License: GNU General Public License v3. See license.txt
 
 import frappe
-from frappe.utils import flt, nowdate
+from frappe.utils import flt, cint, nowdate
 import frappe.defaults
 from frappe.model.document import Document
 
@@ -18,26 +18,40 @@ class Bin(Document):
 		self.update_qty(args)
 
 		if args.get("actual_qty") or args.get("voucher_type") == "Stock Reconciliation":
-			from erpnext.stock.stock_ledger import update_entries_after
-
-			if not args.get("posting_date"):
-				args["posting_date"] = nowdate()
-
-			# update valuation and qty after transaction for post dated entry
-			if args.get("is_cancelled") == "Yes" and via_landed_cost_voucher:
-				return
-			update_entries_after({
-				"item_code": self.item_code,
-				"warehouse": self.warehouse,
-				"batch_no": args.get("batch_no"),
-				"posting_date": args.get("posting_date"),
-				"posting_time": args.get("posting_time"),
-				"creation": args.get("creation"),
-				"sle_id": args.get("sle_id"),
-				"voucher_no": args.get("voucher_no")
-			}, allow_negative_stock=allow_negative_stock, via_landed_cost_voucher=via_landed_cost_voucher)
+			self.repost_stock_ledger_entries(args, allow_negative_stock, via_landed_cost_voucher)
+
+	def repost_stock_ledger_entries(self, args, allow_negative_stock=False, via_landed_cost_voucher=False):
+		from erpnext.stock.stock_ledger import update_entries_after
+
+		if not args.get("posting_date"):
+			args["posting_date"] = nowdate()
+
+		# update valuation and qty after transaction for post dated entry
+		if args.get("is_cancelled") == "Yes" and via_landed_cost_voucher:
+			return
+
+		# future entries of back-dated transactions can be reposted in the background
+		defer_future_entries = cint(frappe.db.get_single_value("Stock Settings", "repost_future_entries_in_background"))
+
+		update_entries_after({
+			"item_code": self.item_code,
+			"warehouse": self.warehouse,
+			"batch_no": args.get("batch_no"),
+			"posting_date": args.get("posting_date"),
+			"posting_time": args.get("posting_time"),
+			"creation": args.get("creation"),
+			"sle_id": args.get("sle_id"),
+			"voucher_type": args.get("voucher_type"),
+			"voucher_no": args.get("voucher_no")
+		}, allow_negative_stock=allow_negative_stock, via_landed_cost_voucher=via_landed_cost_voucher,
+			defer_future_entries=defer_future_entries)
 
 	def update_qty(self, args):
+		self.add_qty(args)
+		self.set_projected_qty()
+		self.db_update()
+
+	def add_qty(self, args):
 		# update the stock values (for current quantities)
 		if args.get("voucher_type")=="Stock Reconciliation":
 			if args.get('is_cancelled') == 'No':
@@ -50,9 +64,6 @@ class Bin(Document):
 		self.indented_qty = flt(self.indented_qty) + flt(args.get("indented_qty"))
 		self.planned_qty = flt(self.planned_qty) + flt(args.get("planned_qty"))
 
-		self.set_projected_qty()
-		self.db_update()
-
 	def set_projected_qty(self):
 		self.projected_qty = (flt(self.actual_qty) + flt(self.ordered_qty)
 			+ flt(self.indented_qty) + flt(self.planned_qty) - flt(self.reserved_qty)
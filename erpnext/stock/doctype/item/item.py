@@ -24,6 +24,8 @@ from erpnext.controllers.item_variant import (
 	validate_item_variant_attributes
 )
 from erpnext.setup.doctype.uom_conversion_factor.uom_conversion_factor import UOMConversionGraph
+from erpnext.stock.doctype.item_search_token.item_search_token import update_item_search_tokens, \
+	delete_item_search_tokens
 from frappe.utils.html_utils import clean_html
 from frappe.model.document import Document
 import json
@@ -131,6 +133,7 @@ class Item(Document):
 		self.update_item_price()
 		self.update_serial_no()
 		self.update_vehicle()
+		update_item_search_tokens(self)
 
 	def validate_description(self):
 		'''Clean HTML description if set'''
@@ -410,6 +413,7 @@ class Item(Document):
 	def on_trash(self):
 		frappe.db.sql("""delete from tabBin where item_code=%s""", self.name)
 		frappe.db.sql("delete from `tabItem Price` where item_code=%s", self.name)
+		delete_item_search_tokens(self.name)
 		for variant_of in frappe.get_all("Item", filters={"variant_of": self.name}):
 			frappe.delete_doc("Item", variant_of.name)
 
@@ -433,6 +437,9 @@ class Item(Document):
 
 		frappe.db.set_value("Item", new_name, "item_code", new_name)
 
+		delete_item_search_tokens(old_name)
+		update_item_search_tokens(frappe.get_doc("Item", new_name))
+
 		if merge:
 			self.set_last_purchase_rate(new_name)
 			self.recalculate_bin_qty(new_name)
@@ -655,6 +655,44 @@ class TestItem(unittest.TestCase):
 		new_barcode.barcode_type = 'EAN'
 		self.assertRaises(InvalidBarcode, item_doc.save)
 
+	def test_item_search(self):
+		from erpnext.controllers.queries import item_query
+
+		make_item("_Test Search XB-1001", {"item_name": "Green Tea Leaves"})
+		make_item("_Test Search XB-1001-P", {"item_name": "Green Tea Pack"})
+
+		def search(txt):
+			return [d[0] for d in item_query("Item", txt, "name", 0, 20, {}) if d[0].startswith("_Test Search")]
+
+		# exact item code is ranked first
+		self.assertEqual(search("_test search xb-1001"), ["_Test Search XB-1001", "_Test Search XB-1001-P"])
+		self.assertEqual(search("tea pack"), ["_Test Search XB-1001-P"])
+		self.assertEqual(search("1001p"), ["_Test Search XB-1001-P"])
+		self.assertEqual(search("gre lea"), ["_Test Search XB-1001"])
+
+		# tokens built with other search fields are not searched
+		from erpnext.stock.doctype.item_search_token.item_search_token import item_search_fields_key
+		indexed_fields = frappe.db.get_global(item_search_fields_key)
+		frappe.db.set_global(item_search_fields_key, "item_group,brand,customer_code")
+		try:
+			self.assertEqual(search("tea pack"), ["_Test Search XB-1001-P"])
+			self.assertEqual(search("1001p"), [])
+		finally:
+			frappe.db.set_global(item_search_fields_key, indexed_fields)
+
+	def test_item_search_tokens_on_item_group_rename(self):
+		if not frappe.db.exists("Item Group", "_Test Search Group"):
+			frappe.get_doc({"doctype": "Item Group", "item_group_name": "_Test Search Group",
+				"parent_item_group": "All Item Groups"}).insert()
+
+		make_item("_Test Search XB-2001", {"item_group": "_Test Search Group"})
+		frappe.rename_doc("Item Group", "_Test Search Group", "_Test Search Renamed Group")
+		try:
+			self.assertTrue(frappe.db.exists("Item Search Token",
+				{"item_code": "_Test Search XB-2001", "token": "renamed"}))
+		finally:
+			frappe.rename_doc("Item Group", "_Test Search Renamed Group", "_Test Search Group")
+
 def set_item_variant_settings(fields):
 	doc = frappe.get_doc('Item Variant Settings')
 	doc.set('fields', fields)
@@ -123,6 +123,28 @@ class TestItemPrice(unittest.TestCase):
 		self.assertEqual(price, 10)
 
 
+	def test_prefetched_prices(self):
+		# prices prefetched for multiple rows should be the same as queried for each row
+		from erpnext.stock.get_item_details import get_item_prices_for
+
+		for doc, args in [
+			(test_records[2], {"customer": "_Test Customer", "uom": "_Test UOM", "transaction_date": "2017-04-18", "qty": 7}),
+			(test_records[2], {"uom": "_Test UOM", "transaction_date": "2017-04-18", "qty": 7}),
+			(test_records[4], {"customer": "_Test Customer", "uom": "_Test UOM", "transaction_date": "2017-04-25", "qty": 7}),
+			(test_records[1], {"uom": "_Test UOM", "qty": 7}),
+			(test_records[0], {"uom": "_Test UOM", "transaction_date": "2017-04-20", "qty": 1}),
+		]:
+			args["price_list"] = doc.get("price_list")
+			expected_price = get_price_list_rate(doc.get("item_code"), args["price_list"], frappe._dict(args))
+
+			frappe.flags.item_price_prefetch = get_item_prices_for([doc.get("item_code")], [args["price_list"]])
+			try:
+				price = get_price_list_rate(doc.get("item_code"), args["price_list"], frappe._dict(args))
+			finally:
+				frappe.flags.item_price_prefetch = None
+
+			self.assertEqual(price, expected_price)
+
 	def test_invalid_item(self):
 		doc = frappe.copy_doc(test_records[1])
 		# Enter invalid item code
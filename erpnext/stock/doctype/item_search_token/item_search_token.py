@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+import hashlib
+import re
+from frappe.model.document import Document
+from frappe.utils import cstr, strip_html, now
+
+
+class ItemSearchToken(Document):
+	pass
+
+
+# lower weight is ranked higher, an exact match of a token is ranked above a prefix match of the same weight
+item_code_weight = 0
+item_code_part_weight = 1
+barcode_weight = 2
+item_name_weight = 3
+search_field_weight = 4
+description_weight = 5
+
+max_token_length = 140
+min_suffix_length = 3
+max_description_tokens = 50
+
+item_search_fields_key = "item_search_token_fields"
+
+
+def get_text_tokens(value):
+	"""Returns lower case words of value along with their alphanumeric parts"""
+	tokens = []
+	for word in cstr(value).lower().split():
+		tokens.append(word)
+		tokens += [part for part in re.split(r"[^\w]+", word) if part and part != word]
+
+	return tokens
+
+
+def get_item_code_tokens(item_code):
+	"""Returns the full item code, its words and suffixes so that item codes can be searched by any part"""
+	item_code = cstr(item_code).lower().strip()
+	tokens = {item_code: item_code_weight}
+
+	parts = get_text_tokens(item_code)
+	compact_code = re.sub(r"[^\w]+", "", item_code)
+	if compact_code and len(compact_code) <= max_token_length:
+		parts += [compact_code[i:] for i in range(len(compact_code) - min_suffix_length + 1)]
+
+	for token in parts:
+		tokens.setdefault(token, item_code_part_weight)
+
+	return tokens
+
+
+def get_item_search_tokens(item):
+	"""Returns {token: weight} of an Item document"""
+	tokens = get_item_code_tokens(item.name)
+
+	def add_tokens(values, weight):
+		for token in values:
+			if token and (token not in tokens or weight < tokens[token]):
+				tokens[token] = weight
+
+	add_tokens([cstr(d.barcode).lower().strip() for d in item.get("barcodes") or []], barcode_weight)
+	add_tokens(get_text_tokens(item.item_name), item_name_weight)
+
+	for fieldname in get_item_search_fields():
+		add_tokens(get_text_tokens(item.get(fieldname)), search_field_weight)
+
+	description_tokens = []
+	for token in get_text_tokens(strip_html(cstr(item.description))):
+		if token not in description_tokens:
+			description_tokens.append(token)
+	add_tokens(description_tokens[:max_description_tokens], description_weight)
+
+	out = {}
+	for token, weight in tokens.items():
+		token = token[:max_token_length]
+		if token not in out or weight < out[token]:
+			out[token] = weight
+
+	return out
+
+
+def get_item_search_fields():
+	meta = frappe.get_meta("Item", cached=True)
+	return [f for f in meta.get_search_fields() + ["item_group"]
+		if f not in ("name", "item_code", "item_name", "description") and meta.has_field(f)]
+
+
+def get_indexed_item_search_fields():
+	"""Returns the search fields the tokens were last rebuilt with, or None if they were never rebuilt"""
+	indexed_fields = frappe.db.get_global(item_search_fields_key)
+	return indexed_fields.split(",") if indexed_fields is not None else None
+
+
+def is_item_search_token_index_current():
+	"""Tokens can only be searched if they were built with the current search fields of Item"""
+	indexed_fields = get_indexed_item_search_fields()
+	return indexed_fields is not None and set(filter(None, indexed_fields)) == set(get_item_search_fields())
+
+
+def get_item_search_token_name(item_code, token):
+	return hashlib.sha1("\n".join([cstr(item_code), token]).encode()).hexdigest()
+
+
+def update_item_search_tokens(item):
+	"""Replaces search tokens of an Item"""
+	delete_item_search_tokens(item.name)
+	insert_item_search_tokens(item.name, get_item_search_tokens(item))
+
+
+def delete_item_search_tokens(item_code):
+	frappe.db.sql("delete from `tabItem Search Token` where item_code = %s", item_code)
+
+
+def insert_item_search_tokens(item_code, tokens, chunk_size=500):
+	timestamp = now()
+	user = frappe.session.user
+
+	rows = [(get_item_search_token_name(item_code, token), (item_code, token, weight))
+		for token, weight in tokens.items()]
+
+	for i in range(0, len(rows), chunk_size):
+		chunk = rows[i:i + chunk_size]
+
+		values = []
+		for name, row in chunk:
+			values += [name, timestamp, timestamp, user, user] + list(row)
+
+		frappe.db.sql("""
+			insert into `tabItem Search Token`
+				(name, creation, modified, modified_by, owner, item_code, token, weight)
+			values {0}
+			on duplicate key update weight = least(weight, values(weight))
+		""".format(", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))), values)
+
+
+def get_search_words(txt):
+	words = []
+	for word in cstr(txt).lower().split():
+		word = word[:max_token_length]
+		if word not in words:
+			words.append(word)
+
+	return words
+
+
+def get_item_search_query(txt):
+	"""
+		Returns (query, values) of a query selecting item_code and search_rank of Items
+		that have a token starting with each word of txt, or None if txt does not have any words
+	"""
+	words = get_search_words(txt)
+	if not words:
+		return None
+
+	values = {"search_txt": " ".join(words)}
+	for i, word in enumerate(words):
+		values["search_word_{0}".format(i)] = word
+		values["search_prefix_{0}".format(i)] = escape_like(word) + "%"
+
+	other_word_conditions = "".join(["""
+		and tok.item_code in (select item_code from `tabItem Search Token`
+			where token like %(search_prefix_{0})s)""".format(i) for i in range(1, len(words))])
+
+	query = """
+		select tok.item_code, min(case
+			when tok.token = %(search_txt)s then 3 * tok.weight
+			when tok.token = %(search_word_0)s then 3 * tok.weight + 1
+			else 3 * tok.weight + 2 end) as search_rank
+		from `tabItem Search Token` tok
+		where tok.token like %(search_prefix_0)s {0}
+		group by tok.item_code
+	""".format(other_word_conditions)
+
+	return query, values
+
+
+def escape_like(txt):
+	return txt.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def rebuild_item_search_tokens():
+	"""Rebuilds search tokens of all Items and stores the search fields they are built with"""
+	frappe.db.sql("delete from `tabItem Search Token`")
+
+	for item_code in frappe.get_all("Item", pluck="name"):
+		item = frappe.get_doc("Item", item_code)
+		insert_item_search_tokens(item.name, get_item_search_tokens(item))
+
+	frappe.db.set_global(item_search_fields_key, ",".join(get_item_search_fields()))
+
+
+def queue_rebuild_item_search_tokens(doc, method=None):
+	"""Rebuilds search tokens in the background when search fields of Item are customized"""
+	if doc.doc_type != "Item" or doc.property != "search_fields":
+		return
+
+	frappe.enqueue("erpnext.stock.doctype.item_search_token.item_search_token.rebuild_item_search_tokens",
+		queue="long", timeout=3000, enqueue_after_commit=True,
+		job_name="erpnext.stock.doctype.item_search_token.item_search_token.rebuild_item_search_tokens")
+
+
+def update_item_search_tokens_of_item_group(doc, method=None, old_name=None, new_name=None, merge=False):
+	"""Updates search tokens of Items of a renamed Item Group, since item_group is a search field"""
+	if "item_group" not in (get_indexed_item_search_fields() or []):
+		return
+
+	for item_code in frappe.get_all("Item", filters={"item_group": new_name or doc.name}, pluck="name"):
+		update_item_search_tokens(frappe.get_doc("Item", item_code))
+
+
+def on_doctype_update():
+	frappe.db.add_index("Item Search Token", ["token", "item_code"])
+	frappe.db.add_index("Item Search Token", ["item_code"])
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, add_to_date, now_datetime
+from erpnext.stock.stock_ledger import get_sle_sort_key
+
+
+# entries left in progress for longer than this by a crashed or timed out job are queued again
+# unless the entry is still locked by the job reposting it
+stale_repost_minutes = 180
+
+
+class RepostItemValuation(Document):
+	def get_repost_args(self):
+		return frappe._dict({
+			"item_code": self.item_code,
+			"warehouse": self.warehouse,
+			"posting_date": self.posting_date,
+			"posting_time": self.posting_time,
+			"creation": self.sle_creation,
+			"sle_id": self.stock_ledger_entry,
+		})
+
+	def repost(self):
+		from erpnext.stock.stock_ledger import update_entries_after
+		from erpnext.controllers.stock_controller import update_gl_entries_for_reposted_stock_vouchers
+
+		if not self.claim():
+			return
+
+		try:
+			# the entry stays locked until the repost is committed, so that it is not queued again while running
+			frappe.db.sql("select name from `tabRepost Item Valuation` where name = %s for update", self.name)
+
+			frappe.flags.stock_ledger_vouchers_reposted = None
+			update_entries_after(self.get_repost_args(), allow_negative_stock=cint(self.allow_negative_stock),
+				via_landed_cost_voucher=cint(self.via_landed_cost_voucher), verbose=0)
+			update_gl_entries_for_reposted_stock_vouchers()
+
+			self.db_set("status", "Completed")
+			frappe.db.commit()
+		except Exception:
+			frappe.db.rollback()
+			frappe.flags.stock_ledger_vouchers_reposted = None
+
+			self.db_set({
+				"status": "Failed",
+				"error_log": frappe.get_traceback()
+			})
+			frappe.db.commit()
+
+	def claim(self):
+		"""Sets the entry In Progress if it is still Queued, so that it is reposted by one job only"""
+		if not frappe.db.sql("""
+			select name
+			from `tabRepost Item Valuation`
+			where name = %s and status = 'Queued'
+			for update
+		""", self.name):
+			return False
+
+		self.db_set("status", "In Progress")
+		frappe.db.commit()
+		return True
+
+
+def queue_repost_item_valuation(args):
+	"""
+		Queue reposting of future Stock Ledger Entries of an (item_code, warehouse)
+
+		A queued entry that has not started processing yet is reused
+		and moved back to the earliest affected Stock Ledger Entry
+	"""
+	args = frappe._dict(args)
+
+	existing = frappe.db.sql("""
+		select name, posting_date, posting_time, sle_creation
+		from `tabRepost Item Valuation`
+		where item_code = %s and warehouse = %s and status = 'Queued'
+		order by posting_date, posting_time, sle_creation
+		limit 1
+		for update
+	""", (args.item_code, args.warehouse), as_dict=1)
+
+	if existing:
+		existing = existing[0]
+		existing_sort_key = get_sle_sort_key({
+			"posting_date": existing.posting_date, "posting_time": existing.posting_time, "creation": existing.sle_creation
+		})
+		if get_sle_sort_key(args) < existing_sort_key:
+			frappe.db.set_value("Repost Item Valuation", existing.name, {
+				"posting_date": args.posting_date,
+				"posting_time": args.posting_time,
+				"sle_creation": args.creation,
+				"stock_ledger_entry": args.sle_id,
+				"voucher_type": args.voucher_type,
+				"voucher_no": args.voucher_no,
+			})
+
+		if cint(args.allow_negative_stock):
+			frappe.db.set_value("Repost Item Valuation", existing.name, "allow_negative_stock", 1)
+
+		return existing.name
+
+	doc = frappe.get_doc({
+		"doctype": "Repost Item Valuation",
+		"item_code": args.item_code,
+		"warehouse": args.warehouse,
+		"company": args.company,
+		"posting_date": args.posting_date,
+		"posting_time": args.posting_time,
+		"sle_creation": args.creation,
+		"stock_ledger_entry": args.sle_id,
+		"voucher_type": args.voucher_type,
+		"voucher_no": args.voucher_no,
+		"allow_negative_stock": cint(args.allow_negative_stock),
+		"via_landed_cost_voucher": cint(args.via_landed_cost_voucher),
+		"status": "Queued",
+	})
+	doc.flags.ignore_permissions = True
+	doc.flags.ignore_links = True
+	doc.insert()
+
+	return doc.name
+
+
+def repost_entries():
+	"""Scheduled job to process queued Repost Item Valuation entries in posting order"""
+	requeue_stale_entries()
+
+	entries = frappe.db.sql_list("""
+		select name
+		from `tabRepost Item Valuation`
+		where status = 'Queued'
+		order by posting_date, posting_time, sle_creation, creation
+	""")
+
+	for name in entries:
+		frappe.get_doc("Repost Item Valuation", name).repost()
+
+
+def requeue_stale_entries():
+	# entries locked by a running repost are skipped
+	stale_entries = frappe.db.sql_list("""
+		select name
+		from `tabRepost Item Valuation`
+		where status = 'In Progress' and modified < %s
+		for update skip locked
+	""", add_to_date(now_datetime(), minutes=-stale_repost_minutes))
+
+	if stale_entries:
+		frappe.db.sql("""
+			update `tabRepost Item Valuation`
+			set status = 'Queued'
+			where name in %s
+		""", [stale_entries])
+
+	frappe.db.commit()
+
+
+def on_doctype_update():
+	frappe.db.add_index("Repost Item Valuation", ["item_code", "warehouse", "status"])
+	frappe.db.add_index("Repost Item Valuation", ["status", "posting_date", "posting_time"])
@@ -0,0 +1,11 @@
+frappe.listview_settings['Repost Item Valuation'] = {
+	get_indicator: function(doc) {
+		var colors = {
+			"Queued": "orange",
+			"In Progress": "blue",
+			"Completed": "green",
+			"Failed": "red",
+		};
+		return [__(doc.status), colors[doc.status], "status,=," + doc.status];
+	}
+};
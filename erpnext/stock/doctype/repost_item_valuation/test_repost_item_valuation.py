@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+import unittest
+from frappe.utils import add_days, add_to_date, nowdate, now_datetime
+from erpnext.stock.doctype.repost_item_valuation.repost_item_valuation import queue_repost_item_valuation,\
+	requeue_stale_entries
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+test_dependencies = ["Item", "Warehouse"]
+
+class TestRepostItemValuation(unittest.TestCase):
+	def setUp(self):
+		frappe.db.sql("delete from `tabRepost Item Valuation`")
+
+	def tearDown(self):
+		frappe.db.set_value("Stock Settings", None, "repost_future_entries_in_background", 0)
+		frappe.db.sql("delete from `tabRepost Item Valuation`")
+
+	def test_queue_dedup_by_earliest_date(self):
+		name = queue_repost_item_valuation(get_repost_args(add_days(nowdate(), -5)))
+
+		# an earlier entry moves the queued entry back
+		self.assertEqual(queue_repost_item_valuation(get_repost_args(add_days(nowdate(), -10))), name)
+		self.assertEqual(frappe.db.get_value("Repost Item Valuation", name, "posting_date"),
+			frappe.utils.getdate(add_days(nowdate(), -10)))
+
+		# a later entry is covered by the queued entry
+		self.assertEqual(queue_repost_item_valuation(get_repost_args(add_days(nowdate(), -2))), name)
+		self.assertEqual(frappe.db.get_value("Repost Item Valuation", name, "posting_date"),
+			frappe.utils.getdate(add_days(nowdate(), -10)))
+
+		# an entry already in progress is not reused
+		frappe.db.set_value("Repost Item Valuation", name, "status", "In Progress")
+		self.assertNotEqual(queue_repost_item_valuation(get_repost_args(add_days(nowdate(), -2))), name)
+
+	def test_status_transitions(self):
+		make_stock_entry(item_code="_Test Item", to_warehouse="_Test Warehouse - _TC", qty=10, rate=100,
+			posting_date=add_days(nowdate(), -3))
+
+		doc = frappe.get_doc("Repost Item Valuation", queue_repost_item_valuation(get_repost_args(add_days(nowdate(), -3))))
+		self.assertEqual(doc.status, "Queued")
+
+		doc.repost()
+		self.assertEqual(frappe.db.get_value("Repost Item Valuation", doc.name, "status"), "Completed")
+
+		# entries left in progress by a crashed job are queued again
+		frappe.db.sql("""update `tabRepost Item Valuation` set status = 'In Progress', modified = %s
+			where name = %s""", (add_to_date(now_datetime(), hours=-6), doc.name))
+		requeue_stale_entries()
+		self.assertEqual(frappe.db.get_value("Repost Item Valuation", doc.name, "status"), "Queued")
+
+		# a queued entry is claimed by one job only
+		self.assertTrue(frappe.get_doc("Repost Item Valuation", doc.name).claim())
+		self.assertFalse(frappe.get_doc("Repost Item Valuation", doc.name).claim())
+
+	def test_bin_qty_of_back_dated_entry_in_background(self):
+		frappe.db.set_value("Stock Settings", None, "repost_future_entries_in_background", 1)
+
+		item_code, warehouse = "_Test Item", "_Test Warehouse - _TC"
+		make_stock_entry(item_code=item_code, to_warehouse=warehouse, qty=10, rate=100)
+		actual_qty = frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse}, "actual_qty")
+
+		make_stock_entry(item_code=item_code, to_warehouse=warehouse, qty=5, rate=100,
+			posting_date=add_days(nowdate(), -5))
+
+		self.assertEqual(frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse}, "actual_qty"),
+			actual_qty + 5)
+		self.assertTrue(frappe.db.exists("Repost Item Valuation",
+			{"item_code": item_code, "warehouse": warehouse, "status": "Queued"}))
+
+
+def get_repost_args(posting_date):
+	return frappe._dict({
+		"item_code": "_Test Item",
+		"warehouse": "_Test Warehouse - _TC",
+		"company": "_Test Company",
+		"posting_date": posting_date,
+		"posting_time": "10:00:00",
+		"creation": now_datetime(),
+	})
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+import hashlib
+from frappe.model.document import Document
+from frappe.utils import cstr, flt, getdate, add_months, today, now
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import get_period_end_date
+
+
+class StockClosingBalance(Document):
+	pass
+
+
+closing_balance_key_fields = ("item_code", "warehouse", "company", "batch_no", "packing_slip")
+
+
+def create_stock_closing_balances():
+	"""Creates closing balances for months that have ended"""
+	for company in frappe.get_all("Company", pluck="name"):
+		build_stock_closing_balances(company)
+
+
+def build_stock_closing_balances(company):
+	"""
+		Builds closing balances of every month end after the latest closing balance of the company
+		from the previous closing balance and Stock Ledger Entries of the month.
+
+		Months on or after a pending Repost Item Valuation are not built
+		since valuation of their Stock Ledger Entries is not final yet.
+
+		Each month is built in its own transaction under the lock taken by invalidation of back dated postings,
+		so that balances are not built from entries of a posting that deletes them before it is committed.
+	"""
+	last_period_end_date = get_period_end_date(add_months(today(), -1))
+
+	balances = None
+	built_period_end_date = None
+
+	# the lock is taken before any read in the transaction so that reads see postings committed before it
+	frappe.db.commit()
+
+	while True:
+		lock_stock_closing_balances(company)
+
+		previous_period_end_date = get_latest_stock_closing_balance_date(company)
+		if previous_period_end_date:
+			period_end_date = get_period_end_date(add_months(previous_period_end_date, 1))
+		else:
+			first_posting_date = frappe.db.sql("""
+				select min(posting_date)
+				from `tabStock Ledger Entry`
+				where company = %s and docstatus < 2
+			""", company)[0][0]
+			if not first_posting_date:
+				break
+
+			period_end_date = get_period_end_date(first_posting_date)
+
+		if period_end_date > last_period_end_date:
+			break
+
+		pending_repost_date = frappe.db.sql("""
+			select min(posting_date)
+			from `tabRepost Item Valuation`
+			where company = %s and status in ('Queued', 'In Progress', 'Failed')
+		""", company)[0][0]
+		if pending_repost_date and getdate(pending_repost_date) <= period_end_date:
+			break
+
+		# balances built in the previous month are reused unless they have been invalidated since
+		if balances is None or built_period_end_date != previous_period_end_date:
+			balances = get_stock_closing_balances(company, previous_period_end_date) if previous_period_end_date else {}
+
+		for d in get_stock_ledger_balance_changes(company, previous_period_end_date, period_end_date):
+			key = tuple(d.get(f) or None for f in closing_balance_key_fields)
+			balance = balances.setdefault(key, [0.0, 0.0])
+			balance[0] += flt(d.qty)
+			balance[1] += flt(d.stock_value)
+
+		insert_stock_closing_balances(company, period_end_date, balances)
+		frappe.db.commit()
+
+		built_period_end_date = period_end_date
+
+	frappe.db.commit()
+
+
+def lock_stock_closing_balances(company, shared=False):
+	"""
+		Locks closing balances of a company until the transaction ends, on a Default Value row of the company
+		instead of the Company so that saving the Company is not blocked.
+		Invalidation takes a shared lock so that postings do not wait for each other, only for a build.
+	"""
+	lock_name = "stock_closing_balance_lock:{0}".format(hashlib.sha1(cstr(company).encode("utf-8")).hexdigest())
+	lock_query = "select name from `tabDefaultValue` where name = %s {0}".format(
+		"lock in share mode" if shared else "for update")
+
+	if not frappe.db.sql(lock_query, lock_name):
+		frappe.db.sql("""
+			insert ignore into `tabDefaultValue` (name, parent, parenttype, defkey, defvalue)
+			values (%s, '__stock_closing_balance_lock', 'Company', %s, '')
+		""", (lock_name, company))
+		frappe.db.sql(lock_query, lock_name)
+
+
+def get_stock_ledger_balance_changes(company, from_date, to_date):
+	date_condition = "and posting_date > %(from_date)s" if from_date else ""
+
+	return frappe.db.sql("""
+		select item_code, warehouse, company, batch_no, packing_slip,
+			sum(actual_qty) as qty, sum(stock_value_difference) as stock_value
+		from `tabStock Ledger Entry`
+		where company = %(company)s and posting_date <= %(to_date)s and docstatus < 2 {0}
+		group by item_code, warehouse, company, batch_no, packing_slip
+	""".format(date_condition), {"company": company, "from_date": from_date, "to_date": to_date}, as_dict=1)
+
+
+def get_latest_stock_closing_balance_date(company, before_date=None):
+	date_condition = "and period_end_date < %(before_date)s" if before_date else ""
+
+	return frappe.db.sql("""
+		select max(period_end_date)
+		from `tabStock Closing Balance`
+		where company = %(company)s {0}
+	""".format(date_condition), {"company": company, "before_date": before_date})[0][0]
+
+
+def get_stock_closing_balance_dates(before_date, company=None):
+	"""Returns {company: date} of the latest closing balance before date"""
+	company_condition = "and company = %(company)s" if company else ""
+
+	return dict(frappe.db.sql("""
+		select company, max(period_end_date)
+		from `tabStock Closing Balance`
+		where period_end_date < %(before_date)s {0}
+		group by company
+	""".format(company_condition), {"company": company, "before_date": before_date}))
+
+
+def get_stock_closing_balances(company, period_end_date):
+	balances = {}
+
+	for d in frappe.db.sql("""
+		select item_code, warehouse, company, batch_no, packing_slip, qty, stock_value
+		from `tabStock Closing Balance`
+		where company = %s and period_end_date = %s
+	""", (company, period_end_date), as_dict=1):
+		key = tuple(d.get(f) or None for f in closing_balance_key_fields)
+		balances[key] = [flt(d.qty), flt(d.stock_value)]
+
+	return balances
+
+
+def insert_stock_closing_balances(company, period_end_date, balances, chunk_size=500):
+	fields = list(closing_balance_key_fields) + ["period_end_date", "qty", "stock_value"]
+	timestamp = now()
+	user = frappe.session.user
+
+	# balances that have become zero are not stored
+	rows = [(key, qty, stock_value) for key, (qty, stock_value) in balances.items()
+		if flt(qty, 9) or flt(stock_value, 9)]
+
+	row_placeholder = "({0})".format(", ".join(["%s"] * (len(fields) + 5)))
+
+	for i in range(0, len(rows), chunk_size):
+		chunk = rows[i:i + chunk_size]
+
+		values = []
+		for key, qty, stock_value in chunk:
+			values += [frappe.generate_hash(length=10), timestamp, timestamp, user, user]
+			values += list(key) + [period_end_date, qty, stock_value]
+
+		frappe.db.sql("""
+			insert into `tabStock Closing Balance`
+				(name, creation, modified, modified_by, owner, {fields})
+			values {rows}
+		""".format(
+			fields=", ".join(["`{0}`".format(f) for f in fields]),
+			rows=", ".join([row_placeholder] * len(chunk))
+		), values)
+
+
+def invalidate_stock_closing_balances(company, posting_date):
+	"""Deletes closing balances of the company on or after a back dated posting"""
+	if not company or not posting_date:
+		return
+
+	posting_date = getdate(posting_date)
+
+	# balances are only built for months that have ended
+	if posting_date > get_period_end_date(add_months(today(), -1)):
+		return
+
+	# the lock is held until the posting is committed, so a concurrent build waits for it instead of
+	# inserting balances from entries before the posting. It is already held on later calls in the transaction.
+	lock_stock_closing_balances(company, shared=True)
+	frappe.db.sql("""
+		delete from `tabStock Closing Balance`
+		where company = %s and period_end_date >= %s
+	""", (company, posting_date))
+
+
+def on_doctype_update():
+	frappe.db.add_index("Stock Closing Balance", ["company", "period_end_date"])
+	frappe.db.add_index("Stock Closing Balance", ["item_code", "warehouse"])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+import unittest
+from frappe.utils import flt, add_days, add_months, today
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import get_period_end_date
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import build_stock_closing_balances
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+test_dependencies = ["Item", "Warehouse"]
+
+class TestStockClosingBalance(unittest.TestCase):
+	def setUp(self):
+		frappe.db.sql("delete from `tabStock Closing Balance` where company = '_Test Company'")
+		frappe.db.sql("delete from `tabRepost Item Valuation` where company = '_Test Company'")
+
+	def test_build_closing_balances(self):
+		period_end_date = get_period_end_date(add_months(today(), -2))
+		make_stock_entry(item_code="_Test Item", to_warehouse="_Test Warehouse - _TC", qty=10, rate=100,
+			posting_date=add_days(period_end_date, -3))
+
+		build_stock_closing_balances("_Test Company")
+
+		for date in (period_end_date, get_period_end_date(add_months(today(), -1))):
+			self.assertEqual(get_closing_qty("_Test Item", "_Test Warehouse - _TC", date),
+				get_stock_ledger_qty("_Test Item", "_Test Warehouse - _TC", date))
+
+		# months that have not ended are not built
+		self.assertFalse(frappe.db.exists("Stock Closing Balance",
+			{"company": "_Test Company", "period_end_date": get_period_end_date(today())}))
+
+	def test_invalidate_on_back_dated_posting(self):
+		period_end_date = get_period_end_date(add_months(today(), -2))
+		make_stock_entry(item_code="_Test Item", to_warehouse="_Test Warehouse - _TC", qty=10, rate=100,
+			posting_date=add_days(period_end_date, -3))
+		build_stock_closing_balances("_Test Company")
+
+		make_stock_entry(item_code="_Test Item", to_warehouse="_Test Warehouse - _TC", qty=5, rate=100,
+			posting_date=period_end_date)
+
+		self.assertFalse(frappe.db.exists("Stock Closing Balance",
+			{"company": "_Test Company", "period_end_date": (">=", period_end_date)}))
+
+		# rebuilt from the latest closing balance that was kept
+		build_stock_closing_balances("_Test Company")
+		self.assertEqual(get_closing_qty("_Test Item", "_Test Warehouse - _TC", period_end_date),
+			get_stock_ledger_qty("_Test Item", "_Test Warehouse - _TC", period_end_date))
+
+
+def get_closing_qty(item_code, warehouse, period_end_date):
+	return flt(frappe.db.sql("""
+		select sum(qty)
+		from `tabStock Closing Balance`
+		where item_code = %s and warehouse = %s and period_end_date = %s
+	""", (item_code, warehouse, period_end_date))[0][0])
+
+
+def get_stock_ledger_qty(item_code, warehouse, date):
+	return flt(frappe.db.sql("""
+		select sum(actual_qty)
+		from `tabStock Ledger Entry`
+		where item_code = %s and warehouse = %s and posting_date <= %s and docstatus < 2
+	""", (item_code, warehouse, date))[0][0])
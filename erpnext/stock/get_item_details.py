@@ -104,6 +104,99 @@ def get_item_details(args, doc=None, for_validate=False, overwrite_warehouse=Tru
 	return out
 
 
+@frappe.whitelist()
+def get_items_details(args, items, doc=None, for_validate=False, overwrite_warehouse=True):
+	"""
+		Returns get_item_details for each row in items
+
+		args are common for all rows and are updated with each row.
+		Item Prices and Bins of all items are fetched together before the rows are processed.
+	"""
+	if isinstance(args, str):
+		args = json.loads(args)
+	if isinstance(items, str):
+		items = json.loads(items)
+
+	rows = []
+	for item in items:
+		row_args = frappe._dict(args)
+		row_args.update(item)
+		rows.append(process_args(row_args))
+
+	prefetch_item_details(rows)
+	try:
+		return [get_item_details(row_args, doc=doc, for_validate=for_validate,
+			overwrite_warehouse=overwrite_warehouse) for row_args in rows]
+	finally:
+		frappe.flags.item_price_prefetch = None
+		frappe.flags.bin_details_prefetch = None
+
+
+def prefetch_item_details(rows):
+	item_codes = set()
+	price_lists = set()
+	for row_args in rows:
+		if not row_args.item_code:
+			continue
+
+		item = frappe.get_cached_doc("Item", row_args.item_code)
+		item_codes.add(item.name)
+		if item.variant_of:
+			item_codes.add(item.variant_of)
+
+		for price_list in (row_args.price_list, row_args.retail_price_list):
+			if price_list:
+				price_lists.add(price_list)
+
+	if not item_codes:
+		return
+
+	frappe.flags.item_price_prefetch = get_item_prices_for(item_codes, price_lists) if price_lists else {}
+	frappe.flags.bin_details_prefetch = get_bin_details_for(item_codes)
+
+
+def get_item_prices_for(item_codes, price_lists):
+	item_prices = {}
+	for item_code in item_codes:
+		for price_list in price_lists:
+			item_prices[(item_code, price_list)] = []
+
+	for d in frappe.db.sql("""
+		select name, item_code, price_list, customer, supplier,
+			price_list_rate,
+			uom,
+			ifnull(valid_from, '2000-01-01') as valid_from,
+			ifnull(valid_upto, '2500-12-31') as valid_upto,
+			valid_from as from_date,
+			valid_upto as upto_date,
+			packing_unit
+		from `tabItem Price`
+		where item_code in ({0}) and price_list in ({1})
+		order by ifnull(valid_from, '2000-01-01') desc, uom desc
+	""".format(", ".join(["%s"] * len(item_codes)), ", ".join(["%s"] * len(price_lists))),
+		list(item_codes) + list(price_lists), as_dict=1):
+		item_prices[(d.item_code, d.price_list)].append(d)
+
+	return item_prices
+
+
+def get_bin_details_for(item_codes):
+	bin_details = {}
+	for item_code in item_codes:
+		bin_details[item_code] = {}
+
+	for d in frappe.db.sql("""
+		select item_code, warehouse, projected_qty, actual_qty, reserved_qty
+		from `tabBin`
+		where item_code in ({0})
+	""".format(", ".join(["%s"] * len(item_codes))), list(item_codes), as_dict=1):
+		bin_details[d.item_code][d.warehouse] = frappe._dict({
+			"projected_qty": d.projected_qty, "actual_qty": d.actual_qty, "reserved_qty": d.reserved_qty
+		})
+
+	return bin_details
+
+
 def update_stock(args, out):
 	if (args.get("doctype") == "Delivery Note" or
 		(args.get("doctype") == "Sales Invoice" and args.get('update_stock'))) \
@@ -798,6 +891,9 @@ def insert_item_price(args):
 	if frappe.db.get_value("Price List", args.price_list, "currency", cache=True) == args.currency \
 		and cint(frappe.get_cached_value("Stock Settings", None, "auto_insert_price_list_rate_if_missing")):
 		if frappe.has_permission("Item Price", "write"):
+			if frappe.flags.item_price_prefetch:
+				frappe.flags.item_price_prefetch.pop((args.item_code, args.price_list), None)
+
 			price_list_rate = (args.rate / args.get('conversion_factor')
 				if args.get("conversion_factor") else args.rate)
 
@@ -926,17 +1022,21 @@ def get_item_price(args, item_code, ignore_party=False):
 				or (valid_from is null and valid_upto is null)
 			)"""
 
-	prices = frappe.db.sql("""
-		select name,
-			price_list_rate,
-			uom,
-			ifnull(valid_from, '2000-01-01') as valid_from,
-			ifnull(valid_upto, '2500-12-31') as valid_upto,
-			packing_unit
-		from `tabItem Price`
-		{conditions}
-		{order_by}
-	""".format(conditions=conditions, order_by=order_by), args, as_dict=1)
+	prefetched_prices = (frappe.flags.item_price_prefetch or {}).get((item_code, args.get("price_list")))
+	if prefetched_prices is not None and args.get('period') != 'future':
+		prices = filter_prefetched_item_prices(prefetched_prices, args, ignore_party)
+	else:
+		prices = frappe.db.sql("""
+			select name,
+				price_list_rate,
+				uom,
+				ifnull(valid_from, '2000-01-01') as valid_from,
+				ifnull(valid_upto, '2500-12-31') as valid_upto,
+				packing_unit
+			from `tabItem Price`
+			{conditions}
+			{order_by}
+		""".format(conditions=conditions, order_by=order_by), args, as_dict=1)
 
 	matches_uom = [d for d in prices if cstr(d.uom) == cstr(args.get('uom'))]
 	if matches_uom:
@@ -959,6 +1059,40 @@ def get_item_price(args, item_code, ignore_party=False):
 	return prices[0] if prices else None
 
 
+def filter_prefetched_item_prices(item_prices, args, ignore_party=False):
+	"""Applies the conditions of get_item_price on Item Prices fetched by get_items_details"""
+	transaction_date = getdate(args.get('transaction_date')) if args.get('transaction_date') else None
+
+	prices = []
+	for d in item_prices:
+		if not ignore_party:
+			if args.get("customer"):
+				if d.customer != args.get("customer"):
+					continue
+			elif args.get("supplier"):
+				if d.supplier != args.get("supplier"):
+					continue
+			elif d.customer or d.supplier:
+				continue
+
+		if transaction_date:
+			if d.from_date and getdate(d.from_date) > transaction_date:
+				continue
+			if d.upto_date and getdate(d.upto_date) < transaction_date:
+				continue
+
+		prices.append(frappe._dict({
+			"name": d.name,
+			"price_list_rate": d.price_list_rate,
+			"uom": d.uom,
+			"valid_from": d.valid_from,
+			"valid_upto": d.valid_upto,
+			"packing_unit": d.packing_unit
+		}))
+
+	return prices
+
+
 def check_packing_list(item_price, desired_qty, item_code):
 	"""
 		Check if the desired qty is within the increment of the packing list.
@@ -1192,6 +1326,10 @@ def get_projected_qty(item_code, warehouse):
 
 @frappe.whitelist()
 def get_bin_details(item_code, warehouse):
+	prefetched_bins = (frappe.flags.bin_details_prefetch or {}).get(item_code)
+	if prefetched_bins is not None:
+		return prefetched_bins.get(warehouse) or {"projected_qty": 0, "actual_qty": 0, "reserved_qty": 0}
+
 	def generator():
 		return frappe.db.get_value(
 			"Bin",
@@ -16,6 +16,13 @@ def reorder_item():
 	if cint(frappe.db.get_value('Stock Settings', None, 'auto_indent')):
 		return _reorder_item()
 
+reorderable_item_condition = """item.is_stock_item=1 and item.has_variants=0
+	and item.disabled=0
+	and (item.end_of_life is null or item.end_of_life='0000-00-00' or item.end_of_life > %(today)s)"""
+
+material_request_items_limit = 500
+
+
 def _reorder_item():
 	material_requests = {"Purchase": {}, "Transfer": {}, "Material Issue": {}, "Manufacture": {}}
 	warehouse_company = frappe._dict(frappe.db.sql("""select name, company from `tabWarehouse`
@@ -23,86 +30,101 @@ def _reorder_item():
 	default_company = (erpnext.get_default_company() or
 		frappe.db.sql("""select name from tabCompany limit 1""")[0][0])
 
-	items_to_consider = frappe.db.sql_list("""select name from `tabItem` item
-		where is_stock_item=1 and has_variants=0
-			and disabled=0
-			and (end_of_life is null or end_of_life='0000-00-00' or end_of_life > %(today)s)
-			and (exists (select name from `tabItem Reorder` ir where ir.parent=item.name)
-				or (variant_of is not null and variant_of != ''
-				and exists (select name from `tabItem Reorder` ir where ir.parent=item.variant_of))
-			)""",
-		{"today": nowdate()})
-
-	if not items_to_consider:
+	reorder_levels = get_item_reorder_levels()
+	if not reorder_levels:
 		return
 
-	item_warehouse_projected_qty = get_item_warehouse_projected_qty(items_to_consider)
+	warehouses = set([d.warehouse_group or d.warehouse for d in reorder_levels])
+	item_warehouse_projected_qty = get_item_warehouse_projected_qty(warehouses)
 
-	def add_to_material_request(item_code, warehouse, reorder_level, reorder_qty, material_request_type, warehouse_group=None):
-		if warehouse not in warehouse_company:
+	for d in reorder_levels:
+		if d.warehouse not in warehouse_company:
 			# a disabled warehouse
-			return
+			continue
 
-		reorder_level = flt(reorder_level)
-		reorder_qty = flt(reorder_qty)
+		reorder_level = flt(d.warehouse_reorder_level)
+		reorder_qty = flt(d.warehouse_reorder_qty)
 
 		# projected_qty will be 0 if Bin does not exist
-		if warehouse_group:
-			projected_qty = flt(item_warehouse_projected_qty.get(item_code, {}).get(warehouse_group))
-		else:
-			projected_qty = flt(item_warehouse_projected_qty.get(item_code, {}).get(warehouse))
+		projected_qty = flt(item_warehouse_projected_qty.get((d.item_code, d.warehouse_group or d.warehouse)))
 
 		if (reorder_level or reorder_qty) and projected_qty < reorder_level:
 			deficiency = reorder_level - projected_qty
 			if deficiency > reorder_qty:
 				reorder_qty = deficiency
 
-			company = warehouse_company.get(warehouse) or default_company
+			company = warehouse_company.get(d.warehouse) or default_company
 
-			material_requests[material_request_type].setdefault(company, []).append({
-				"item_code": item_code,
-				"warehouse": warehouse,
+			material_requests[d.material_request_type].setdefault(company, []).append({
+				"item_code": d.item_code,
+				"warehouse": d.warehouse,
 				"reorder_qty": reorder_qty
 			})
 
-	for item_code in items_to_consider:
-		item = frappe.get_cached_doc("Item", item_code)
-
-		if item.variant_of and not item.get("reorder_levels"):
-			item.update_template_tables()
-
-		if item.get("reorder_levels"):
-			for d in item.get("reorder_levels"):
-				add_to_material_request(item_code, d.warehouse, d.warehouse_reorder_level,
-					d.warehouse_reorder_qty, d.material_request_type, warehouse_group=d.warehouse_group)
-
 	if material_requests:
 		return create_material_request(material_requests)
 
-def get_item_warehouse_projected_qty(items_to_consider):
-	item_warehouse_projected_qty = {}
-
-	for item_code, warehouse, projected_qty in frappe.db.sql("""select item_code, warehouse, projected_qty
-		from tabBin where item_code in ({0})
-			and (warehouse != "" and warehouse is not null)"""\
-		.format(", ".join(["%s"] * len(items_to_consider))), items_to_consider):
-
-		if item_code not in item_warehouse_projected_qty:
-			item_warehouse_projected_qty.setdefault(item_code, {})
-
-		if warehouse not in item_warehouse_projected_qty.get(item_code):
-			item_warehouse_projected_qty[item_code][warehouse] = flt(projected_qty)
-
-		warehouse_doc = frappe.get_doc("Warehouse", warehouse)
-
-		while warehouse_doc.parent_warehouse:
-			if not item_warehouse_projected_qty.get(item_code, {}).get(warehouse_doc.parent_warehouse):
-				item_warehouse_projected_qty.setdefault(item_code, {})[warehouse_doc.parent_warehouse] = flt(projected_qty)
-			else:
-				item_warehouse_projected_qty[item_code][warehouse_doc.parent_warehouse] += flt(projected_qty)
-			warehouse_doc = frappe.get_doc("Warehouse", warehouse_doc.parent_warehouse)
-
-	return item_warehouse_projected_qty
+def get_item_reorder_levels():
+	"""
+		Returns reorder levels of reorderable items,
+		variants without their own reorder levels use the reorder levels of their template
+	"""
+	return frappe.db.sql("""
+		select item.name as item_code, ir.idx, ir.warehouse, ir.warehouse_group,
+			ir.warehouse_reorder_level, ir.warehouse_reorder_qty, ir.material_request_type
+		from `tabItem` item
+		inner join `tabItem Reorder` ir on ir.parent = item.name
+		where {condition}
+
+		union all
+
+		select item.name as item_code, ir.idx, ir.warehouse, null as warehouse_group,
+			ir.warehouse_reorder_level, ir.warehouse_reorder_qty, ir.material_request_type
+		from `tabItem` item
+		inner join `tabItem Reorder` ir on ir.parent = item.variant_of
+		where {condition}
+			and ifnull(item.variant_of, '') != ''
+			and not exists (select name from `tabItem Reorder` own where own.parent = item.name)
+
+		order by item_code, idx
+	""".format(condition=reorderable_item_condition), {"today": nowdate()}, as_dict=1)
+
+def get_item_warehouse_projected_qty(warehouses):
+	"""
+		Returns {(item_code, warehouse): projected_qty} of reorderable items
+		with projected qty of group warehouses rolled up from their child warehouses
+	"""
+	if not warehouses:
+		return {}
+
+	return {(item_code, warehouse): flt(projected_qty) for item_code, warehouse, projected_qty in frappe.db.sql("""
+		select bin.item_code, target.name, sum(bin.projected_qty)
+		from `tabBin` bin
+		inner join `tabWarehouse` wh on wh.name = bin.warehouse
+		inner join `tabWarehouse` target on target.lft <= wh.lft and target.rgt >= wh.rgt
+		inner join `tabItem` item on item.name = bin.item_code
+		where target.name in %(warehouses)s and {condition}
+		group by bin.item_code, target.name
+	""".format(condition=reorderable_item_condition), {"warehouses": list(warehouses), "today": nowdate()})}
+
+def get_material_request_item_details(item_codes):
+	item_details = {}
+	for d in frappe.db.sql("""
+		select name, item_name, description, item_group, brand, stock_uom, purchase_uom, lead_time_days
+		from `tabItem`
+		where name in %s
+	""", [item_codes], as_dict=1):
+		d.conversion_factors = {}
+		item_details[d.name] = d
+
+	for parent, uom, conversion_factor in frappe.db.sql("""
+		select parent, uom, conversion_factor
+		from `tabUOM Conversion Detail`
+		where parenttype = 'Item' and parent in %s
+	""", [item_codes]):
+		item_details[parent].conversion_factors[uom] = flt(conversion_factor)
+
+	return item_details
 
 def create_material_request(material_requests):
 	"""	Create indent on reaching reorder level	"""
@@ -118,55 +140,60 @@ def create_material_request(material_requests):
 
 		frappe.log_error(message=frappe.get_traceback())
 
+	item_codes = list(set([d["item_code"] for companies in material_requests.values()
+		for items in companies.values() for d in items]))
+	item_details = get_material_request_item_details(item_codes) if item_codes else {}
+
 	for request_type in material_requests:
 		for company in material_requests[request_type]:
-			try:
-				items = material_requests[request_type][company]
-				if not items:
-					continue
-
-				mr = frappe.new_doc("Material Request")
-				mr.update({
-					"company": company,
-					"transaction_date": nowdate(),
-					"material_request_type": "Material Transfer" if request_type=="Transfer" else request_type
-				})
-
-				for d in items:
-					d = frappe._dict(d)
-					item = frappe.get_cached_doc("Item", d.item_code)
-					uom = item.stock_uom
-					conversion_factor = 1.0
-
-					if request_type == 'Purchase':
-						uom = item.purchase_uom or item.stock_uom
-						if uom != item.stock_uom:
-							conversion_factor = frappe.db.get_value("UOM Conversion Detail",
-								{'parent': item.name, 'uom': uom}, 'conversion_factor') or 1.0
-
-					mr.append("items", {
-						"doctype": "Material Request Item",
-						"item_code": d.item_code,
-						"schedule_date": add_days(nowdate(),cint(item.lead_time_days)),
-						"qty": d.reorder_qty / conversion_factor,
-						"uom": uom,
-						"stock_uom": item.stock_uom,
-						"warehouse": d.warehouse,
-						"item_name": item.item_name,
-						"description": item.description,
-						"item_group": item.item_group,
-						"brand": item.brand,
+			company_items = material_requests[request_type][company]
+
+			# large requests are split into multiple Material Requests
+			for i in range(0, len(company_items), material_request_items_limit):
+				try:
+					items = company_items[i:i + material_request_items_limit]
+
+					mr = frappe.new_doc("Material Request")
+					mr.update({
+						"company": company,
+						"transaction_date": nowdate(),
+						"material_request_type": "Material Transfer" if request_type=="Transfer" else request_type
 					})
 
-				schedule_dates = [d.schedule_date for d in mr.items]
-				mr.schedule_date = max(schedule_dates or [nowdate()])
-				mr.flags.ignore_mandatory = True
-				mr.insert()
-				mr.submit()
-				mr_list.append(mr)
-
-			except:
-				_log_exception()
+					for d in items:
+						d = frappe._dict(d)
+						item = item_details[d.item_code]
+						uom = item.stock_uom
+						conversion_factor = 1.0
+
+						if request_type == 'Purchase':
+							uom = item.purchase_uom or item.stock_uom
+							if uom != item.stock_uom:
+								conversion_factor = item.conversion_factors.get(uom) or 1.0
+
+						mr.append("items", {
+							"doctype": "Material Request Item",
+							"item_code": d.item_code,
+							"schedule_date": add_days(nowdate(),cint(item.lead_time_days)),
+							"qty": d.reorder_qty / conversion_factor,
+							"uom": uom,
+							"stock_uom": item.stock_uom,
+							"warehouse": d.warehouse,
+							"item_name": item.item_name,
+							"description": item.description,
+							"item_group": item.item_group,
+							"brand": item.brand,
+						})
+
+					schedule_dates = [d.schedule_date for d in mr.items]
+					mr.schedule_date = max(schedule_dates or [nowdate()])
+					mr.flags.ignore_mandatory = True
+					mr.insert()
+					mr.submit()
+					mr_list.append(mr)
+
+				except:
+					_log_exception()
 
 	if mr_list:
 		if getattr(frappe.local, "reorder_email_notify", None) is None:
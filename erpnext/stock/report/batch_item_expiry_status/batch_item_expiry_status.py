@@ -21,7 +21,7 @@ def execute(filters=None):
 				qty_dict = iwb_map[item][wh][batch]
 
 				data.append([item, item_map[item]["item_name"], item_map[item]["description"], wh, batch,
-					frappe.db.get_value('Batch', batch, 'expiry_date'), qty_dict.expiry_status
+					qty_dict.expires_on, qty_dict.expiry_status
 				])
 			
 
@@ -42,7 +42,7 @@ def get_conditions(filters):
 		frappe.throw(_("'From Date' is required"))
 
 	if filters.get("to_date"):
-		conditions += " and posting_date <= '%s'" % filters["to_date"]
+		conditions += " and sle.posting_date <= '%s'" % filters["to_date"]
 	else:
 		frappe.throw(_("'To Date' is required"))
 
@@ -50,18 +50,25 @@ def get_conditions(filters):
 
 def get_stock_ledger_entries(filters):
 	conditions = get_conditions(filters)
-	return frappe.db.sql("""select item_code, batch_no, warehouse,
-		posting_date, actual_qty
-		from `tabStock Ledger Entry`
-		where docstatus < 2 and ifnull(batch_no, '') != '' %s order by item_code, warehouse""" %
+
+	if getdate(filters["to_date"]) >= getdate():
+		# batches with stock ledger entries upto today are the batches in Batch Balance
+		return frappe.db.sql("""select bb.item_code, bb.batch_no, bb.warehouse, b.expiry_date
+			from `tabBatch Balance` bb
+			inner join `tabBatch` b on b.name = bb.batch_no
+			order by bb.item_code, bb.warehouse""", as_dict=1)
+
+	return frappe.db.sql("""select distinct sle.item_code, sle.batch_no, sle.warehouse, b.expiry_date
+		from `tabStock Ledger Entry` sle
+		inner join `tabBatch` b on b.name = sle.batch_no
+		where sle.docstatus < 2 and ifnull(sle.batch_no, '') != '' %s order by sle.item_code, sle.warehouse""" %
 		conditions, as_dict=1)
 
 def get_item_warehouse_batch_map(filters, float_precision):
 	sle = get_stock_ledger_entries(filters)
 	iwb_map = {}
 
-	from_date = getdate(filters["from_date"])
-	to_date = getdate(filters["to_date"])
+	today = frappe.utils.datetime.date.today()
 
 	for d in sle:
 		iwb_map.setdefault(d.item_code, {}).setdefault(d.warehouse, {})\
@@ -69,14 +76,11 @@ def get_item_warehouse_batch_map(filters, float_precision):
 				"expires_on": None, "expiry_status": None}))
 
 		qty_dict = iwb_map[d.item_code][d.warehouse][d.batch_no]
-		
-		expiry_date_unicode = frappe.db.get_value('Batch', d.batch_no, 'expiry_date')
-		qty_dict.expires_on = expiry_date_unicode
 
-		exp_date = frappe.utils.data.getdate(expiry_date_unicode)
-		qty_dict.expires_on = exp_date
+		qty_dict.expires_on = d.expiry_date
+		exp_date = getdate(d.expiry_date)
 
-		expires_in_days = (exp_date - frappe.utils.datetime.date.today()).days
+		expires_in_days = (exp_date - today).days
 
 		if expires_in_days > 0:
 			qty_dict.expiry_status = expires_in_days
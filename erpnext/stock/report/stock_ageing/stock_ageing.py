@@ -3,11 +3,12 @@
 
 import frappe
 from frappe import _
+from collections import deque
 from frappe.utils import getdate, today, date_diff, flt, cint
 from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
 from erpnext.stock.report.stock_balance.stock_balance import get_items_for_stock_report,\
-	get_stock_ledger_entries_for_stock_report, is_warehouse_included, is_batch_included, is_package_included,\
-	get_key, get_key_fields
+	get_stock_ledger_entries_for_stock_report, get_stock_ledger_items_for_stock_report,\
+	is_warehouse_included, is_batch_included, is_package_included, get_key, get_key_fields
 
 
 def execute(filters=None):
@@ -29,78 +30,80 @@ class StockAgeingReport:
 		self.get_columns()
 
 		self.get_items()
-		if not self.items and self.items is not None:
+		if not self.items:
 			return self.columns, []
 
-		self.get_stock_ledger_entries()
-		if not self.sles:
-			return self.columns, []
+		# items are processed in chunks and rows are made as soon as ageing of an item is complete
+		# so that Stock Ledger Entries of all items are not held together
+		self.rows = []
+		for i in range(0, len(self.items), self.item_chunk_size):
+			item_codes = self.items[i:i + self.item_chunk_size]
+
+			self.get_item_details_map(item_codes)
+
+			rows = []
+			for key, fifo_dict in self.get_fifo_queues(item_codes):
+				row = self.get_row(fifo_dict)
+				if row:
+					rows.append(row)
 
-		self.get_item_details_map()
-		self.get_fifo_queue_map()
-		self.get_packing_slip_map()
-		self.get_rows()
+			self.set_package_type(rows)
+			self.rows += rows
 
 		return self.columns, self.rows
 
+	item_chunk_size = 200
+
 	def get_items(self):
 		self.items = get_items_for_stock_report(self.filters)
-		return self.items
+		if self.items is None:
+			self.items = get_stock_ledger_items_for_stock_report(self.filters)
+		else:
+			self.items = sorted(self.items)
 
-	def get_stock_ledger_entries(self):
-		self.sles = get_stock_ledger_entries_for_stock_report(self.filters, self.items)
-		return self.sles
+		return self.items
 
-	def get_item_details_map(self):
+	def get_item_details_map(self, item_codes):
 		self.item_map = {}
 
-		if not self.items:
-			self.items = list(set([d.item_code for d in self.sles]))
-		if not self.items:
-			return self.item_map
-
 		item_data = frappe.db.sql("""
 			select
 				item.name, item.item_name, item.description, item.item_group, item.brand,
 				item.stock_uom, item.alt_uom, item.alt_uom_size, item.disabled
 			from `tabItem` item
 			where item.name in %s
-		""", [self.items], as_dict=1)
+		""", [item_codes], as_dict=1)
 
 		for item in item_data:
 			self.item_map[item.name] = item
 
 		return self.item_map
 
-	def get_fifo_queue_map(self):
-		self.fifo_queue_map = get_fifo_queue(self.sles,
+	def get_fifo_queues(self, item_codes):
+		sles = get_stock_ledger_entries_for_stock_report(self.filters, item_codes, order_by_item=True)
+		return iter_fifo_queues(sles,
 			include_warehouse=self.is_warehouse_included(),
 			include_batch=self.is_batch_included(),
 			include_package=self.is_package_included(),
 		)
-		return self.fifo_queue_map
 
-	def get_packing_slip_map(self):
-		self.packing_slip_map = {}
+	def set_package_type(self, rows):
 		if not self.is_package_included():
-			return self.packing_slip_map
-
-		packing_slips = list(set([d['details'].get("packing_slip") for d in self.fifo_queue_map.values()\
-			if d['details'].get("packing_slip")]))
+			return
 
-		packing_slip_data = []
-		if packing_slips:
-			packing_slip_data = frappe.db.sql("""
-				select name, package_type
-				from `tabPacking Slip`
-				where name in %s
-			""", [packing_slips], as_dict=1)
+		packing_slips = list(set([d.get("packing_slip") for d in rows if d.get("packing_slip")]))
+		if not packing_slips:
+			return
 
-		self.packing_slip_map = {}
-		for d in packing_slip_data:
-			self.packing_slip_map[d.name] = d
+		packing_slip_map = dict(frappe.db.sql("""
+			select name, package_type
+			from `tabPacking Slip`
+			where name in %s
+		""", [packing_slips]))
 
-		return self.packing_slip_map
+		for row in rows:
+			if row.get("packing_slip"):
+				row["package_type"] = packing_slip_map.get(row.get("packing_slip"))
 
 	def is_warehouse_included(self):
 		return is_warehouse_included(self.filters)
@@ -111,40 +114,33 @@ class StockAgeingReport:
 	def is_package_included(self):
 		return is_package_included(self.filters)
 
-	def get_rows(self):
-		self.rows = []
-
-		for key, fifo_dict in self.fifo_queue_map.items():
-			fifo_queue = fifo_dict["fifo_queue"]
-			if not fifo_queue or (not fifo_dict.get("total_qty")):
-				continue
-
-			item_details = self.item_map.get(fifo_dict["details"].item_code, {})
-			package_type = self.packing_slip_map.get(fifo_dict["details"].packing_slip, {}).get("package_type") \
-				if fifo_dict["details"].packing_slip else None
+	def get_row(self, fifo_dict):
+		fifo_queue = fifo_dict["fifo_queue"]
+		if not fifo_queue or (not fifo_dict.get("total_qty")):
+			return
 
-			row = {
-				"item_code": item_details.name,
-				"warehouse": fifo_dict["details"].warehouse,
-				"batch_no": fifo_dict["details"].batch_no,
-				"packing_slip": fifo_dict["details"].packing_slip,
+		item_details = self.item_map.get(fifo_dict["details"].item_code, {})
 
-				"package_type": package_type,
-				"item_name": item_details.item_name,
-				"disable_item_formatter": cint(self.show_item_name),
-				"item_group": item_details.item_group,
-				"brand": item_details.brand,
+		row = {
+			"item_code": item_details.name,
+			"warehouse": fifo_dict["details"].warehouse,
+			"batch_no": fifo_dict["details"].batch_no,
+			"packing_slip": fifo_dict["details"].packing_slip,
 
-				"uom": item_details.stock_uom,
-				"bal_qty": fifo_dict.get("total_qty"),
-			}
+			"package_type": None,
+			"item_name": item_details.item_name,
+			"disable_item_formatter": cint(self.show_item_name),
+			"item_group": item_details.item_group,
+			"brand": item_details.brand,
 
-			ageing_details = get_ageing_details(fifo_queue, self.filters.to_date)
-			row.update(ageing_details)
+			"uom": item_details.stock_uom,
+			"bal_qty": fifo_dict.get("total_qty"),
+		}
 
-			self.rows.append(row)
+		ageing_details = get_ageing_details(fifo_queue, self.filters.to_date)
+		row.update(ageing_details)
 
-		return self.rows
+		return row
 
 	def get_columns(self):
 		self.columns = [
@@ -190,88 +186,151 @@ class StockAgeingReport:
 
 
 def get_fifo_queue(sles, include_warehouse, include_batch, include_package):
+	"""Returns {key: {"details": key_dict, "fifo_queue": [[qty or serial_no, posting_date], ...], "total_qty": qty}}"""
 	fifo_queue_map = {}
-	transferred_item_details = {}
-	serial_no_batch_purchase_details = {}
-
-	for sle in sles:
-		fifo_dict = get_fifo_dict(sle, fifo_queue_map,
-			include_warehouse=include_warehouse,
-			include_batch=include_batch,
-			include_package=include_package,
-		)
-
-		fifo_queue = fifo_dict["fifo_queue"]
-		transferred_item_details.setdefault((sle.voucher_no, sle.item_code), [])
-		serial_no_list = get_serial_nos(sle.serial_no) if sle.serial_no else []
-
-		if sle.actual_qty > 0:
-			if transferred_item_details.get((sle.voucher_no, sle.item_code)):
-				batch = transferred_item_details[(sle.voucher_no, sle.item_code)][0]
-				fifo_queue.append(batch)
-				transferred_item_details[((sle.voucher_no, sle.item_code))].pop(0)
-			else:
-				if serial_no_list:
-					for serial_no in serial_no_list:
-						if serial_no_batch_purchase_details.get(serial_no):
-							fifo_queue.append([serial_no, serial_no_batch_purchase_details.get(serial_no)])
-						else:
-							serial_no_batch_purchase_details.setdefault(serial_no, sle.posting_date)
-							fifo_queue.append([serial_no, sle.posting_date])
-				else:
-					fifo_queue.append([sle.actual_qty, sle.posting_date])
-		else:
-			if serial_no_list:
-				for serial_no in fifo_queue:
-					if serial_no[0] in serial_no_list:
-						fifo_queue.remove(serial_no)
-			else:
-				qty_to_pop = abs(sle.actual_qty)
-				while qty_to_pop:
-					batch = fifo_queue[0] if fifo_queue else [0, None]
-					if 0 < flt(batch[0]) <= qty_to_pop:
-						# if batch qty > 0
-						# not enough or exactly same qty in current batch, clear batch
-						qty_to_pop -= flt(batch[0])
-						transferred_item_details[(sle.voucher_no, sle.item_code)].append(fifo_queue.pop(0))
-					else:
-						# all from current batch
-						batch[0] = flt(batch[0]) - qty_to_pop
-						transferred_item_details[(sle.voucher_no, sle.item_code)].append([qty_to_pop, batch[1]])
-						qty_to_pop = 0
-
-		fifo_dict["qty_after_transaction"] = sle.qty_after_transaction
-
-		if "total_qty" not in fifo_dict:
-			fifo_dict["total_qty"] = sle.actual_qty
-		else:
-			fifo_dict["total_qty"] += sle.actual_qty
-
-	# sort and filter
-	sort_key = lambda x: x[1]
-	for key in fifo_queue_map:
-		fifo_queue_map[key]['fifo_queue'] = sorted(filter(sort_key, fifo_queue_map[key]['fifo_queue']), key=sort_key)
+	if sles:
+		for key, fifo_dict in get_item_fifo_queues(sles, include_warehouse, include_batch, include_package):
+			fifo_queue_map[key] = fifo_dict
 
 	return fifo_queue_map
 
 
-def get_fifo_dict(sle, fifo_queue_map, include_warehouse, include_batch, include_package):
-	key = get_key(sle,
-		include_warehouse=include_warehouse,
-		include_batch=include_batch,
-		include_package=include_package
-	)
+def iter_fifo_queues(sles, include_warehouse, include_batch, include_package):
+	"""
+		Yields (key, fifo_dict) as soon as all Stock Ledger Entries of an item are processed
 
-	if key not in fifo_queue_map:
-		key_fields = get_key_fields(include_warehouse=include_warehouse, include_batch=include_batch, include_package=include_package)
-		key_dict = frappe._dict(zip(key_fields, key))
+		Transfers and serial nos only carry ageing within the same item
+		so items are processed independently. sles must be ordered by item code and then posting order.
+	"""
+	item_sles = []
+	item_code = None
 
-		fifo_queue_map[key] = frappe._dict({
-			"details": key_dict, "fifo_queue": []
+	for sle in sles:
+		if item_sles and sle.item_code != item_code:
+			for d in get_item_fifo_queues(item_sles, include_warehouse, include_batch, include_package):
+				yield d
+			item_sles = []
+
+		item_code = sle.item_code
+		item_sles.append(sle)
+
+	if item_sles:
+		for d in get_item_fifo_queues(item_sles, include_warehouse, include_batch, include_package):
+			yield d
+
+
+def get_item_fifo_queues(sles, include_warehouse, include_batch, include_package):
+	if len(set([sle.item_code for sle in sles])) > 1:
+		# sles of multiple items in posting order, process each item separately
+		sles_by_item = {}
+		for sle in sles:
+			sles_by_item.setdefault(sle.item_code, []).append(sle)
+	else:
+		sles_by_item = {sles[0].item_code: sles}
+
+	out = []
+	for item_sles in sles_by_item.values():
+		queues = {}
+		transferred_item_details = {}
+		serial_no_purchase_dates = {}
+
+		for sle in item_sles:
+			key = get_key(sle,
+				include_warehouse=include_warehouse,
+				include_batch=include_batch,
+				include_package=include_package
+			)
+
+			queue = queues.get(key)
+			if not queue:
+				key_fields = get_key_fields(include_warehouse=include_warehouse, include_batch=include_batch,
+					include_package=include_package)
+				queue = queues[key] = AgeingQueue(frappe._dict(zip(key_fields, key)))
+
+			transferred = transferred_item_details.setdefault(sle.voucher_no, deque())
+			serial_no_list = get_serial_nos(sle.serial_no) if sle.serial_no else []
+
+			if sle.actual_qty > 0:
+				if transferred:
+					queue.add_layer(*transferred.popleft())
+				elif serial_no_list:
+					for serial_no in serial_no_list:
+						posting_date = serial_no_purchase_dates.setdefault(serial_no, sle.posting_date)
+						queue.add_serial_no(serial_no, posting_date)
+				else:
+					queue.add_layer(sle.actual_qty, sle.posting_date)
+			else:
+				if serial_no_list:
+					queue.remove_serial_nos(serial_no_list)
+				else:
+					transferred.extend(queue.remove_qty(abs(sle.actual_qty)))
+
+			queue.qty_after_transaction = sle.qty_after_transaction
+			queue.total_qty += sle.actual_qty
+
+		for key, queue in queues.items():
+			out.append((key, queue.get_fifo_dict()))
+
+	return out
+
+
+class AgeingQueue(object):
+	"""
+		Ageing layers of a key
+
+		Qty layers are consumed from the head of a deque
+		and serial no layers are kept in a dict indexed by serial no.
+		Layers are numbered so that the order of insertion is kept in the final queue.
+	"""
+	def __init__(self, details):
+		self.details = details
+		self.layers = deque()
+		self.serial_nos = {}
+		self.count = 0
+		self.total_qty = 0.0
+		self.qty_after_transaction = 0.0
+
+	def add_layer(self, qty, posting_date):
+		self.count += 1
+		self.layers.append([qty, posting_date, self.count])
+
+	def add_serial_no(self, serial_no, posting_date):
+		self.count += 1
+		self.serial_nos[serial_no] = [serial_no, posting_date, self.count]
+
+	def remove_serial_nos(self, serial_nos):
+		for serial_no in serial_nos:
+			self.serial_nos.pop(serial_no, None)
+
+	def remove_qty(self, qty_to_pop):
+		"""Consumes qty from the head and returns the consumed [qty, posting_date] layers"""
+		consumed = []
+		while qty_to_pop:
+			layer = self.layers[0] if self.layers else [0, None]
+			if 0 < flt(layer[0]) <= qty_to_pop:
+				# not enough or exactly same qty in current layer, clear layer
+				qty_to_pop -= flt(layer[0])
+				self.layers.popleft()
+				consumed.append([layer[0], layer[1]])
+			else:
+				# all from current layer
+				layer[0] = flt(layer[0]) - qty_to_pop
+				consumed.append([qty_to_pop, layer[1]])
+				qty_to_pop = 0
+
+		return consumed
+
+	def get_fifo_dict(self):
+		layers = [d for d in list(self.layers) + list(self.serial_nos.values()) if d[1]]
+		layers.sort(key=lambda d: (d[1], d[2]))
+
+		return frappe._dict({
+			"details": self.details,
+			"fifo_queue": [[d[0], d[1]] for d in layers],
+			"qty_after_transaction": self.qty_after_transaction,
+			"total_qty": self.total_qty
 		})
 
-	return fifo_queue_map[key]
-
 
 def get_ageing_details(fifo_queue, to_date):
 	to_date = getdate(to_date)
@@ -5,6 +5,7 @@ import frappe
 from frappe import _
 from frappe.utils import flt, cint, getdate, today, cstr, combine_datetime
 from erpnext.stock.utils import update_included_uom_in_dict_report, has_valuation_read_permission
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import get_stock_closing_balance_dates
 from frappe.desk.reportview import build_match_conditions
 from collections import OrderedDict
 
@@ -65,8 +66,9 @@ class StockBalanceReport:
 		if not self.items and self.items is not None:
 			return self.columns, []
 
+		self.get_closing_balances()
 		self.get_stock_ledger_entries()
-		if not self.sles:
+		if not self.sles and not self.closing_balances:
 			return self.columns, []
 
 		self.get_item_details_map()
@@ -96,9 +98,36 @@ class StockBalanceReport:
 		return self.items
 
 	def get_stock_ledger_entries(self):
-		self.sles = get_stock_ledger_entries_for_stock_report(self.filters, self.items)
+		self.sles = get_stock_ledger_entries_for_stock_report(self.filters, self.items,
+			closing_balance_dates=self.closing_balance_dates)
 		return self.sles
 
+	def get_closing_balances(self):
+		# opening balances are read from the latest month end closing balance before from date
+		# and only Stock Ledger Entries after it are read
+		self.closing_balance_dates = {}
+		self.closing_balances = []
+
+		if not self.can_use_closing_balances():
+			return self.closing_balances
+
+		self.closing_balance_dates = get_stock_closing_balance_dates(self.filters.from_date, self.filters.company)
+		if self.closing_balance_dates:
+			self.closing_balances = get_closing_balances_for_stock_report(self.filters, self.items,
+				self.closing_balance_dates)
+
+		return self.closing_balances
+
+	def can_use_closing_balances(self):
+		# stock ageing needs the complete history and rows with zero balance are not kept in closing balances
+		if self.include_stock_ageing_data() or self.filters.get("show_zero_qty_rows"):
+			return False
+
+		if build_match_conditions("Stock Ledger Entry"):
+			return False
+
+		return True
+
 	def get_purchase_order_map(self):
 		self.purchase_order_map = {}
 
@@ -136,7 +165,7 @@ class StockBalanceReport:
 		self.item_map = {}
 
 		if not self.items:
-			self.items = list(set([d.item_code for d in self.sles]))
+			self.items = list(set([d.item_code for d in self.sles] + [d.item_code for d in self.closing_balances]))
 		if not self.items:
 			return self.item_map
 
@@ -201,6 +230,18 @@ class StockBalanceReport:
 	def get_stock_balance_map(self):
 		self.stock_balance_map = OrderedDict()
 
+		for d in self.closing_balances:
+			key = self.get_balance_key(d)
+			stock_balance = self.get_balance_dict(key)
+
+			stock_balance.opening_qty += flt(d.qty)
+			stock_balance.opening_val += flt(d.stock_value)
+			stock_balance.bal_qty += flt(d.qty)
+			stock_balance.bal_val += flt(d.stock_value)
+
+			if flt(stock_balance.bal_qty, 9):
+				stock_balance.val_rate = flt(stock_balance.bal_val / flt(stock_balance.bal_qty, 9), 9)
+
 		for sle in self.sles:
 			key = self.get_balance_key(sle)
 			stock_balance = self.get_balance_dict(key)
@@ -591,7 +632,16 @@ def get_items_for_stock_report(filters):
 	return items
 
 
-def get_stock_ledger_entries_for_stock_report(filters, item_list=None):
+def get_stock_ledger_items_for_stock_report(filters):
+	return frappe.db.sql_list("""
+		select distinct item_code
+		from `tabStock Ledger Entry`
+		where docstatus < 2 {0}
+		order by item_code
+	""".format(get_sle_conditions(filters)))
+
+
+def get_stock_ledger_entries_for_stock_report(filters, item_list=None, closing_balance_dates=None, order_by_item=False):
 	item_conditions = ""
 	if item_list:
 		item_conditions = " and item_code in ({0})".format(
@@ -599,26 +649,57 @@ def get_stock_ledger_entries_for_stock_report(filters, item_list=None):
 
 	sle_conditions = get_sle_conditions(filters)
 
+	if closing_balance_dates:
+		# only entries after the closing balance of the company
+		date_conditions = ["(company = {0} and posting_date > {1})".format(frappe.db.escape(company),
+			frappe.db.escape(str(date))) for company, date in closing_balance_dates.items()]
+		date_conditions.append("company not in ({0})".format(
+			", ".join([frappe.db.escape(company) for company in closing_balance_dates])))
+		sle_conditions += " and ({0})".format(" or ".join(date_conditions))
+
 	sles = frappe.db.sql("""
 		select
 			item_code, warehouse, company, batch_no, packing_slip, serial_no,
 			actual_qty, valuation_rate, qty_after_transaction, stock_value_difference,
 			posting_date, posting_time, voucher_type, voucher_no, is_transfer
-		from `tabStock Ledger Entry` force index (posting_sort_index)
-		where docstatus < 2 {0} {1}
-		order by posting_date, posting_time, creation, actual_qty
-	""".format(item_conditions, sle_conditions), as_dict=1)
+		from `tabStock Ledger Entry` {index_hint}
+		where docstatus < 2 {item_conditions} {sle_conditions}
+		order by {order_by}posting_date, posting_time, creation, actual_qty
+	""".format(
+		index_hint="" if order_by_item else "force index (posting_sort_index)",
+		item_conditions=item_conditions,
+		sle_conditions=sle_conditions,
+		order_by="item_code, " if order_by_item else ""
+	), as_dict=1)
 
 	return sles
 
 
-def get_sle_conditions(filters):
+def get_closing_balances_for_stock_report(filters, item_list, closing_balance_dates):
+	item_conditions = ""
+	if item_list:
+		item_conditions = " and item_code in ({0})".format(
+			', '.join([frappe.db.escape(i, percent=False) for i in item_list]))
+
+	conditions = get_sle_conditions(filters, table="`tabStock Closing Balance`", for_closing_balance=True)
+
+	date_conditions = ["(company = {0} and period_end_date = {1})".format(frappe.db.escape(company),
+		frappe.db.escape(str(date))) for company, date in closing_balance_dates.items()]
+
+	return frappe.db.sql("""
+		select item_code, warehouse, company, batch_no, packing_slip, qty, stock_value
+		from `tabStock Closing Balance`
+		where ({0}) {1} {2}
+	""".format(" or ".join(date_conditions), item_conditions, conditions), as_dict=1)
+
+
+def get_sle_conditions(filters, table="`tabStock Ledger Entry`", for_closing_balance=False):
 	conditions = []
 
 	if filters.get("company"):
 		conditions.append("company = {0}".format(frappe.db.escape(filters.get("company"))))
 
-	if filters.get("to_date"):
+	if filters.get("to_date") and not for_closing_balance:
 		conditions.append("posting_date <= {0}".format(frappe.db.escape(filters.get("to_date"))))
 
 	if filters.get("warehouse"):
@@ -627,13 +708,13 @@ def get_sle_conditions(filters):
 			frappe.throw(_("Warehouse {0} does not exist").format(filters.get("warehouse")))
 
 		conditions.append("""exists (select wh.name from `tabWarehouse` wh
-			where wh.lft >= {0} and wh.rgt <= {1} and `tabStock Ledger Entry`.warehouse = wh.name)
-		""".format(warehouse_details.lft, warehouse_details.rgt))
+			where wh.lft >= {0} and wh.rgt <= {1} and {2}.warehouse = wh.name)
+		""".format(warehouse_details.lft, warehouse_details.rgt, table))
 
 	elif filters.get("warehouse_type"):
 		conditions.append("""exists (select name from `tabWarehouse` wh \
-			where wh.warehouse_type = {0} and `tabStock Ledger Entry`.warehouse = wh.name)
-		""".format(frappe.db.escape(filters.get("warehouse_type"))))
+			where wh.warehouse_type = {0} and {1}.warehouse = wh.name)
+		""".format(frappe.db.escape(filters.get("warehouse_type")), table))
 
 	if filters.get("batch_no"):
 		conditions.append("batch_no = {0}".format(frappe.db.escape(filters.get("batch_no"))))
@@ -646,7 +727,7 @@ def get_sle_conditions(filters):
 	elif filters.get("package_wise_stock") == "Unpacked Stock":
 		conditions.append("(packing_slip = '' or packing_slip is null)")
 
-	match_conditions = build_match_conditions("Stock Ledger Entry")
+	match_conditions = build_match_conditions("Stock Ledger Entry") if not for_closing_balance else None
 	if match_conditions:
 		conditions.append(match_conditions)
 
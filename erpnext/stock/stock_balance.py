@@ -6,6 +6,8 @@ from frappe.utils import flt, cstr, nowdate, nowtime
 from erpnext.stock.utils import update_bin
 from erpnext.stock.stock_ledger import update_entries_after
 from erpnext.controllers.stock_controller import update_gl_entries_after
+from erpnext.accounts.general_ledger import delete_voucher_gl_entries
+from erpnext.stock.doctype.batch_balance.batch_balance import rebuild_batch_balances
 
 
 def repost(only_actual=False, allow_negative_stock=False, allow_zero_rate=False, only_bin=False, posting_date=None, posting_time=None):
@@ -62,6 +64,7 @@ def repost_stock(item_code, warehouse, allow_zero_rate=False,
 			})
 
 		update_bin_qty(item_code, warehouse, qty_dict)
+		rebuild_batch_balances(item_code, warehouse)
 
 
 def repost_actual_qty(item_code, warehouse, allow_zero_rate=False, allow_negative_stock=False, posting_date=None, posting_time=None):
@@ -298,8 +301,7 @@ def repost_stock_mismatch_gle(company=None, from_date=None, to_date=None, auto_c
 	for i, d in enumerate(mismatch_data):
 		print("{0}/{1}: {2} | {3}".format(i + 1, count, d.voucher_type, d.voucher_no))
 		doc = frappe.get_doc(d.voucher_type, d.voucher_no)
-		frappe.db.sql("""delete from `tabGL Entry` where voucher_type=%s and voucher_no=%s""",
-			(d.voucher_type, d.voucher_no))
+		delete_voucher_gl_entries(d.voucher_type, d.voucher_no)
 		doc.make_gl_entries(repost_future_gle=False, from_repost=True)
 
 		doc.clear_cache()
@@ -354,10 +356,11 @@ def repost_all_stock_vouchers():
 		frappe.db.sql("delete from `tabStock Ledger Entry`")
 		frappe.db.sql("delete from `tabStock Ledger Entry Dependency`")
 		frappe.db.sql("delete from `tabStock Ledger Entry Serial No`")
+		frappe.db.sql("delete from `tabBatch Balance`")
 
 		print("Deleting GLEs")
 		for voucher_type, voucher_no in vouchers:
-			frappe.db.sql("""delete from `tabGL Entry` where voucher_type=%s and voucher_no=%s""", (voucher_type, voucher_no))
+			delete_voucher_gl_entries(voucher_type, voucher_no)
 		print()
 
 		frappe.db.commit()
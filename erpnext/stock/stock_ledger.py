@@ -3,9 +3,13 @@
 import frappe
 import erpnext
 from frappe import _
-from frappe.utils import cint, flt, now, cstr
+from frappe.utils import cint, flt, now, cstr, getdate, get_time, get_datetime
 from erpnext.stock.utils import get_valuation_method
-import json
+from erpnext.stock.valuation import FIFOValuation
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import invalidate_stock_closing_balances
+from erpnext.stock.doctype.batch_balance.batch_balance import update_batch_balances, \
+	remove_voucher_from_batch_balances, update_batch_received_dates
+import heapq
 import datetime
 
 
@@ -18,13 +22,16 @@ _exceptions = frappe.local('stockledger_exceptions')
 
 def make_sl_entries(sl_entries, is_amended=None, allow_negative_stock=False, via_landed_cost_voucher=False):
 	if sl_entries:
-		from erpnext.stock.utils import update_bin
+		from erpnext.stock.utils import update_bins
 
 		cancel = True if sl_entries[0].get("is_cancelled") == "Yes" else False
 		if cancel:
 			set_as_cancel(sl_entries[0].get('voucher_no'), sl_entries[0].get('voucher_type'))
 
+		invalidate_stock_closing_balances_for(sl_entries)
+
 		bins_to_update = []
+		batch_sl_entries = []
 
 		for sle in sl_entries:
 			sle_id = None
@@ -39,6 +46,9 @@ def make_sl_entries(sl_entries, is_amended=None, allow_negative_stock=False, via
 				sle_id = sle_doc.get('name')
 				creation = sle_doc.get('creation')
 
+				if sle_doc.get('batch_no'):
+					batch_sl_entries.append(sle_doc)
+
 			args = sle.copy()
 			args.update({
 				"sle_id": sle_id,
@@ -48,13 +58,26 @@ def make_sl_entries(sl_entries, is_amended=None, allow_negative_stock=False, via
 			})
 			bins_to_update.append(args)
 
-		for args in bins_to_update:
-			update_bin(args, args.get('allow_negative_stock') or allow_negative_stock, via_landed_cost_voucher)
+		update_batch_balances(batch_sl_entries)
+
+		update_bins(bins_to_update, allow_negative_stock, via_landed_cost_voucher)
 
 		if cancel:
 			delete_cancelled_entry(sl_entries[0].get('voucher_type'), sl_entries[0].get('voucher_no'))
 
 
+def invalidate_stock_closing_balances_for(sl_entries):
+	posting_dates = {}
+	for sle in sl_entries:
+		company = sle.get("company") or frappe.db.get_value("Warehouse", sle.get("warehouse"), "company", cache=1)
+		posting_date = getdate(sle.get("posting_date"))
+		if company not in posting_dates or posting_date < posting_dates[company]:
+			posting_dates[company] = posting_date
+
+	for company, posting_date in posting_dates.items():
+		invalidate_stock_closing_balances(company, posting_date)
+
+
 def set_as_cancel(voucher_type, voucher_no):
 	frappe.db.sql("""
 		update `tabStock Ledger Entry`
@@ -75,6 +98,8 @@ def make_entry(args, allow_negative_stock=False, via_landed_cost_voucher=False):
 
 
 def delete_cancelled_entry(voucher_type, voucher_no):
+	batch_sl_entries = remove_voucher_from_batch_balances(voucher_type, voucher_no)
+
 	meta = frappe.get_meta("Stock Ledger Entry")
 	table_fields = meta.get_table_fields()
 
@@ -91,6 +116,9 @@ def delete_cancelled_entry(voucher_type, voucher_no):
 		where voucher_type=%s and voucher_no=%s
 	""", (voucher_type, voucher_no))
 
+	if batch_sl_entries:
+		update_batch_received_dates(batch_sl_entries)
+
 
 def get_allow_negative_stock(sle=None):
 	if sle and sle.get('allow_negative_stock'):
@@ -115,11 +143,18 @@ class update_entries_after(object):
 				"posting_time": "12:00"
 			}
 	"""
-	def __init__(self, args, allow_zero_rate=False, allow_negative_stock=None, via_landed_cost_voucher=False, verbose=1):
+	# reposted SLE values are written in bulk once this many are pending
+	sle_flush_size = 1000
+
+	def __init__(self, args, allow_zero_rate=False, allow_negative_stock=None, via_landed_cost_voucher=False, verbose=1,
+			planner=None, defer_future_entries=False):
 		from frappe.model.meta import get_field_precision
 
 		self.exceptions = []
 		self.verbose = verbose
+		self.sles_to_update = {}
+		self.processed_sles = {}
+		self.batch_balance_changes = []
 		self.allow_zero_rate = allow_zero_rate
 		self.allow_negative_stock = allow_negative_stock
 		self.via_landed_cost_voucher = via_landed_cost_voucher
@@ -135,11 +170,14 @@ class update_entries_after(object):
 
 		self.previous_packing_slip_sle_dict = {}
 		self.previous_batch_sle_dict = {}
+		self.valuation_rate_cache = {}
+		self.allow_zero_valuation_rate_cache = {}
 
 		for key in ("qty_after_transaction", "valuation_rate", "stock_value"):
 			setattr(self, key, flt(self.previous_sle.get(key)))
 
 		self.company = frappe.db.get_value("Warehouse", self.warehouse, "company", cache=1)
+		invalidate_stock_closing_balances(self.company, self.posting_date)
 		self.value_precision = get_field_precision(frappe.get_meta("Stock Ledger Entry").get_field("stock_value"),
 			currency=frappe.get_cached_value('Company',  self.company,  "default_currency"))
 
@@ -149,27 +187,61 @@ class update_entries_after(object):
 			frappe.flags.stock_ledger_vouchers_value_changed = set()
 
 		self.prev_stock_value = self.previous_sle.stock_value or 0.0
-		self.stock_queue = json.loads(self.previous_sle.stock_queue or "[]")
+		self.stock_queue = FIFOValuation(self.previous_sle.stock_queue)
 		self.valuation_method, self.batch_wise_valuation = get_valuation_method(self.item_code)
 		self.stock_value_difference = 0.0
+
+		# dependent (item_code, warehouse) partitions are not reposted recursively
+		# they are queued in the planner and processed once each in posting order
+		self.is_root = planner is None
+		self.planner = planner or StockRepostPlanner(allow_negative_stock=self.allow_negative_stock,
+			via_landed_cost_voucher=via_landed_cost_voucher, defer_future_entries=defer_future_entries,
+			voucher=(args.get("voucher_type"), args.get("voucher_no")))
+
 		self.build()
 
+		if self.is_root:
+			self.planner.run()
+
 	def build(self):
 		# includes current entry!
 		entries_to_fix = self.get_sle_after_datetime()
+		future_entries = []
+		if self.planner.defer_future_entries:
+			entries_to_fix, future_entries = self.split_future_entries(entries_to_fix)
+
+		self.opening_balances = self.get_opening_balances(entries_to_fix)
 		self.sle_dependency_map = self.get_sle_dependency_map(entries_to_fix)
+		self.dependency_sle_map = self.get_dependency_sle_map(self.sle_dependency_map)
 		dependent_entries = self.get_dependent_entries_to_fix(entries_to_fix)
 
 		for sle in entries_to_fix:
 			self.process_sle(sle)
 
+		self.update_stock_ledger_entries()
+
+		if future_entries:
+			self.validate_future_negative_stock(future_entries)
+
 		if self.exceptions:
 			self.raise_exceptions()
 
-		self.update_bin()
+		if future_entries:
+			# bin qty is updated now, valuation and stock value will be set when future entries are reposted
+			self.update_bin({"actual_qty": self.get_qty_after_future_entries(future_entries)})
+			self.planner.queue_background_repost({
+				"item_code": self.item_code,
+				"warehouse": self.warehouse,
+				"posting_date": future_entries[0].posting_date,
+				"posting_time": future_entries[0].posting_time,
+				"creation": future_entries[0].creation,
+				"sle_id": future_entries[0].name,
+			})
+		else:
+			self.update_bin()
 
 		for d in dependent_entries:
-			update_entries_after({
+			self.planner.add({
 				"item_code": d.item_code,
 				"warehouse": d.warehouse,
 				"batch_no": d.batch_no,
@@ -177,10 +249,77 @@ class update_entries_after(object):
 				"posting_time": d.posting_time,
 				"creation": d.creation,
 				"sle_id": d.name,
+				"voucher_type": d.voucher_type,
 				"voucher_no": d.voucher_no
-			}, allow_negative_stock=self.allow_negative_stock, via_landed_cost_voucher=self.via_landed_cost_voucher)
+			})
+
+	def split_future_entries(self, sles):
+		"""Split entries into entries upto the last entry of the current voucher and the entries after it"""
+		last_index = -1
+		for i, sle in enumerate(sles):
+			if (sle.voucher_type, sle.voucher_no) == self.planner.voucher:
+				last_index = i
+
+		return sles[:last_index + 1], sles[last_index + 1:]
+
+	def get_qty_after_future_entries(self, future_entries):
+		"""qty after the last future entry with the qty difference of the current voucher applied"""
+		# qty is reset by a stock reconciliation so the difference does not carry beyond it
+		if any(d.voucher_type == "Stock Reconciliation" for d in future_entries):
+			return flt(future_entries[-1].qty_after_transaction)
+
+		qty_difference = flt(self.qty_after_transaction - flt(future_entries[0].qty_after_transaction)
+			+ flt(future_entries[0].actual_qty), 9)
+		return flt(flt(future_entries[-1].qty_after_transaction) + qty_difference, 9)
+
+	def validate_future_negative_stock(self, future_entries):
+		"""
+			validate qty of entries that will be reposted in the background
+			by applying the qty difference of the current voucher to their previous balance
+		"""
+		if cint(self.allow_negative_stock):
+			return
+
+		qty_difference = None
+		batch_qty_difference = {}
+
+		for sle in future_entries:
+			if sle.voucher_type == "Stock Reconciliation":
+				break
+
+			if qty_difference is None:
+				qty_difference = flt(self.qty_after_transaction - flt(sle.qty_after_transaction) + flt(sle.actual_qty), 9)
+			if qty_difference < 0:
+				self.validate_future_qty(sle, flt(sle.qty_after_transaction) + qty_difference)
+
+			if self.batch_wise_valuation and sle.batch_no in self.previous_batch_sle_dict:
+				if sle.batch_no not in batch_qty_difference:
+					batch_data = self.previous_batch_sle_dict[sle.batch_no]
+					batch_qty_difference[sle.batch_no] = flt(batch_data.batch_qty_after_transaction
+						- flt(sle.batch_qty_after_transaction) + flt(sle.actual_qty), 9)
+				if batch_qty_difference[sle.batch_no] < 0:
+					self.validate_future_qty(sle, flt(sle.batch_qty_after_transaction) + batch_qty_difference[sle.batch_no],
+						validate_batch=True)
+
+	def validate_future_qty(self, sle, qty, validate_batch=False):
+		qty = flt(qty, 9)
+		if qty < 0 and abs(qty) > 0.0001:
+			self.exceptions.append(sle.copy().update({
+				"diff": qty, "validate_batch": validate_batch, "validate_packing_slip": False
+			}))
 
-	def update_bin(self):
+	def update_stock_ledger_entries(self):
+		"""Write pending SLE values and batch balances, before any query that reads them"""
+		if self.sles_to_update:
+			bulk_update_stock_ledger_entries(list(self.sles_to_update.values()))
+			self.sles_to_update = {}
+
+		# actual qty of Stock Reconciliation entries is recalculated on reposting
+		if self.batch_balance_changes:
+			update_batch_balances(self.batch_balance_changes)
+			self.batch_balance_changes = []
+
+	def update_bin(self, values=None):
 		# update bin
 		bin_name = frappe.db.get_value("Bin", {
 			"item_code": self.item_code,
@@ -197,7 +336,7 @@ class update_entries_after(object):
 		else:
 			bin_doc = frappe.get_doc("Bin", bin_name)
 
-		bin_doc.update({
+		bin_doc.update(values or {
 			"valuation_rate": self.valuation_rate,
 			"actual_qty": self.qty_after_transaction,
 			"stock_value": self.stock_value
@@ -209,6 +348,8 @@ class update_entries_after(object):
 	def process_sle(self, sle):
 		from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos, update_args_for_serial_no
 
+		previous_actual_qty = flt(sle.actual_qty)
+
 		self.get_previous_packing_slip_sle(sle)
 		if self.batch_wise_valuation:
 			self.get_previous_batch_sle(sle)
@@ -252,7 +393,7 @@ class update_entries_after(object):
 		sle.qty_after_transaction = self.qty_after_transaction
 		sle.valuation_rate = self.valuation_rate
 		sle.stock_value = self.stock_value
-		sle.stock_queue = json.dumps(self.stock_queue)
+		sle.stock_queue = self.stock_queue.serialize()
 		sle.stock_value_difference = stock_value_difference
 
 		# Batch Values
@@ -280,9 +421,19 @@ class update_entries_after(object):
 				return
 
 		# update SLE and Serial Nos
-		sle.doctype = "Stock Ledger Entry"
+		# SLE values are flushed in bulk at the end of the partition
 		sle.is_processed = 1
-		frappe.get_doc(sle).db_update()
+		self.sles_to_update[sle.name] = sle
+		self.processed_sles[sle.name] = sle
+
+		if sle.batch_no and flt(sle.actual_qty) != previous_actual_qty:
+			self.batch_balance_changes.append(frappe._dict({
+				"item_code": sle.item_code,
+				"warehouse": sle.warehouse,
+				"batch_no": sle.batch_no,
+				"packing_slip": sle.packing_slip,
+				"actual_qty": flt(sle.actual_qty) - previous_actual_qty
+			}))
 
 		for serial_no in serial_nos:
 			sr_doc = frappe.get_doc("Serial No", serial_no)
@@ -290,6 +441,9 @@ class update_entries_after(object):
 
 		self.add_sle_to_reposted_flags(sle, stock_value_difference_changed)
 
+		if len(self.sles_to_update) >= self.sle_flush_size:
+			self.update_stock_ledger_entries()
+
 	def validate_negative_stock(self, sle, validate_batch=False, validate_packing_slip=False):
 		"""
 			validate negative stock for entries current datetime onwards
@@ -344,14 +498,13 @@ class update_entries_after(object):
 		if not self.valuation_rate and sle.voucher_detail_no:
 			allow_zero_rate = self.check_if_allow_zero_valuation_rate(sle.voucher_type, sle.voucher_detail_no)
 			if not allow_zero_rate:
-				self.valuation_rate = get_valuation_rate(sle.item_code, sle.warehouse,
-					sle.voucher_type, sle.voucher_no, sle.batch_no, self.allow_zero_rate,
-					currency=erpnext.get_company_currency(sle.company), company=sle.company, batch_wise_valuation=0)
+				self.valuation_rate = self.get_valuation_rate(sle, company=sle.company, batch_wise_valuation=0)
 
 		self.qty_after_transaction += flt(sle.actual_qty)
 		self.stock_value = flt(self.qty_after_transaction) * flt(self.valuation_rate)
 
 	def get_incoming_value_for_serial_nos(self, sle, serial_nos):
+		self.update_stock_ledger_entries()
 		previous_sle_map = get_previous_serial_no_sles(sle, incoming_only=True)
 
 		incoming_values = 0
@@ -414,9 +567,7 @@ class update_entries_after(object):
 			if not new_valuation_rate and sle.voucher_detail_no:
 				allow_zero_valuation_rate = self.check_if_allow_zero_valuation_rate(sle.voucher_type, sle.voucher_detail_no)
 				if not allow_zero_valuation_rate:
-					new_valuation_rate = get_valuation_rate(sle.item_code, sle.warehouse,
-						sle.voucher_type, sle.voucher_no, sle.batch_no, self.allow_zero_rate,
-						currency=erpnext.get_company_currency(sle.company), batch_wise_valuation=self.batch_wise_valuation)
+					new_valuation_rate = self.get_valuation_rate(sle, batch_wise_valuation=self.batch_wise_valuation)
 
 		self.qty_after_transaction += flt(sle.actual_qty)
 		self.qty_after_transaction = flt(self.qty_after_transaction, 9)
@@ -440,80 +591,29 @@ class update_entries_after(object):
 		outgoing_rate = flt(sle.outgoing_rate)
 
 		if actual_qty > 0:
-			if not self.stock_queue:
-				self.stock_queue.append([0, 0])
-
-			# last row has the same rate, just updated the qty
-			if self.stock_queue[-1][1]==incoming_rate:
-				self.stock_queue[-1][0] += actual_qty
-				self.stock_queue[-1][0] = flt(self.stock_queue[-1][0], 9)
-			else:
-				if self.stock_queue[-1][0] > 0:
-					self.stock_queue.append([actual_qty, incoming_rate])
-				else:
-					qty = flt(self.stock_queue[-1][0] + actual_qty, 9)
-					self.stock_queue[-1] = [qty, incoming_rate]
+			self.stock_queue.add_stock(actual_qty, incoming_rate)
 		else:
-			qty_to_pop = abs(actual_qty)
-			while qty_to_pop:
-				if not self.stock_queue:
-					# Get valuation rate from last sle if exists or from valuation rate field in item master
-					allow_zero_valuation_rate = self.check_if_allow_zero_valuation_rate(sle.voucher_type, sle.voucher_detail_no)
-					if not allow_zero_valuation_rate:
-						_rate = get_valuation_rate(sle.item_code, sle.warehouse,
-							sle.voucher_type, sle.voucher_no, sle.batch_no, self.allow_zero_rate,
-							currency=erpnext.get_company_currency(sle.company), company=sle.company)
-					else:
-						_rate = 0
-
-					self.stock_queue.append([0, _rate])
-
-				index = None
-				if outgoing_rate > 0:
-					# Find the entry where rate matched with outgoing rate
-					for i, v in enumerate(self.stock_queue):
-						if v[1] == outgoing_rate:
-							index = i
-							break
-
-					# If no entry found with outgoing rate, collapse stack
-					if index == None:
-						new_stock_value = sum((d[0]*d[1] for d in self.stock_queue)) - qty_to_pop*outgoing_rate
-						new_stock_qty = flt(sum((d[0] for d in self.stock_queue)) - qty_to_pop, 9)
-						self.stock_queue = [[new_stock_qty, flt(new_stock_value/new_stock_qty, 9) if new_stock_qty > 0 else outgoing_rate]]
-						break
+			def rate_generator():
+				# Get valuation rate from last sle if exists or from valuation rate field in item master
+				allow_zero_valuation_rate = self.check_if_allow_zero_valuation_rate(sle.voucher_type, sle.voucher_detail_no)
+				if not allow_zero_valuation_rate:
+					return self.get_valuation_rate(sle, company=sle.company)
 				else:
-					index = 0
-
-				# select first batch or the batch with same rate
-				batch = self.stock_queue[index]
-				if qty_to_pop >= batch[0]:
-					# consume current batch
-					qty_to_pop = flt(qty_to_pop - batch[0], 9)
-					self.stock_queue.pop(index)
-					if not self.stock_queue and qty_to_pop:
-						# stock finished, qty still remains to be withdrawn
-						# negative stock, keep in as a negative batch
-						self.stock_queue.append([-qty_to_pop, outgoing_rate or batch[1]])
-						break
+					return 0
 
-				else:
-					# qty found in current batch
-					# consume it and exit
-					batch[0] = flt(batch[0] - qty_to_pop, 9)
-					qty_to_pop = 0
+			self.stock_queue.remove_stock(actual_qty, outgoing_rate, rate_generator)
 
-		stock_value = sum((flt(batch[0]) * flt(batch[1]) for batch in self.stock_queue))
-		stock_qty = flt(sum((flt(batch[0]) for batch in self.stock_queue)), 9)
+		stock_value = self.stock_queue.get_total_value()
+		stock_qty = self.stock_queue.get_total_qty()
 
 		if stock_qty:
 			self.valuation_rate = stock_value / flt(stock_qty)
 
 		if not self.stock_queue:
-			self.stock_queue.append([0, flt(sle.incoming_rate or sle.outgoing_rate or self.valuation_rate, 9)])
+			self.stock_queue.add_stock(0, flt(sle.incoming_rate or sle.outgoing_rate or self.valuation_rate, 9))
 
 		self.qty_after_transaction += flt(sle.actual_qty)
-		self.stock_value = sum((flt(batch[0]) * flt(batch[1]) for batch in self.stock_queue))
+		self.stock_value = self.stock_queue.get_total_value()
 
 	def set_stock_reconciliation_actual_qty(self, sle):
 		if self.batch_wise_valuation:
@@ -556,7 +656,7 @@ class update_entries_after(object):
 		else:
 			self.valuation_rate = sle.valuation_rate
 			self.qty_after_transaction = sle.qty_after_transaction
-			self.stock_queue = [[self.qty_after_transaction, self.valuation_rate]]
+			self.stock_queue.reset([[self.qty_after_transaction, self.valuation_rate]])
 			self.stock_value = flt(self.qty_after_transaction) * flt(self.valuation_rate)
 
 			if flt(sle.actual_qty) > 0:
@@ -567,16 +667,14 @@ class update_entries_after(object):
 	def get_dependent_values(self, sle):
 		dependencies = self.sle_dependency_map.get(sle.name)
 		if dependencies:
-			dependency_keys = list(dependencies.keys())
+			dependency_sles = []
+			for dependency_key in dependencies:
+				for dep_sle in self.dependency_sle_map.get(dependency_key, []):
+					if dep_sle.name == sle.name:
+						continue
 
-			dependency_sles = frappe.db.sql("""
-				select voucher_type, voucher_no, voucher_detail_no,
-					stock_value_difference, incoming_rate, outgoing_rate, actual_qty
-				from `tabStock Ledger Entry`
-				where (voucher_type, voucher_no, voucher_detail_no) in %s
-					and name != %s
-					and ifnull(is_cancelled, 'No')='No'
-			""", [dependency_keys, sle.name], as_dict=1)
+					# use values processed in this partition, dependency SLEs are loaded before reposting
+					dependency_sles.append(self.processed_sles.get(dep_sle.name) or dep_sle)
 
 			dependent_sle_value = flt(sle.additional_cost)
 
@@ -610,7 +708,7 @@ class update_entries_after(object):
 	def get_sle_dependency_map(self, sles):
 		names = [d.name for d in sles]
 		if not names:
-			return []
+			return {}
 
 		dependencies = frappe.db.sql("""
 			select parent, dependent_voucher_type, dependent_voucher_no, dependent_voucher_detail_no,
@@ -627,6 +725,28 @@ class update_entries_after(object):
 
 		return dependency_map
 
+	def get_dependency_sle_map(self, sle_dependency_map):
+		dependency_keys = set()
+		for dependencies in sle_dependency_map.values():
+			dependency_keys.update(dependencies.keys())
+
+		if not dependency_keys:
+			return {}
+
+		dependency_sles = frappe.db.sql("""
+			select name, voucher_type, voucher_no, voucher_detail_no,
+				stock_value_difference, incoming_rate, outgoing_rate, actual_qty
+			from `tabStock Ledger Entry`
+			where (voucher_type, voucher_no, voucher_detail_no) in %s
+				and ifnull(is_cancelled, 'No')='No'
+		""", [list(dependency_keys)], as_dict=1)
+
+		dependency_sle_map = {}
+		for d in dependency_sles:
+			dependency_sle_map.setdefault((d.voucher_type, d.voucher_no, d.voucher_detail_no), []).append(d)
+
+		return dependency_sle_map
+
 	def get_dependent_entries_to_fix(self, sles):
 		dependency_keys = [(d.voucher_type, d.voucher_no, d.voucher_detail_no) for d in sles]
 		if not dependency_keys:
@@ -680,7 +800,26 @@ class update_entries_after(object):
 
 		return to_repost
 
+	def get_valuation_rate(self, sle, **kwargs):
+		"""get_valuation_rate cached per voucher and batch for the reposted partition"""
+		key = (sle.voucher_type, sle.voucher_no, sle.batch_no, tuple(sorted(kwargs.items())))
+		if key not in self.valuation_rate_cache:
+			self.update_stock_ledger_entries()
+			self.valuation_rate_cache[key] = get_valuation_rate(sle.item_code, sle.warehouse,
+				sle.voucher_type, sle.voucher_no, sle.batch_no, self.allow_zero_rate,
+				currency=erpnext.get_company_currency(sle.company), **kwargs)
+
+		return self.valuation_rate_cache[key]
+
 	def check_if_allow_zero_valuation_rate(self, voucher_type, voucher_detail_no):
+		key = (voucher_type, voucher_detail_no)
+		if key not in self.allow_zero_valuation_rate_cache:
+			self.allow_zero_valuation_rate_cache[key] = self._check_if_allow_zero_valuation_rate(voucher_type,
+				voucher_detail_no)
+
+		return self.allow_zero_valuation_rate_cache[key]
+
+	def _check_if_allow_zero_valuation_rate(self, voucher_type, voucher_detail_no):
 		ref_item_dt = ""
 
 		if voucher_type in ('Vehicle Receipt', 'Vehicle Delivery', 'Vehicle Movement', 'Packing Slip'):
@@ -710,13 +849,89 @@ class update_entries_after(object):
 				"item_code": self.args.get("item_code"), "warehouse": self.args.get("warehouse")
 			}), ">=", "asc", include_unprocessed=True, for_update=True)
 
+	def get_opening_balances(self, sles):
+		"""
+			Last batch and packing slip balances before the entries to be reposted
+
+			Since entries are processed in order, the previous entry of a batch or packing slip
+			found for the first time while reposting is always the last one before the first entry.
+			The last entry of every batch, batch and packing slip, and packing slip is found in one
+			windowed query and these entries are then locked and read with one query.
+		"""
+		opening_balances = frappe._dict({"batch": {}, "batch_packing_slip": {}, "packing_slip": {}})
+		if not self.previous_sle or not sles:
+			return opening_balances
+
+		batch_nos = set(d.batch_no for d in sles if d.batch_no)
+		batch_packing_slips = set((d.batch_no, cstr(d.packing_slip)) for d in sles if d.batch_no)
+		packing_slips = set(cstr(d.packing_slip) for d in sles if not d.batch_no)
+
+		conditions = []
+		if batch_nos:
+			conditions.append("batch_no in %(batch_nos)s")
+		if any(packing_slips):
+			conditions.append("packing_slip in %(packing_slips)s")
+		if "" in packing_slips:
+			conditions.append("(packing_slip is null or packing_slip = '')")
+
+		last_entries = frappe.db.sql("""
+			select name, batch_no, packing_slip, batch_row, batch_packing_slip_row, packing_slip_row
+			from (
+				select name, batch_no, ifnull(packing_slip, '') as packing_slip,
+					row_number() over (partition by batch_no
+						order by posting_date desc, posting_time desc, creation desc) as batch_row,
+					row_number() over (partition by batch_no, ifnull(packing_slip, '')
+						order by posting_date desc, posting_time desc, creation desc) as batch_packing_slip_row,
+					row_number() over (partition by ifnull(packing_slip, '')
+						order by posting_date desc, posting_time desc, creation desc) as packing_slip_row
+				from `tabStock Ledger Entry`
+				where item_code = %(item_code)s and warehouse = %(warehouse)s
+					and (posting_date, posting_time, creation) <= (%(posting_date)s, %(posting_time)s, %(creation)s)
+					and is_processed = 1
+					and ifnull(is_cancelled, 'No') = 'No'
+					and ({conditions})
+			) sle
+			where batch_row = 1 or batch_packing_slip_row = 1 or packing_slip_row = 1
+		""".format(conditions=" or ".join(conditions)), {
+			"item_code": self.item_code,
+			"warehouse": self.warehouse,
+			"posting_date": self.previous_sle.posting_date,
+			"posting_time": self.previous_sle.posting_time,
+			"creation": self.previous_sle.creation,
+			"batch_nos": list(batch_nos) or [""],
+			"packing_slips": [d for d in packing_slips if d] or [""],
+		}, as_dict=1)
+
+		# only the keys of the reposted entries, rows of other batches can match the packing slip condition
+		opening_entry_keys = {}
+		for d in last_entries:
+			if d.batch_row == 1 and d.batch_no in batch_nos:
+				opening_entry_keys.setdefault(d.name, []).append(("batch", d.batch_no))
+			if d.batch_packing_slip_row == 1 and (d.batch_no, d.packing_slip) in batch_packing_slips:
+				opening_entry_keys.setdefault(d.name, []).append(("batch_packing_slip", (d.batch_no, d.packing_slip)))
+			if d.packing_slip_row == 1 and d.packing_slip in packing_slips:
+				opening_entry_keys.setdefault(d.name, []).append(("packing_slip", d.packing_slip))
+
+		if not opening_entry_keys:
+			return opening_balances
+
+		for d in frappe.db.sql("""
+			select name, batch_qty_after_transaction, batch_valuation_rate, batch_stock_value,
+				packed_qty_after_transaction
+			from `tabStock Ledger Entry`
+			where name in %s
+			for update
+		""", [list(opening_entry_keys)], as_dict=1):
+			for balance_type, key in opening_entry_keys[d.name]:
+				opening_balances[balance_type][key] = d
+
+		return opening_balances
+
 	def get_previous_batch_sle(self, sle):
 		self.batch_data = self.previous_batch_sle_dict.get(sle.batch_no)
 
 		if not self.batch_data:
-			previous_batch_sle = get_stock_ledger_entries(sle, "<=", "desc", "limit 1",
-				for_update=True, batch_sle=True)
-			previous_batch_sle = previous_batch_sle[0] if previous_batch_sle else frappe._dict()
+			previous_batch_sle = self.opening_balances.batch.get(sle.batch_no) or frappe._dict()
 
 			self.batch_data = self.previous_batch_sle_dict[sle.batch_no] = frappe._dict()
 			for key in ("batch_qty_after_transaction", "batch_valuation_rate", "batch_stock_value"):
@@ -727,9 +942,11 @@ class update_entries_after(object):
 		self.packing_slip_data = self.previous_packing_slip_sle_dict.get((cstr(sle.batch_no), cstr(sle.packing_slip)))
 
 		if not self.packing_slip_data:
-			previous_packing_slip_sle = get_stock_ledger_entries(sle, "<=", "desc", "limit 1",
-				for_update=True, packing_slip_sle=True, batch_sle=bool(sle.batch_no))
-			previous_packing_slip_sle = previous_packing_slip_sle[0] if previous_packing_slip_sle else frappe._dict()
+			if sle.batch_no:
+				previous_packing_slip_sle = self.opening_balances.batch_packing_slip.get((sle.batch_no, cstr(sle.packing_slip)))
+			else:
+				previous_packing_slip_sle = self.opening_balances.packing_slip.get(cstr(sle.packing_slip))
+			previous_packing_slip_sle = previous_packing_slip_sle or frappe._dict()
 
 			self.packing_slip_data = self.previous_packing_slip_sle_dict[(cstr(sle.batch_no), cstr(sle.packing_slip))] = frappe._dict()
 			for key in ("packed_qty_after_transaction",):
@@ -797,6 +1014,108 @@ class update_entries_after(object):
 			}))
 
 
+class StockRepostPlanner(object):
+	"""
+		Queue of (item_code, warehouse) partitions to be reposted
+
+		Partitions are processed in order of their earliest affected posting timestamp
+		so that a partition is reposted after the partitions it depends on.
+		Multiple requests for the same pending partition are coalesced into one
+		starting from the earliest affected entry.
+	"""
+	def __init__(self, allow_negative_stock=None, via_landed_cost_voucher=False,
+			defer_future_entries=False, voucher=None):
+		self.allow_negative_stock = allow_negative_stock
+		self.via_landed_cost_voucher = via_landed_cost_voucher
+
+		# only entries of the current voucher are reposted immediately
+		# entries of other vouchers are queued for background reposting
+		self.defer_future_entries = defer_future_entries
+		self.voucher = voucher
+
+		self.queue = []
+		self.pending = {}
+
+	def add(self, args):
+		if self.defer_future_entries and (args.get("voucher_type"), args.get("voucher_no")) != self.voucher:
+			self.queue_background_repost(args)
+			return
+
+		bin_key = (args.get("item_code"), args.get("warehouse"))
+		sort_key = get_sle_sort_key(args)
+
+		pending_args = self.pending.get(bin_key)
+		if pending_args and get_sle_sort_key(pending_args) <= sort_key:
+			return
+
+		self.pending[bin_key] = args
+		heapq.heappush(self.queue, (sort_key, bin_key))
+
+	def run(self):
+		while self.queue:
+			sort_key, bin_key = heapq.heappop(self.queue)
+
+			args = self.pending.get(bin_key)
+			if not args or get_sle_sort_key(args) != sort_key:
+				# superseded by an earlier request for the same partition
+				continue
+
+			del self.pending[bin_key]
+
+			update_entries_after(args, allow_negative_stock=self.allow_negative_stock,
+				via_landed_cost_voucher=self.via_landed_cost_voucher, planner=self)
+
+	def queue_background_repost(self, args):
+		from erpnext.stock.doctype.repost_item_valuation.repost_item_valuation import queue_repost_item_valuation
+
+		args = args.copy()
+		args.update({
+			"company": frappe.db.get_value("Warehouse", args.get("warehouse"), "company", cache=1),
+			"voucher_type": self.voucher[0] if self.voucher else None,
+			"voucher_no": self.voucher[1] if self.voucher else None,
+			"allow_negative_stock": cint(self.allow_negative_stock),
+			"via_landed_cost_voucher": cint(self.via_landed_cost_voucher),
+		})
+		queue_repost_item_valuation(args)
+
+
+def get_sle_sort_key(args):
+	posting_date = getdate(args.get("posting_date") or "1900-01-01")
+	posting_time = get_time(args.get("posting_time") or "00:00")
+	creation = get_datetime(args.get("creation")) if args.get("creation") else datetime.datetime.min
+
+	return posting_date, posting_time, creation
+
+
+repost_sle_fields = (
+	"actual_qty", "incoming_rate", "outgoing_rate",
+	"qty_after_transaction", "valuation_rate", "stock_value", "stock_value_difference", "stock_queue",
+	"batch_qty_after_transaction", "batch_valuation_rate", "batch_stock_value",
+	"packed_qty_after_transaction", "is_processed"
+)
+
+
+def bulk_update_stock_ledger_entries(sles, fields=repost_sle_fields, chunk_size=100):
+	"""Write reposted values of Stock Ledger Entries using one UPDATE statement per chunk"""
+	for i in range(0, len(sles), chunk_size):
+		chunk = sles[i:i + chunk_size]
+
+		set_clauses = []
+		values = []
+		for fieldname in fields:
+			set_clauses.append("`{0}` = case name {1} end".format(fieldname, " ".join(["when %s then %s"] * len(chunk))))
+			for sle in chunk:
+				values += [sle.name, sle.get(fieldname)]
+
+		values += [sle.name for sle in chunk]
+
+		frappe.db.sql("""
+			update `tabStock Ledger Entry`
+			set {0}
+			where name in ({1})
+		""".format(", ".join(set_clauses), ", ".join(["%s"] * len(chunk))), values)
+
+
 def get_previous_sle(args, for_update=False, packing_slip_sle=False):
 	"""
 		get the last sle on or before the current time-bucket,
@@ -0,0 +1,108 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import frappe
+import unittest
+from frappe.utils import add_days, flt, nowdate, nowtime
+
+from erpnext.stock.stock_ledger import update_entries_after, make_sl_entries, NegativeStockError
+from erpnext.stock.doctype.bin.bin import Bin
+from erpnext.accounts.utils import get_fiscal_year
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+test_dependencies = ["Item", "Warehouse"]
+
+
+class TestStockLedger(unittest.TestCase):
+	def test_buffered_repost_matches_unbuffered(self):
+		item_code, warehouse = "_Test Item", "_Test Warehouse - _TC"
+		from_date = add_days(nowdate(), -10)
+
+		for days, qty, rate in ((0, 10, 100), (1, -4, 0), (2, 5, 150), (3, -8, 0), (4, 6, 120), (5, -9, 0)):
+			if qty > 0:
+				make_stock_entry(item_code=item_code, to_warehouse=warehouse, qty=qty, rate=rate,
+					posting_date=add_days(from_date, days))
+			else:
+				make_stock_entry(item_code=item_code, from_warehouse=warehouse, qty=-qty,
+					posting_date=add_days(from_date, days))
+
+		args = {"item_code": item_code, "warehouse": warehouse, "posting_date": from_date, "posting_time": "00:00"}
+
+		# unbuffered, each entry is written as soon as it is reposted
+		sle_flush_size = update_entries_after.sle_flush_size
+		update_entries_after.sle_flush_size = 1
+		try:
+			update_entries_after(args, allow_negative_stock=1)
+		finally:
+			update_entries_after.sle_flush_size = sle_flush_size
+		unbuffered_values = get_sle_values(item_code, warehouse, from_date)
+
+		frappe.db.sql("""
+			update `tabStock Ledger Entry`
+			set valuation_rate = 0, stock_value = 0, stock_value_difference = 0, stock_queue = '[]'
+			where item_code = %s and warehouse = %s and posting_date >= %s
+		""", (item_code, warehouse, from_date))
+
+		update_entries_after(args, allow_negative_stock=1)
+		self.assertEqual(get_sle_values(item_code, warehouse, from_date), unbuffered_values)
+
+	def test_rows_of_same_item_and_warehouse_update_bin_once(self):
+		item_code, warehouse = "_Test Item", "_Test Warehouse - _TC"
+		make_stock_entry(item_code=item_code, to_warehouse=warehouse, qty=10, rate=100)
+		actual_qty = flt(frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse}, "actual_qty"))
+
+		reposts = []
+		repost_stock_ledger_entries = Bin.repost_stock_ledger_entries
+
+		def count_reposts(bin, *args, **kwargs):
+			reposts.append((bin.item_code, bin.warehouse))
+			return repost_stock_ledger_entries(bin, *args, **kwargs)
+
+		allow_negative_stock = frappe.db.get_single_value("Stock Settings", "allow_negative_stock")
+		frappe.db.set_value("Stock Settings", None, "allow_negative_stock", 0)
+		Bin.repost_stock_ledger_entries = count_reposts
+		try:
+			make_sl_entries([get_sle_args(item_code, warehouse, "_Test SLE Row 1", 5),
+				get_sle_args(item_code, warehouse, "_Test SLE Row 2", 3)])
+
+			self.assertEqual(reposts, [(item_code, warehouse)])
+			self.assertEqual(flt(frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse},
+				"actual_qty")), actual_qty + 8)
+
+			# the row without allow_negative_stock is still validated
+			frappe.db.savepoint("negative_stock_rows")
+			self.assertRaises(NegativeStockError, make_sl_entries, [
+				get_sle_args(item_code, warehouse, "_Test SLE Row 3", -(actual_qty + 100), allow_negative_stock=1),
+				get_sle_args(item_code, warehouse, "_Test SLE Row 4", -1)])
+			frappe.db.rollback(save_point="negative_stock_rows")
+		finally:
+			Bin.repost_stock_ledger_entries = repost_stock_ledger_entries
+			frappe.db.set_value("Stock Settings", None, "allow_negative_stock", allow_negative_stock)
+
+
+def get_sle_args(item_code, warehouse, voucher_detail_no, qty, allow_negative_stock=0):
+	return frappe._dict({
+		"item_code": item_code,
+		"warehouse": warehouse,
+		"posting_date": nowdate(),
+		"posting_time": nowtime(),
+		"fiscal_year": get_fiscal_year(nowdate(), company="_Test Company")[0],
+		"voucher_type": "Stock Entry",
+		"voucher_no": "_Test SLE Voucher",
+		"voucher_detail_no": voucher_detail_no,
+		"actual_qty": qty,
+		"incoming_rate": 100 if qty > 0 else 0,
+		"stock_uom": "_Test UOM",
+		"company": "_Test Company",
+		"is_cancelled": "No",
+		"allow_negative_stock": allow_negative_stock
+	})
+
+
+def get_sle_values(item_code, warehouse, from_date):
+	return frappe.db.sql("""
+		select name, qty_after_transaction, valuation_rate, stock_value, stock_value_difference, stock_queue
+		from `tabStock Ledger Entry`
+		where item_code = %s and warehouse = %s and posting_date >= %s
+		order by posting_date, posting_time, creation
+	""", (item_code, warehouse, from_date))
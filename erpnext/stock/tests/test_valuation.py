@@ -0,0 +1,61 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import unittest
+import json
+
+from erpnext.stock.valuation import FIFOValuation, load_stock_queue, dump_stock_queue, compact_stock_queue_prefix
+
+
+class TestFIFOValuation(unittest.TestCase):
+	def test_add_and_consume_from_head(self):
+		queue = FIFOValuation()
+		queue.add_stock(10, 100)
+		queue.add_stock(5, 100)
+		queue.add_stock(10, 200)
+		self.assertEqual(queue.get_state(), [[15, 100], [10, 200]])
+
+		queue.remove_stock(-20)
+		self.assertEqual(queue.get_state(), [[5, 200]])
+		self.assertEqual(queue.get_total_qty(), 5)
+		self.assertEqual(queue.get_total_value(), 1000)
+
+	def test_consume_rate_matched_layer(self):
+		queue = FIFOValuation([[10, 100], [10, 200], [10, 300]])
+		queue.remove_stock(-5, outgoing_rate=200)
+		self.assertEqual(queue.get_state(), [[10, 100], [5, 200], [10, 300]])
+
+		queue.remove_stock(-5, outgoing_rate=200)
+		self.assertEqual(queue.get_state(), [[10, 100], [10, 300]])
+		self.assertEqual(queue.get_total_value(), 4000)
+
+	def test_collapse_if_rate_not_found(self):
+		queue = FIFOValuation([[10, 100], [10, 200]])
+		queue.remove_stock(-10, outgoing_rate=50)
+		self.assertEqual(queue.get_state(), [[10, 250]])
+
+	def test_negative_stock(self):
+		queue = FIFOValuation([[5, 100]])
+		queue.remove_stock(-8)
+		self.assertEqual(queue.get_state(), [[-3, 100]])
+
+		queue.add_stock(5, 120)
+		self.assertEqual(queue.get_state(), [[2, 120]])
+
+	def test_empty_queue_rate_generator(self):
+		queue = FIFOValuation()
+		queue.remove_stock(-2, rate_generator=lambda: 75)
+		self.assertEqual(queue.get_state(), [[-2, 75]])
+
+	def test_serialization(self):
+		small_queue = [[1, 10], [2, 20]]
+		self.assertEqual(json.loads(dump_stock_queue(small_queue)), small_queue)
+
+		large_queue = [[i + 1, 10.5 * i] for i in range(100)]
+		serialized = dump_stock_queue(large_queue)
+		self.assertTrue(serialized.startswith(compact_stock_queue_prefix))
+		self.assertEqual(load_stock_queue(serialized), large_queue)
+
+		# existing JSON data
+		self.assertEqual(FIFOValuation(json.dumps(large_queue)).get_state(), large_queue)
+		self.assertEqual(load_stock_queue(None), [])
@@ -190,8 +190,8 @@ def get_latest_stock_balance():
 	return bin_map
 
 
-def get_bin(item_code, warehouse):
-	bin = frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse})
+def get_bin(item_code, warehouse, for_update=False):
+	bin = frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse}, for_update=for_update)
 
 	if not bin:
 		bin_obj = frappe.get_doc({
@@ -201,6 +201,8 @@ def get_bin(item_code, warehouse):
 		})
 		bin_obj.flags.ignore_permissions = 1
 		bin_obj.insert()
+	elif for_update:
+		bin_obj = frappe.get_doc('Bin', bin)
 	else:
 		bin_obj = frappe.get_cached_doc('Bin', bin)
 
@@ -218,10 +220,47 @@ def update_bin(args, allow_negative_stock=False, via_landed_cost_voucher=False):
 		frappe.msgprint(_("Item {0} ignored since it is not a stock item").format(args.get("item_code")))
 
 
+def update_bins(bins_to_update, allow_negative_stock=False, via_landed_cost_voucher=False):
+	"""
+		Applies qty of Stock Ledger Entries of a voucher with one locked Bin update per item and warehouse
+		and reposts each item and warehouse once from its earliest entry in the voucher
+	"""
+	from erpnext.stock.stock_ledger import get_sle_sort_key
+
+	bin_args = {}
+	for args in bins_to_update:
+		bin_args.setdefault((args.get("item_code"), args.get("warehouse")), []).append(args)
+
+	for (item_code, warehouse), args_list in bin_args.items():
+		is_stock_item = frappe.db.get_value('Item', item_code, 'is_stock_item', cache=1)
+		if not is_stock_item:
+			frappe.msgprint(_("Item {0} ignored since it is not a stock item").format(item_code))
+			continue
+
+		bin = get_bin(item_code, warehouse, for_update=True)
+		for args in args_list:
+			bin.add_qty(args)
+
+		bin.set_projected_qty()
+		bin.db_update()
+
+		repost_args_list = [args for args in args_list
+			if args.get("actual_qty") or args.get("voucher_type") == "Stock Reconciliation"]
+
+		if repost_args_list:
+			repost_args = min(repost_args_list, key=get_sle_sort_key)
+			# negative stock is validated from the earliest entry unless every entry allows it
+			bin_allow_negative_stock = allow_negative_stock \
+				or all(args.get("allow_negative_stock") for args in repost_args_list)
+			bin.repost_stock_ledger_entries(repost_args, bin_allow_negative_stock, via_landed_cost_voucher)
+
+
 @frappe.whitelist()
 def get_incoming_rate(args, raise_error_if_no_rate=True):
 	"""Get Incoming Rate based on valuation method"""
 	from erpnext.stock.stock_ledger import get_previous_sle, get_valuation_rate
+	from erpnext.stock.valuation import load_stock_queue
+
 	if isinstance(args, string_types):
 		args = json.loads(args)
 
@@ -233,7 +272,7 @@ def get_incoming_rate(args, raise_error_if_no_rate=True):
 		previous_sle = get_previous_sle(args)
 		if valuation_method == 'FIFO':
 			if previous_sle:
-				previous_stock_queue = json.loads(previous_sle.get('stock_queue', '[]') or '[]')
+				previous_stock_queue = load_stock_queue(previous_sle.get('stock_queue'))
 				in_rate = get_fifo_rate(previous_stock_queue, args.get("qty") or 0) if previous_stock_queue else 0
 		elif valuation_method == 'Moving Average':
 			if batch_wise_valuation:
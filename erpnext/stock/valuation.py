@@ -0,0 +1,202 @@
+# Copyright (c) 2026, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import json
+import struct
+import zlib
+import base64
+from collections import deque
+from frappe.utils import flt
+
+
+# stock queues longer than this are stored in binary encoding
+# shorter queues are stored as JSON so that they remain readable
+compact_stock_queue_threshold = 8
+compact_stock_queue_prefix = "fifo:"
+
+
+def load_stock_queue(value):
+	"""Returns stock queue as a list of [qty, rate] from JSON or compact encoding"""
+	if not value:
+		return []
+
+	if isinstance(value, (list, tuple)):
+		return [list(d) for d in value]
+
+	if value.startswith(compact_stock_queue_prefix):
+		data = zlib.decompress(base64.b64decode(value[len(compact_stock_queue_prefix):]))
+		values = struct.unpack("<{0}d".format(len(data) // 8), data)
+		return [[values[i], values[i + 1]] for i in range(0, len(values), 2)]
+
+	return json.loads(value)
+
+
+def dump_stock_queue(stock_queue):
+	"""Returns stock queue as a string to be stored in Stock Ledger Entry"""
+	stock_queue = list(stock_queue)
+	if len(stock_queue) <= compact_stock_queue_threshold:
+		return json.dumps(stock_queue)
+
+	values = [flt(v) for layer in stock_queue for v in layer[:2]]
+	data = struct.pack("<{0}d".format(len(values)), *values)
+	return compact_stock_queue_prefix + base64.b64encode(zlib.compress(data, 1)).decode()
+
+
+class FIFOValuation(object):
+	"""
+		FIFO stock queue of [qty, rate] layers
+
+		Keeps running totals of qty and value so that balance is not recomputed on every transaction.
+		Layers are consumed from the head of a deque and layers with a specific rate
+		are found through a rate index. Layers removed from the middle are marked dead
+		and discarded lazily when they reach either end of the queue.
+	"""
+	def __init__(self, stock_queue=None):
+		self.queue = deque()
+		self.rate_index = {}
+		self.alive_count = 0
+		self.total_qty = 0.0
+		self.total_value = 0.0
+
+		for qty, rate in load_stock_queue(stock_queue):
+			self.append_layer(qty, rate)
+
+	def __len__(self):
+		return self.alive_count
+
+	def __bool__(self):
+		return self.alive_count > 0
+
+	def __iter__(self):
+		for layer in self.queue:
+			if layer[2]:
+				yield [layer[0], layer[1]]
+
+	def get_state(self):
+		return list(self)
+
+	def serialize(self):
+		return dump_stock_queue(self)
+
+	def get_total_qty(self):
+		return flt(self.total_qty, 9)
+
+	def get_total_value(self):
+		return self.total_value
+
+	def append_layer(self, qty, rate):
+		layer = [qty, rate, True]
+		self.queue.append(layer)
+		self.rate_index.setdefault(rate, deque()).append(layer)
+		self.alive_count += 1
+		self.total_qty += flt(qty)
+		self.total_value += flt(qty) * flt(rate)
+		return layer
+
+	def remove_layer(self, layer):
+		layer[2] = False
+		self.alive_count -= 1
+		self.total_qty -= flt(layer[0])
+		self.total_value -= flt(layer[0]) * flt(layer[1])
+		self.trim()
+
+		if not self.alive_count:
+			self.rate_index = {}
+			self.reset_totals()
+
+	def set_layer_qty(self, layer, qty):
+		self.total_qty += flt(qty) - flt(layer[0])
+		self.total_value += (flt(qty) - flt(layer[0])) * flt(layer[1])
+		layer[0] = qty
+
+	def reset(self, stock_queue=None):
+		self.__init__(stock_queue)
+
+	def reset_totals(self):
+		self.total_qty = 0.0
+		self.total_value = 0.0
+
+	def trim(self):
+		while self.queue and not self.queue[0][2]:
+			self.queue.popleft()
+		while self.queue and not self.queue[-1][2]:
+			self.queue.pop()
+
+	def first_layer(self):
+		return self.queue[0] if self.queue else None
+
+	def last_layer(self):
+		return self.queue[-1] if self.queue else None
+
+	def find_layer_by_rate(self, rate):
+		layers = self.rate_index.get(rate)
+		if not layers:
+			return None
+
+		while layers and not layers[0][2]:
+			layers.popleft()
+
+		if not layers:
+			del self.rate_index[rate]
+			return None
+
+		return layers[0]
+
+	def add_stock(self, qty, rate):
+		"""Add incoming qty at rate to the end of the queue"""
+		if not self:
+			self.append_layer(0, 0)
+
+		last_layer = self.last_layer()
+		if last_layer[1] == rate:
+			# last row has the same rate, just updated the qty
+			self.set_layer_qty(last_layer, flt(last_layer[0] + qty, 9))
+		elif last_layer[0] > 0:
+			self.append_layer(qty, rate)
+		else:
+			new_qty = flt(last_layer[0] + qty, 9)
+			self.remove_layer(last_layer)
+			self.append_layer(new_qty, rate)
+
+	def remove_stock(self, qty, outgoing_rate=0, rate_generator=None):
+		"""
+			Consume qty from the queue
+
+			If outgoing_rate is given, layers with the same rate are consumed,
+			if there is no such layer the queue is collapsed into a single layer.
+			rate_generator is called to get a rate when the queue is empty.
+		"""
+		qty_to_pop = abs(flt(qty))
+		outgoing_rate = flt(outgoing_rate)
+
+		while qty_to_pop:
+			if not self:
+				self.append_layer(0, rate_generator() if rate_generator else 0)
+
+			if outgoing_rate > 0:
+				layer = self.find_layer_by_rate(outgoing_rate)
+
+				# If no entry found with outgoing rate, collapse stack
+				if not layer:
+					# totals are summed over the layers since the queue is replaced by a single layer anyway
+					new_stock_value = sum(flt(d[0]) * flt(d[1]) for d in self) - qty_to_pop * outgoing_rate
+					new_stock_qty = flt(sum(flt(d[0]) for d in self) - qty_to_pop, 9)
+					self.reset([[new_stock_qty, flt(new_stock_value / new_stock_qty, 9) if new_stock_qty > 0 else outgoing_rate]])
+					break
+			else:
+				layer = self.first_layer()
+
+			if qty_to_pop >= layer[0]:
+				# consume current layer
+				qty_to_pop = flt(qty_to_pop - layer[0], 9)
+				self.remove_layer(layer)
+				if not self and qty_to_pop:
+					# stock finished, qty still remains to be withdrawn
+					# negative stock, keep in as a negative layer
+					self.append_layer(-qty_to_pop, outgoing_rate or layer[1])
+					break
+			else:
+				# qty found in current layer
+				# consume it and exit
+				self.set_layer_qty(layer, flt(layer[0] - qty_to_pop, 9))
+				qty_to_pop = 0
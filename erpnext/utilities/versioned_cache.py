@@ -0,0 +1,78 @@
+# Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import frappe
+
+
+process_caches = {}
+
+
+def get_versioned_cache(cache_name, get_fingerprint=None, generator=dict, max_size=None):
+	"""
+		Returns the in process cache named cache_name for the site, created with generator
+
+		The cache is kept for a version in redis changed by clear_versioned_cache and for the fingerprint of
+		the data it is built from, e.g. the last modified timestamp of a table, which is read once per request.
+		Since the fingerprint is read in the transaction of the caller, a cache built from uncommitted data
+		is rebuilt once the data is committed or rolled back.
+	"""
+	if frappe.flags.versioned_caches is None:
+		frappe.flags.versioned_caches = {}
+
+	if cache_name in frappe.flags.versioned_caches:
+		return frappe.flags.versioned_caches[cache_name]
+
+	version = frappe.cache().get_value(get_version_key(cache_name))
+	if not version:
+		version = set_cache_version(cache_name)
+
+	version = (version, get_fingerprint() if get_fingerprint else None)
+
+	key = (frappe.local.site, cache_name)
+	cached = process_caches.get(key)
+	if not cached or cached[0] != version or (max_size and len(cached[1]) > max_size):
+		cached = process_caches[key] = (version, generator())
+
+	frappe.flags.versioned_caches[cache_name] = cached[1]
+	return cached[1]
+
+
+def clear_versioned_cache(cache_name):
+	"""
+		Invalidates the cache in all processes. A cache built concurrently from data before the commit is
+		rebuilt once the data is committed since its fingerprint changes, and the version is changed again
+		after commit where the database supports after commit hooks. The cache of this process is dropped
+		on rollback as it may have been built from the rolled back data.
+	"""
+	set_cache_version(cache_name)
+	drop_process_cache(cache_name)
+
+	if hasattr(frappe.db, "after_commit"):
+		frappe.db.after_commit.add(lambda: set_cache_version(cache_name))
+		frappe.db.after_rollback.add(lambda: drop_process_cache(cache_name))
+	else:
+		frappe.local.rollback_observers.append(VersionedCacheRollbackObserver(cache_name))
+
+
+def set_cache_version(cache_name):
+	version = frappe.generate_hash(length=10)
+	frappe.cache().set_value(get_version_key(cache_name), version)
+	return version
+
+
+def drop_process_cache(cache_name):
+	if frappe.flags.versioned_caches:
+		frappe.flags.versioned_caches.pop(cache_name, None)
+	process_caches.pop((frappe.local.site, cache_name), None)
+
+
+def get_version_key(cache_name):
+	return "{0}_version".format(cache_name)
+
+
+class VersionedCacheRollbackObserver(object):
+	def __init__(self, cache_name):
+		self.cache_name = cache_name
+
+	def on_rollback(self):
+		drop_process_cache(self.cache_name)